@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Admission Control
+Shed excess requests with 503 when the event loop lags or translation work piles up
+
+Overload shows up in two places: the event loop falls behind its timers (too
+much CPU work or GIL contention), and translations queue up waiting for a pool
+thread. Once either crosses its threshold, new requests are turned away at the
+door with `503` and `Retry-After`, so the ones already admitted and the health
+endpoints keep their latency instead of everything slowing down together.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from pool import TranslationPool
+
+ADMISSION_ENABLED = os.environ.get("EMOJI_ADMISSION", "on").lower() not in ("0", "off", "false", "no")
+# Smoothed event-loop lag above which new requests are shed
+MAX_LOOP_LAG = float(os.environ.get("EMOJI_MAX_LOOP_LAG_MS", 250)) / 1000
+# Translations waiting for a pool thread above which new requests are shed
+MAX_QUEUE_DEPTH = int(os.environ.get("EMOJI_MAX_QUEUE_DEPTH", 64))
+SHED_RETRY_AFTER = float(os.environ.get("EMOJI_SHED_RETRY_AFTER", 1))
+
+# How often the loop-lag probe wakes up, and how quickly its average reacts
+LAG_SAMPLE_INTERVAL = 0.05
+LAG_SMOOTHING = 0.3
+
+# Endpoints that must stay answerable under overload
+EXEMPT_PREFIXES = ("/static/",)
+EXEMPT_SUFFIXES = ("/health", "/livez", "/readyz", "/metrics")
+
+SHED_BODY = b'{"detail":"Server is overloaded, please retry shortly"}'
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a short sleep.
+
+    The probe task is started lazily from inside the loop it measures, and
+    restarted if the application is later served by a different loop.
+    """
+
+    def __init__(self, interval: float = LAG_SAMPLE_INTERVAL, smoothing: float = LAG_SMOOTHING):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._task = loop.create_task(self._probe())
+
+    async def _probe(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.observe(max(0.0, time.perf_counter() - start - self.interval))
+
+    def observe(self, lag: float) -> None:
+        self.lag += self.smoothing * (lag - self.lag)
+        self.max_lag = max(self.max_lag, lag)
+
+
+class AdmissionController:
+    """Decides whether a new request may start, and counts the outcomes."""
+
+    def __init__(self, pool: TranslationPool, monitor: Optional[LoopLagMonitor] = None,
+                 max_loop_lag: float = MAX_LOOP_LAG, max_queue_depth: int = MAX_QUEUE_DEPTH,
+                 retry_after: float = SHED_RETRY_AFTER):
+        self.pool = pool
+        self.monitor = monitor if monitor is not None else LoopLagMonitor()
+        self.max_loop_lag = max_loop_lag
+        self.max_queue_depth = max_queue_depth
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"loop_lag": 0, "queue_depth": 0}
+
+    def check(self) -> Optional[str]:
+        """None if the request is admitted, otherwise the reason it is shed."""
+        if self.monitor.lag > self.max_loop_lag:
+            reason = "loop_lag"
+        elif self.pool.depth >= self.max_queue_depth:
+            reason = "queue_depth"
+        else:
+            with self._lock:
+                self.admitted += 1
+            return None
+        with self._lock:
+            self.shed[reason] += 1
+        return reason
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "shed": dict(self.shed),
+                "shed_total": sum(self.shed.values()),
+                "loop_lag_ms": round(self.monitor.lag * 1000, 3),
+                "max_loop_lag_ms": round(self.monitor.max_lag * 1000, 3),
+                "queue_depth": self.pool.depth,
+                "thresholds": {
+                    "max_loop_lag_ms": self.max_loop_lag * 1000,
+                    "max_queue_depth": self.max_queue_depth,
+                },
+            }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an AdmissionController to HTTP requests."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+        self._retry_after = str(max(1, math.ceil(controller.retry_after))).encode("ascii")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.controller.monitor.ensure_started()
+        path = scope["path"]
+        if path.startswith(EXEMPT_PREFIXES) or path.endswith(EXEMPT_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+        if self.controller.check() is None:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(SHED_BODY)).encode("ascii")),
+                (b"retry-after", self._retry_after),
+            ],
+        })
+        await send({"type": "http.response.body", "body": SHED_BODY})
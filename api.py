@@ -4,41 +4,57 @@ Emoji Translator AI - FastAPI Server
 RESTful API for emoji translation services
 """
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Dict, Any, List
 import uvicorn
 import json
 from datetime import datetime
 from pathlib import Path
-from translator import EmojiTranslator
-
-# Initialize FastAPI app
-app = FastAPI(
-    title="Emoji Translator AI",
-    description="Transform text with intelligent emoji translation",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
+from app_factory import build_app
+from engine import (
+    get_coalescer, get_heavy_hitters, get_job_queue, get_micro_batcher, get_request_log, get_static_files,
+    get_translation_cache, get_translation_pool, get_translator,
+)
+from pool import Lane
+from deadline import DEADLINE_EXCEEDED, TranslationCancelled, request_deadline
+from singleflight import translation_key
+from live_translate import create_live_router
+from document_stream import create_document_router
+from jobs import create_jobs_router
+from fastpath import (
+    FORMAT_TEXT, VALID_DENSITIES, VALID_MODES, VALID_STYLES, TranslationSettings,
+    decode_payload, decode_translation_request, encode_response, json_response, query_settings,
+    request_body_schema, request_format, response_format, settings_from_payload,
+    translation_error, validate_with_model,
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Routes live on a router so the app factory can serve this tier next to the others
+router = APIRouter()
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Shared, process-wide translator, translation pool and precompressed static files
+translator = get_translator()
+translation_pool = get_translation_pool()
+static_files = get_static_files()
+# Identical concurrent requests share one translation
+coalescer = get_coalescer("standard")
+# Translations already done, by this or any other worker
+translation_cache = get_translation_cache()
+# Keys of recent translations, read back by cache warm-up after a restart
+request_log = get_request_log()
+# Most frequent requests across workers, for warm-up and /admin/hot
+heavy_hitters = get_heavy_hitters()
+
+# Live translation channel for the web UI
+router.include_router(create_live_router(translator, translation_pool))
 
-# Initialize translator
-translator = EmojiTranslator()
+# Streamed translation of large documents
+router.include_router(create_document_router(translator, translation_pool))
+
+# Queued bulk translations that survive restarts
+router.include_router(create_jobs_router(get_job_queue()))
 
 # Pydantic models for request/response
 class TranslationRequest(BaseModel):
@@ -47,6 +63,7 @@ class TranslationRequest(BaseModel):
     mode: Optional[str] = "append"
     style: Optional[str] = "fun"
     add_sentiment: Optional[bool] = False
+    seed: Optional[int] = None
 
 class TranslationResponse(BaseModel):
     original_text: str
@@ -54,6 +71,21 @@ class TranslationResponse(BaseModel):
     settings: Dict[str, Any]
     timestamp: str
     statistics: Dict[str, int]
+    # True when the request budget ran out and only part of the text was translated
+    truncated: bool = False
+
+class BatchTranslationRequest(BaseModel):
+    items: List[TranslationRequest]
+
+class BatchTranslationResponse(BaseModel):
+    results: List[TranslationResponse]
+    count: int
+
+MAX_BATCH_ITEMS = 100
+
+TRANSLATION_DEFAULTS = {
+    name: field.default for name, field in TranslationRequest.model_fields.items() if name != "text"
+}
 
 class HealthResponse(BaseModel):
     status: str
@@ -69,17 +101,17 @@ class EmojiInfoResponse(BaseModel):
 
 # API Routes
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
+@router.get("/", response_class=HTMLResponse)
+async def root(request: Request):
     """Serve the main web application."""
-    return FileResponse('static/index.html')
+    return static_files.page(request)
 
-@app.get("/app", response_class=HTMLResponse)
-async def app_page():
+@router.get("/app", response_class=HTMLResponse)
+async def app_page(request: Request):
     """Alternative route to serve the web application."""
-    return FileResponse('static/index.html')
+    return static_files.page(request)
 
-@app.get("/api", response_class=HTMLResponse)
+@router.get("/api", response_class=HTMLResponse)
 async def api_docs():
     """Root endpoint with API documentation."""
     return """
@@ -115,6 +147,12 @@ async def api_docs():
                 <p>Example: <code>/translate?text=Hello world&style=meme&density=heavy</code></p>
             </div>
             
+            <div class="endpoint">
+                <p><span class="method">POST</span> <code>/translate/batch</code> - Translate several texts at once</p>
+                <p>Request body: <code>{"items": [{"text": "first"}, {"text": "second"}]}</code></p>
+                <p>Also accepts <code>application/msgpack</code>, or <code>text/plain</code> (one text per line, settings as query parameters)</p>
+            </div>
+            
             <div class="endpoint">
                 <p><span class="method">GET</span> <code>/health</code> - API health check</p>
             </div>
@@ -151,16 +189,12 @@ print(response.json())
     </html>
     """
 
-@app.get("/health", response_model=HealthResponse)
+@router.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
-    return HealthResponse(
-        status="healthy",
-        timestamp=datetime.now().isoformat(),
-        version="1.0.0"
-    )
+    """Health check endpoint; see /livez and /readyz for orchestrator probes."""
+    return json_response({"status": "healthy", "timestamp": datetime.now().isoformat(), "version": "1.0.0"})
 
-@app.get("/info", response_model=EmojiInfoResponse)
+@router.get("/info", response_model=EmojiInfoResponse)
 async def get_emoji_info():
     """Get information about the emoji database."""
     return EmojiInfoResponse(
@@ -171,89 +205,237 @@ async def get_emoji_info():
         available_densities=["light", "medium", "heavy"]
     )
 
-@app.post("/translate", response_model=TranslationResponse)
-async def translate_text_post(request: TranslationRequest):
-    """
-    Translate text with emojis using POST method.
+def _translate_validated(request: TranslationRequest) -> Dict[str, Any]:
+    """Run a translation for an already-validated request and build the response body."""
+    # Off the event loop: the disk cache may answer after all
+    cached = translation_cache.get(translation_key(request))
+    if cached is not None:
+        return _response_body(request, cached)
+    truncated = False
+    try:
+        translated_text = translator.translate(
+            text=request.text,
+            density=request.density,
+            mode=request.mode,
+            style=request.style,
+            add_sentiment=request.add_sentiment,
+            deadline=request_deadline.get(),
+            seed=request.seed
+        )
+    except TranslationCancelled as e:
+        # Out of time: return what is done rather than nothing
+        if e.reason != DEADLINE_EXCEEDED or e.partial is None:
+            raise
+        translated_text, truncated = e.partial, True
+    else:
+        translation_cache.put(translation_key(request), translated_text)
+    return _response_body(request, translated_text, truncated)
+
+def _response_body(request, translated_text: str, truncated: bool = False) -> Dict[str, Any]:
+    """Build the /translate response body for a translated request."""
+    # Calculate statistics
+    original_length = len(request.text)
+    translated_length = len(translated_text)
+    emoji_difference = translated_length - original_length
     
-    - **text**: The text to translate (required)
-    - **density**: Emoji density level - light, medium, or heavy (default: medium)
-    - **mode**: Translation mode - append or replace (default: append)
-    - **style**: Output style - fun, professional, or meme (default: fun)
-    - **add_sentiment**: Whether to add sentiment emoji at the end (default: false)
+    return {
+        "original_text": request.text,
+        "translated_text": translated_text,
+        "settings": {
+            "density": request.density,
+            "mode": request.mode,
+            "style": request.style,
+            "add_sentiment": request.add_sentiment
+        },
+        "timestamp": datetime.now().isoformat(),
+        "statistics": {
+            "original_length": original_length,
+            "translated_length": translated_length,
+            "character_difference": emoji_difference,
+            "estimated_emojis_added": max(0, emoji_difference)
+        },
+        "truncated": truncated
+    }
+
+# Small concurrent requests are translated together, off the event loop
+batcher = get_micro_batcher("standard", _translate_validated)
+
+async def _run_translation(request, lane: Optional[Lane] = None) -> Dict[str, Any]:
     """
+    Translate a validated request from the cache, or share the work with
+    identical requests in flight; small ones without an assigned `lane` go
+    through the micro-batcher.
+    """
+    key = translation_key(request)
+    if request_log is not None:
+        request_log.record(key)
+    if heavy_hitters is not None:
+        heavy_hitters.record(key)
+    # Memory only; a disk lookup would block the event loop
+    cached = translation_cache.get_memory(key)
+    if cached is not None:
+        return _response_body(request, cached)
+    size = len(request.text)
+    if lane is None:
+        lane = translation_pool.classify(size)
+        if lane.executor is None:
+            return await coalescer.do(key, lambda: batcher.submit(request, size))
+    return await coalescer.do(key, lambda: translation_pool.run_in(
+        lane, size, _translate_validated, request))
+
+async def translate_text_model(request: TranslationRequest, lane: Optional[Lane] = None) -> Dict[str, Any]:
+    """Fully validated translation path, used whenever the fast path declines a request."""
     try:
         # Validate inputs
         if not request.text.strip():
             raise HTTPException(status_code=400, detail="Text cannot be empty")
         
-        if request.density not in ["light", "medium", "heavy"]:
+        if request.density not in VALID_DENSITIES:
             raise HTTPException(status_code=400, detail="Density must be 'light', 'medium', or 'heavy'")
         
-        if request.mode not in ["append", "replace"]:
+        if request.mode not in VALID_MODES:
             raise HTTPException(status_code=400, detail="Mode must be 'append' or 'replace'")
         
-        if request.style not in ["fun", "professional", "meme"]:
+        if request.style not in VALID_STYLES:
             raise HTTPException(status_code=400, detail="Style must be 'fun', 'professional', or 'meme'")
         
-        # Perform translation
-        translated_text = translator.translate(
-            text=request.text,
-            density=request.density,
-            mode=request.mode,
-            style=request.style,
-            add_sentiment=request.add_sentiment
-        )
-        
-        # Calculate statistics
-        original_length = len(request.text)
-        translated_length = len(translated_text)
-        emoji_difference = translated_length - original_length
-        
-        return TranslationResponse(
-            original_text=request.text,
-            translated_text=translated_text,
-            settings={
-                "density": request.density,
-                "mode": request.mode,
-                "style": request.style,
-                "add_sentiment": request.add_sentiment
-            },
-            timestamp=datetime.now().isoformat(),
-            statistics={
-                "original_length": original_length,
-                "translated_length": translated_length,
-                "character_difference": emoji_difference,
-                "estimated_emojis_added": max(0, emoji_difference)
-            }
-        )
+        return TranslationResponse(**await _run_translation(request, lane)).model_dump()
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Translation error: {str(e)}")
+        raise translation_error(e)
+
+async def _translate_one(request: Optional[TranslationSettings], fallback,
+                         lane: Optional[Lane] = None) -> Dict[str, Any]:
+    """
+    Translate via the fast path, or through the model path when `request` needs it.
+    `lane` overrides the pool lane picked from the text length, e.g. for batches.
+    """
+    if request is None or not request.is_valid():
+        return await translate_text_model(fallback(), lane)
+    try:
+        return await _run_translation(request, lane)
+    except Exception as e:
+        raise translation_error(e)
 
-@app.get("/translate", response_model=TranslationResponse)
+@router.post("/translate", response_model=TranslationResponse,
+          openapi_extra=request_body_schema(TranslationRequest, text_body=True))
+async def translate_text_post(http_request: Request):
+    """
+    Translate text with emojis using POST method.
+    
+    - **text**: The text to translate (required)
+    - **density**: Emoji density level - light, medium, or heavy (default: medium)
+    - **mode**: Translation mode - append or replace (default: append)
+    - **style**: Output style - fun, professional, or meme (default: fun)
+    - **add_sentiment**: Whether to add sentiment emoji at the end (default: false)
+    - **seed**: Optional integer making the emoji choices reproducible
+    
+    Bodies may also be sent as `application/msgpack`, or as `text/plain` with the
+    settings in query parameters. The response follows `Accept`, defaulting to the
+    request format; plain-text responses contain only the translated text.
+    """
+    body = await http_request.body()
+    fmt = request_format(http_request.headers.get("content-type"))
+    params = http_request.query_params
+    
+    # Fast path: plain, valid payloads skip pydantic on the way in and out
+    request = decode_translation_request(body, TRANSLATION_DEFAULTS, fmt, params)
+    result = await _translate_one(
+        request, lambda: validate_with_model(TranslationRequest, body, fmt, params, TRANSLATION_DEFAULTS))
+    
+    return encode_response(result, response_format(http_request.headers.get("accept"), fmt),
+                           text=result["translated_text"])
+
+@router.get("/translate", response_model=TranslationResponse)
 async def translate_text_get(
+    http_request: Request,
     text: str = Query(..., description="Text to translate"),
     density: str = Query("medium", description="Emoji density: light, medium, heavy"),
     mode: str = Query("append", description="Translation mode: append, replace"),
     style: str = Query("fun", description="Output style: fun, professional, meme"),
-    add_sentiment: bool = Query(False, description="Add sentiment emoji at the end")
+    add_sentiment: bool = Query(False, description="Add sentiment emoji at the end"),
+    seed: Optional[int] = Query(None, description="Seed for reproducible emoji choices")
 ):
     """
     Translate text with emojis using GET method with query parameters.
     Useful for quick translations and testing.
     """
-    # Create request object and reuse POST logic
-    request = TranslationRequest(
+    request = TranslationSettings(text, density, mode, style, add_sentiment, seed)
+    result = await _translate_one(request, lambda: TranslationRequest(
         text=text,
         density=density,
         mode=mode,
         style=style,
-        add_sentiment=add_sentiment
-    )
-    return await translate_text_post(request)
+        add_sentiment=add_sentiment,
+        seed=seed
+    ))
+    
+    return encode_response(result, response_format(http_request.headers.get("accept")),
+                           text=result["translated_text"])
+
+@router.post("/translate/batch", response_model=BatchTranslationResponse,
+          openapi_extra=request_body_schema(BatchTranslationRequest, text_body=True))
+async def translate_batch(http_request: Request):
+    """
+    Translate several texts in one request.
+    
+    JSON and MessagePack bodies look like `{"items": [{"text": ...}, ...]}`, each item
+    accepting the same fields as `/translate`. A `text/plain` body holds one text per
+    line, with shared settings in query parameters, and a plain-text response holds
+    one translated text per line.
+    """
+    body = await http_request.body()
+    fmt = request_format(http_request.headers.get("content-type"))
+    params = http_request.query_params
+    
+    if fmt == FORMAT_TEXT:
+        settings = query_settings(params, TRANSLATION_DEFAULTS)
+        lines = body.decode("utf-8", errors="replace").splitlines()
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                # Skipping it would shift every later line of the response
+                raise HTTPException(status_code=400, detail=f"Line {number} is blank; send one text per line")
+        payloads = [dict(settings, text=line) for line in lines]
+    else:
+        try:
+            payload = decode_payload(body, fmt)
+        except ValueError:
+            payload = None
+        payloads = payload.get("items") if type(payload) is dict else None
+        if type(payloads) is not list:
+            # Let the model produce the usual validation error
+            validate_with_model(BatchTranslationRequest, body, fmt)
+            payloads = []
+    
+    if len(payloads) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (max {MAX_BATCH_ITEMS})")
+    
+    # The batch runs on one lane, picked from its total size, so a large batch of
+    # short texts queues with the long jobs instead of holding up single requests
+    requests = [settings_from_payload(item, TRANSLATION_DEFAULTS) for item in payloads]
+    size = sum(len(item["text"]) for item in payloads
+               if type(item) is dict and type(item.get("text")) is str)
+    lane = translation_pool.classify(size, len(payloads))
+    
+    results = []
+    for index, (item, request) in enumerate(zip(payloads, requests)):
+        results.append(await _translate_one(request, lambda: _validate_batch_item(item, index), lane))
+    
+    out_fmt = response_format(http_request.headers.get("accept"), fmt)
+    return encode_response({"results": results, "count": len(results)}, out_fmt,
+                           text="\n".join(result["translated_text"] for result in results))
+
+def _validate_batch_item(item: Any, index: int) -> TranslationRequest:
+    """Validate one batch item, reporting errors under its position in `items`."""
+    try:
+        return TranslationRequest.model_validate(item)
+    except ValidationError as e:
+        raise RequestValidationError([
+            dict(error, loc=("body", "items", index) + tuple(error["loc"]))
+            for error in e.errors(include_url=False)
+        ])
 
-@app.get("/examples")
+@router.get("/examples")
 async def get_examples():
     """Get example translations demonstrating different styles and modes."""
     example_text = "Good morning! I love coffee and programming. This project is on fire!"
@@ -284,7 +466,7 @@ async def get_examples():
     
     return {"examples": examples}
 
-@app.get("/random")
+@router.get("/random")
 async def random_translation():
     """Get a random translation example."""
     import random
@@ -327,6 +509,14 @@ async def random_translation():
         "timestamp": datetime.now().isoformat()
     }
 
+# Standalone app for this tier; see app_factory.create_app for serving all tiers
+app = build_app(
+    [router],
+    title="Emoji Translator AI",
+    description="Transform text with intelligent emoji translation",
+    version="1.0.0"
+)
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
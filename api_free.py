@@ -1,9 +1,17 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
-from translator import EmojiTranslator
+from typing import Optional
+from app_factory import build_app
+from engine import (
+    get_coalescer, get_heavy_hitters, get_request_log, get_static_files, get_translation_cache, get_translation_pool,
+    get_translator,
+)
+from live_translate import create_live_router
+from document_stream import create_document_router
+from fastpath import decode_translation_request, json_response, request_body_schema, translation_error, validate_with_model
+from deadline import request_deadline
+from singleflight import translation_key
 import uvicorn
 import logging
 
@@ -11,26 +19,27 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Emoji Translator AI - Lifetime Free",
-    description="Transform your text with intelligent emoji translation - Forever Free!",
-    version="2.0.0"
-)
+# Routes live on a router so the app factory can serve this tier next to the others
+router = APIRouter()
 
-# CORS configuration for web browsers
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific domains
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Shared, process-wide translator, translation pool and precompressed static files
+translator = get_translator()
+translation_pool = get_translation_pool()
+static_files = get_static_files()
+# Identical concurrent requests share one translation
+coalescer = get_coalescer("free")
+# Translations already done, by this or any other worker
+translation_cache = get_translation_cache()
+# Keys of recent translations, read back by cache warm-up after a restart
+request_log = get_request_log()
+# Most frequent requests across workers, for warm-up and /admin/hot
+heavy_hitters = get_heavy_hitters()
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Live translation channel for the web UI
+router.include_router(create_live_router(translator, translation_pool))
 
-# Initialize the translator
-translator = EmojiTranslator()
+# Streamed translation of large documents
+router.include_router(create_document_router(translator, translation_pool))
 
 class TranslationRequest(BaseModel):
     text: str
@@ -38,6 +47,8 @@ class TranslationRequest(BaseModel):
     density: str = "medium"
     mode: str = "append"
     add_sentiment: bool = True
+    # Reproducible emoji choices; only seeded translations are cached
+    seed: Optional[int] = None
 
 class TranslationResponse(BaseModel):
     original_text: str
@@ -49,12 +60,12 @@ class TranslationResponse(BaseModel):
     status: str = "success"
     message: str = "Translation completed successfully! 🎉"
 
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
+@router.get("/", response_class=HTMLResponse)
+async def read_root(request: Request):
     """Serve the main HTML page"""
-    return FileResponse('static/index.html')
+    return static_files.page(request)
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
@@ -65,52 +76,79 @@ async def health_check():
         "message": "Service is running perfectly! 🚀"
     }
 
-@app.post("/translate", response_model=TranslationResponse)
-async def translate_text(request: TranslationRequest):
+TRANSLATION_DEFAULTS = {
+    name: field.default for name, field in TranslationRequest.model_fields.items() if name != "text"
+}
+
+SUCCESS_MESSAGE = "Translation completed successfully! 🎉 Thanks for using our lifetime free service!"
+
+def _translate_checked(request) -> dict:
+    """Validate text length, translate and build the response body."""
+    logger.info(f"Free translation request: {len(request.text)} characters")
+    
+    # Validate input
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    
+    if len(request.text) > 10000:
+        raise HTTPException(status_code=400, detail="Text too long (max 10,000 characters)")
+    
+    # Perform translation, unless it is cached
+    translated_text = translation_cache.translate(
+        translation_key(request),
+        translator.translate,
+        text=request.text,
+        style=request.style,
+        density=request.density,
+        mode=request.mode,
+        add_sentiment=request.add_sentiment,
+        deadline=request_deadline.get(),
+        seed=request.seed
+    )
+    
+    logger.info("Free translation completed successfully")
+    
+    return {
+        "original_text": request.text,
+        "translated_text": translated_text,
+        "style": request.style,
+        "density": request.density,
+        "mode": request.mode,
+        "add_sentiment": request.add_sentiment,
+        "status": "success",
+        "message": SUCCESS_MESSAGE
+    }
+
+@router.post("/translate", response_model=TranslationResponse,
+          openapi_extra=request_body_schema(TranslationRequest))
+async def translate_text(http_request: Request):
     """
     Translate text to emoji-enhanced version
     
     This endpoint is completely free with no limits!
     """
+    body = await http_request.body()
+    
+    # Fast path: plain, well-typed JSON skips pydantic on the way in and out
+    request = decode_translation_request(body, TRANSLATION_DEFAULTS)
+    if request is None:
+        request = validate_with_model(TranslationRequest, body)
+    
+    key = translation_key(request)
+    if request_log is not None:
+        request_log.record(key)
+    if heavy_hitters is not None:
+        heavy_hitters.record(key)
     try:
-        logger.info(f"Free translation request: {len(request.text)} characters")
-        
-        # Validate input
-        if not request.text.strip():
-            raise HTTPException(status_code=400, detail="Text cannot be empty")
-        
-        if len(request.text) > 10000:
-            raise HTTPException(status_code=400, detail="Text too long (max 10,000 characters)")
-        
-        # Perform translation
-        translated_text = translator.translate(
-            text=request.text,
-            style=request.style,
-            density=request.density,
-            mode=request.mode,
-            add_sentiment=request.add_sentiment
-        )
-        
-        logger.info("Free translation completed successfully")
-        
-        return TranslationResponse(
-            original_text=request.text,
-            translated_text=translated_text,
-            style=request.style,
-            density=request.density,
-            mode=request.mode,
-            add_sentiment=request.add_sentiment,
-            status="success",
-            message="Translation completed successfully! 🎉 Thanks for using our lifetime free service!"
-        )
-        
+        return json_response(await coalescer.do(key, lambda: translation_pool.run(
+            len(request.text), _translate_checked, request)))
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Translation error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
+        raise translation_error(e, prefix="Translation failed")
 
-@app.get("/stats")
+@router.get("/stats")
 async def get_stats():
     """Get service statistics"""
     return {
@@ -140,7 +178,7 @@ async def get_stats():
         }
     }
 
-@app.get("/examples")
+@router.get("/examples")
 async def get_examples():
     """Get example translations to showcase the service"""
     examples = [
@@ -178,6 +216,14 @@ async def get_examples():
     
     return {"examples": results}
 
+# Standalone app for this tier; see app_factory.create_app for serving all tiers
+app = build_app(
+    [router],
+    title="Emoji Translator AI - Lifetime Free",
+    description="Transform your text with intelligent emoji translation - Forever Free!",
+    version="2.0.0"
+)
+
 if __name__ == "__main__":
     print("🎉 Starting Emoji Translator AI - Lifetime Free Service!")
     print("🌐 Web interface will be available at: http://localhost:8000")
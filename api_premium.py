@@ -3,56 +3,66 @@
 Emoji Translator AI - Enhanced API with Monetization Features
 """
 
-from fastapi import FastAPI, HTTPException, Query, Header, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import APIRouter, HTTPException, Query, Header, Depends, Request
+from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import uvicorn
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from translator import EmojiTranslator
+from app_factory import build_app
+from engine import (
+    get_coalescer, get_heavy_hitters, get_key_signer, get_request_log, get_static_files, get_translation_cache,
+    get_translation_pool, get_translator, get_usage_store, set_plan_resolver,
+)
+from deadline import TranslationCancelled, request_deadline
+from fastpath import translation_error
+from memory_governor import ADMIN_TOKEN, check_admin_token
+from plans import DEFAULT_PLAN, PRICING_PLANS, public_plans
+from scheduler import request_plan
+from usage import UsageTracker
+from usage_store import StoredMapping, StoredSet
+from signed_keys import KEY_TTL_DAYS, is_signed_key
+from singleflight import translation_key
 import hashlib
 import uuid
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Emoji Translator AI - Premium",
-    description="Transform text with intelligent emoji translation - Now with Premium Features!",
-    version="2.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
+# Routes live on a router so the app factory can serve this tier next to the others
+router = APIRouter()
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Shared, process-wide translator, translation pool and precompressed static files
+translator = get_translator()
+translation_pool = get_translation_pool()
+static_files = get_static_files()
+# Identical concurrent requests share one translated text
+coalescer = get_coalescer("text")
+# Translated texts already done, by this or any other worker
+translation_cache = get_translation_cache()
+# Keys of recent translations, read back by cache warm-up after a restart
+request_log = get_request_log()
+# Most frequent requests across workers, for warm-up and /admin/hot
+heavy_hitters = get_heavy_hitters()
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Usage, API keys and premium users persist in the shared usage store when one
+# is configured (EMOJI_USAGE_DB); otherwise they live in memory
+usage_store = get_usage_store()
+user_usage = UsageTracker(store=usage_store)
+# Legacy UUID keys; new keys are signed and verified without any lookup
+api_keys = StoredMapping(usage_store, "api_keys") if usage_store else {}
+key_signer = get_key_signer()
+premium_users = StoredSet(usage_store, "premium_users") if usage_store else set()
 
-# Initialize translator
-translator = EmojiTranslator()
+def plan_for_api_key(api_key: str) -> Optional[str]:
+    """Plan of a valid API key, or None; also used by the rate limiter."""
+    if is_signed_key(api_key):
+        claims = key_signer.verify(api_key)
+        return claims.plan if claims else None
+    key_info = api_keys.get(api_key)
+    return key_info["plan"] if key_info else None
 
-# In-memory storage (use database in production)
-user_usage = {}
-api_keys = {}
-premium_users = set()
-
-# Pricing plans
-PRICING_PLANS = {
-    "free": {"daily_limit": 100, "features": ["basic_translation"], "price": 0},
-    "premium": {"daily_limit": 1000, "features": ["all_styles", "premium_emojis", "analytics"], "price": 4.99},
-    "pro": {"daily_limit": 10000, "features": ["unlimited", "api_access", "custom_branding"], "price": 19.99},
-    "enterprise": {"daily_limit": 100000, "features": ["white_label", "priority_support", "custom_features"], "price": 99.99}
-}
+# Requests carrying an issued key in X-API-Key are limited and scheduled at their plan's rate
+set_plan_resolver(plan_for_api_key)
 
 # Pydantic models
 class TranslationRequest(BaseModel):
@@ -61,6 +71,8 @@ class TranslationRequest(BaseModel):
     mode: Optional[str] = "append"
     style: Optional[str] = "fun"
     add_sentiment: Optional[bool] = False
+    # Reproducible emoji choices; only seeded translations are cached
+    seed: Optional[int] = None
 
 class PremiumTranslationRequest(TranslationRequest):
     api_key: Optional[str] = None
@@ -87,40 +99,22 @@ def get_user_id(request) -> str:
 
 def check_usage_limit(user_id: str, plan: str = "free") -> Dict[str, Any]:
     """Check if user has exceeded their usage limit."""
-    today = datetime.now().date().isoformat()
-    
-    if user_id not in user_usage:
-        user_usage[user_id] = {"daily": {}, "monthly": {}}
-    
-    daily_usage = user_usage[user_id]["daily"].get(today, 0)
-    plan_limit = PRICING_PLANS[plan]["daily_limit"]
-    
-    return {
-        "usage": daily_usage,
-        "limit": plan_limit,
-        "remaining": max(0, plan_limit - daily_usage),
-        "exceeded": daily_usage >= plan_limit
-    }
+    return user_usage.check(user_id, PRICING_PLANS[plan]["daily_limit"]).as_dict()
 
 def increment_usage(user_id: str):
     """Increment user's daily usage."""
-    today = datetime.now().date().isoformat()
-    
-    if user_id not in user_usage:
-        user_usage[user_id] = {"daily": {}, "monthly": {}}
-    
-    user_usage[user_id]["daily"][today] = user_usage[user_id]["daily"].get(today, 0) + 1
+    user_usage.check_and_increment(user_id)
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
+@router.get("/", response_class=HTMLResponse)
+async def root(request: Request):
     """Serve the main web application."""
-    return FileResponse('static/index.html')
+    return static_files.page(request)
 
-@app.get("/pricing")
+@router.get("/pricing")
 async def get_pricing():
     """Get pricing information."""
     return {
-        "plans": PRICING_PLANS,
+        "plans": public_plans(),
         "features_comparison": {
             "free": "Perfect for personal use",
             "premium": "Great for content creators",
@@ -129,16 +123,16 @@ async def get_pricing():
         }
     }
 
-@app.post("/translate", response_model=TranslationResponse)
+@router.post("/translate", response_model=TranslationResponse)
 async def translate_text(request: TranslationRequest):
     """Translate text with usage tracking."""
     # For demo purposes, using a simple IP-based user ID
     user_id = "demo_user"  # In production, get from authenticated user
     
-    # Check usage limits
-    usage_info = check_usage_limit(user_id, "free")
+    # Count this request against the daily limit in one atomic step
+    usage = user_usage.check_and_increment(user_id, PRICING_PLANS["free"]["daily_limit"])
     
-    if usage_info["exceeded"]:
+    if not usage.allowed:
         raise HTTPException(
             status_code=429,
             detail={
@@ -150,19 +144,24 @@ async def translate_text(request: TranslationRequest):
     
     # Perform translation
     try:
-        result = translator.translate(
+        key = translation_key(request)
+        if request_log is not None:
+            request_log.record(key)
+        if heavy_hitters is not None:
+            heavy_hitters.record(key)
+        result = await coalescer.do(key, lambda: translation_pool.run(
+            len(request.text),
+            translation_cache.translate,
+            key,
+            translator.translate,
             text=request.text,
             density=request.density,
             mode=request.mode,
             style=request.style,
-            add_sentiment=request.add_sentiment
-        )
-        
-        # Increment usage
-        increment_usage(user_id)
-        
-        # Update usage info
-        updated_usage = check_usage_limit(user_id, "free")
+            add_sentiment=request.add_sentiment,
+            deadline=request_deadline.get(),
+            seed=request.seed
+        ))
         
         return TranslationResponse(
             original_text=request.text,
@@ -176,24 +175,25 @@ async def translate_text(request: TranslationRequest):
             timestamp=datetime.now().isoformat(),
             usage_info={
                 "plan": "free",
-                "daily_usage": updated_usage["usage"],
-                "daily_limit": updated_usage["limit"],
-                "remaining_today": updated_usage["remaining"]
+                "daily_usage": usage.usage,
+                "daily_limit": usage.limit,
+                "remaining_today": usage.remaining
             }
         )
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
+        # Failed translations do not count against the limit
+        user_usage.refund(user_id)
+        raise translation_error(e, prefix="Translation failed")
 
-@app.post("/premium/translate")
+@router.post("/premium/translate")
 async def premium_translate(request: PremiumTranslationRequest):
     """Premium translation with enhanced features."""
     # Verify API key or premium subscription
     api_key = request.api_key
-    if api_key and api_key in api_keys:
-        plan = api_keys[api_key]["plan"]
-    else:
-        plan = "free"
+    plan = (plan_for_api_key(api_key) if api_key else None) or "free"
+    # The key may arrive in the body rather than a header; queue at its plan
+    request_plan.set(plan)
     
     user_id = "premium_user" if plan != "free" else "demo_user"
     
@@ -215,13 +215,27 @@ async def premium_translate(request: PremiumTranslationRequest):
     
     style = request.premium_style if request.premium_style in enhanced_styles else request.style
     
-    result = translator.translate(
-        text=request.text,
-        density=request.density,
-        mode=request.mode,
-        style=style,
-        add_sentiment=request.add_sentiment
-    )
+    try:
+        key = translation_key(request, style=style)
+        if request_log is not None:
+            request_log.record(key)
+        if heavy_hitters is not None:
+            heavy_hitters.record(key)
+        result = await coalescer.do(key, lambda: translation_pool.run(
+            len(request.text),
+            translation_cache.translate,
+            key,
+            translator.translate,
+            text=request.text,
+            density=request.density,
+            mode=request.mode,
+            style=style,
+            add_sentiment=request.add_sentiment,
+            deadline=request_deadline.get(),
+            seed=request.seed
+        ))
+    except TranslationCancelled as e:
+        raise translation_error(e)
     
     if plan != "free":
         increment_usage(user_id)
@@ -234,57 +248,70 @@ async def premium_translate(request: PremiumTranslationRequest):
         "timestamp": datetime.now().isoformat()
     }
 
-@app.get("/usage")
+@router.get("/usage")
 async def get_usage_stats():
     """Get user usage statistics."""
     user_id = "demo_user"
-    today = datetime.now().date().isoformat()
-    
-    daily_usage = user_usage.get(user_id, {}).get("daily", {}).get(today, 0)
+    usage = user_usage.check(user_id, PRICING_PLANS["free"]["daily_limit"])
     
     return UsageStats(
-        daily_usage=daily_usage,
-        monthly_usage=sum(user_usage.get(user_id, {}).get("daily", {}).values()),
+        daily_usage=usage.usage,
+        monthly_usage=usage.monthly,
         plan="free",
-        remaining_today=max(0, 100 - daily_usage)
+        remaining_today=usage.remaining
     )
 
-@app.post("/generate-api-key")
-async def generate_api_key(plan: str = "premium"):
-    """Generate API key for premium users."""
+@router.post("/generate-api-key")
+async def generate_api_key(request: Request, plan: str = DEFAULT_PLAN, tenant: Optional[str] = None):
+    """Generate a signed API key; keys for paid plans need the X-Admin-Token."""
     if plan not in PRICING_PLANS:
         raise HTTPException(status_code=400, detail="Invalid plan")
+    if PRICING_PLANS[plan]["price"]:
+        # Paid plans are granted by an operator (or billing), never self-served
+        check_admin_token(request, ADMIN_TOKEN)
+    if tenant is not None and (not tenant or ":" in tenant or len(tenant) > 64):
+        raise HTTPException(status_code=400, detail="Invalid tenant")
     
-    api_key = str(uuid.uuid4())
-    api_keys[api_key] = {
-        "plan": plan,
-        "created": datetime.now().isoformat(),
-        "usage": 0
-    }
+    api_key, claims = key_signer.issue(plan, tenant or uuid.uuid4().hex[:12], KEY_TTL_DAYS)
     
     return {
         "api_key": api_key,
         "plan": plan,
+        "tenant": claims.tenant,
+        "expires": datetime.fromtimestamp(claims.expires).isoformat(),
         "price": PRICING_PLANS[plan]["price"],
         "features": PRICING_PLANS[plan]["features"]
     }
 
-@app.get("/analytics")
+@router.post("/revoke-api-key")
+async def revoke_api_key(api_key: str = Header(..., alias="X-API-Key")):
+    """Revoke the API key sent in the X-API-Key header."""
+    if is_signed_key(api_key):
+        if key_signer.revoke(api_key) is None:
+            raise HTTPException(status_code=404, detail="Unknown API key")
+    elif api_key in api_keys:
+        del api_keys[api_key]
+    else:
+        raise HTTPException(status_code=404, detail="Unknown API key")
+    return {"revoked": True}
+
+@router.get("/analytics")
 async def get_analytics():
     """Get usage analytics (for premium users)."""
-    total_translations = sum(
-        sum(user_data.get("daily", {}).values()) 
-        for user_data in user_usage.values()
-    )
-    
-    active_users = len([
-        user_id for user_id, data in user_usage.items()
-        if any(data.get("daily", {}).values())
-    ])
+    aggregates = user_usage.aggregates()
+    # Approximate (HyperLogLog) distinct users across all workers;
+    # `active_users` counts everyone who ever translated
+    active = user_usage.active_user_estimates()
+    active_users = active["all_time"]
     
     return {
-        "total_translations": total_translations,
+        "total_translations": aggregates["total_translations"],
         "active_users": active_users,
+        "active_users_today": active["daily"],
+        "active_users_this_week": active["weekly"],
+        "active_users_this_month": active["monthly"],
+        "translations_today": aggregates["translations_today"],
+        "translations_this_month": aggregates["translations_this_month"],
         "premium_users": len(premium_users),
         "revenue_potential": {
             "daily": f"${active_users * 0.16:.2f}",  # Based on average conversion
@@ -292,7 +319,7 @@ async def get_analytics():
         }
     }
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {
@@ -303,7 +330,7 @@ async def health_check():
     }
 
 # Marketing endpoints
-@app.get("/demo")
+@router.get("/demo")
 async def demo_translation():
     """Demo translation for marketing."""
     demo_text = "Hello world! I'm excited about this amazing project!"
@@ -316,6 +343,14 @@ async def demo_translation():
         "message": "Try it yourself at our website!"
     }
 
+# Standalone app for this tier; see app_factory.create_app for serving all tiers
+app = build_app(
+    [router],
+    title="Emoji Translator AI - Premium",
+    description="Transform text with intelligent emoji translation - Now with Premium Features!",
+    version="2.0.0"
+)
+
 if __name__ == "__main__":
     print("🚀 Starting Emoji Translator AI - Premium Edition")
     print("💰 Monetization features enabled")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Application Factory
+Compose the free, standard and premium tiers into one process over a shared engine
+
+Run the tiers listed in EMOJI_TIERS from one worker with:
+
+    EMOJI_TIERS=free,standard,premium uvicorn app_factory:create_app --factory --host 0.0.0.0 --port 8000
+
+EMOJI_TIERS defaults to the free tier alone, which is what the public
+deployment served before the factory existed; standard and premium are only
+exposed when listed explicitly.
+
+The tier listed in EMOJI_ROOT_TIER (default: the first of EMOJI_TIERS) is served
+at the root, exactly like its standalone app; every enabled tier is also served
+under its own prefix, e.g. /premium/pricing or /standard/translate/batch.
+Routes a tier already namespaces under its own name keep their path there, so
+the premium tier's /premium/translate stays /premium/translate (and replaces
+its plain /translate under the prefix) instead of becoming
+/premium/premium/translate.
+"""
+
+import copy
+import importlib
+import os
+from typing import Iterable, List, Optional
+
+from fastapi import APIRouter, FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
+from starlette.routing import compile_path
+
+from engine import (
+    get_admission_controller, get_cache_warmer, get_heavy_hitters, get_memory_governor, get_oov_profiler,
+    get_rate_limiter, get_startup_probe, get_static_files, get_translation_pool, resolve_plan,
+)
+from admission import AdmissionMiddleware
+from deadline import REQUEST_BUDGET, DeadlineMiddleware
+from health import LivenessMiddleware, create_health_router
+from memory_governor import ADMIN_TOKEN, create_admin_router
+from heavy_hitters import create_hot_router
+from oov_profiler import create_oov_router
+from metrics import create_metrics_router
+from rate_limit import RateLimitMiddleware
+from scheduler import PlanMiddleware
+from static_assets import add_response_compression
+
+# Tier name -> module defining its `router`
+TIER_MODULES = {
+    "free": "api_free",
+    "standard": "api",
+    "premium": "api_premium",
+}
+
+DEFAULT_TIERS = os.environ.get("EMOJI_TIERS", "free")
+DEFAULT_ROOT_TIER = os.environ.get("EMOJI_ROOT_TIER")
+
+
+def build_app(routers: Iterable[APIRouter], title: str, description: str, version: str) -> FastAPI:
+    """Create a FastAPI app with the shared static mount and middleware stack."""
+    app = FastAPI(
+        title=title,
+        description=description,
+        version=version,
+        docs_url="/docs",
+        redoc_url="/redoc"
+    )
+
+    # Static files are precompressed once per process and shared by every tier
+    app.mount("/static", get_static_files(), name="static")
+
+    # Give each request a deadline that expires with its budget or its client
+    app.add_middleware(DeadlineMiddleware, budget=REQUEST_BUDGET)
+
+    # Tag each request with its caller's plan so translations queue in plan order
+    if get_translation_pool().scheduled:
+        app.add_middleware(PlanMiddleware, resolve_plan=resolve_plan)
+
+    # Shed new work while the worker is overloaded; runs after rate limiting so
+    # over-limit clients never count towards the load
+    admission = get_admission_controller()
+    if admission is not None:
+        app.add_middleware(AdmissionMiddleware, controller=admission)
+
+    # Reject over-limit clients before any routing or body parsing; CORS stays
+    # outermost so browsers can read the 429
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is not None:
+        app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
+    # Compress large dynamic responses (batches, documents); small replies stay as-is
+    add_response_compression(app)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Liveness is answered before anything else runs, and never waits for warm-up
+    app.add_middleware(LivenessMiddleware)
+
+    app.include_router(create_metrics_router())
+    # Initialize and self-test the engine, and warm the translation cache, in the
+    # background; /readyz waits for both
+    on_startup = [get_startup_probe().start]
+    warmer = get_cache_warmer()
+    if warmer is not None:
+        on_startup.append(warmer.start)
+    app.include_router(create_health_router(on_startup=on_startup))
+    # Profiling feeds /metrics either way; the report is an admin route
+    oov_profiler = get_oov_profiler()
+    # Admin routes are only served once EMOJI_ADMIN_TOKEN is set
+    if ADMIN_TOKEN:
+        app.include_router(create_admin_router(get_memory_governor()))
+        heavy_hitters = get_heavy_hitters()
+        if heavy_hitters is not None:
+            app.include_router(create_hot_router(heavy_hitters))
+        if oov_profiler is not None:
+            app.include_router(create_oov_router(oov_profiler))
+    for router in routers:
+        app.include_router(router)
+    return app
+
+
+def parse_tiers(tiers: Optional[Iterable[str]] = None) -> List[str]:
+    """Normalize a tier list (iterable or comma-separated string) and validate it."""
+    if tiers is None:
+        tiers = DEFAULT_TIERS
+    if isinstance(tiers, str):
+        tiers = tiers.split(",")
+    selected = []
+    for tier in tiers:
+        tier = tier.strip().lower()
+        if not tier:
+            continue
+        if tier not in TIER_MODULES:
+            raise ValueError(f"Unknown tier {tier!r}; choose from {', '.join(TIER_MODULES)}")
+        if tier not in selected:
+            selected.append(tier)
+    if not selected:
+        raise ValueError("At least one tier must be enabled")
+    return selected
+
+
+def _tier_router(router: APIRouter, tier: str, at_root: bool = False) -> APIRouter:
+    """
+    `router` ready to mount under /{tier}: routes already under /{tier}/ lose
+    that segment so the prefix does not double it, and win over the plain route
+    they then collide with. For the root tier (`at_root`) they are left out, as
+    the root mount already serves them at that path.
+    """
+    namespace = f"/{tier}"
+    routes = []
+    for route in router.routes:
+        if isinstance(route, APIRoute) and route.path.startswith(namespace + "/"):
+            route = copy.copy(route)
+            route.path = route.path[len(namespace):]
+            route.path_regex, route.path_format, route.param_convertors = compile_path(route.path)
+        routes.append(route)
+
+    namespaced = {
+        (route.path, method)
+        for route, original in zip(routes, router.routes) if route is not original
+        for method in route.methods
+    }
+    prefixed = APIRouter()
+    for route, original in zip(routes, router.routes):
+        if route is not original:
+            if at_root:
+                continue
+        elif isinstance(route, APIRoute) and any((route.path, method) in namespaced for method in route.methods):
+            continue
+        prefixed.routes.append(route)
+    return prefixed
+
+
+def create_app(tiers: Optional[Iterable[str]] = None, root_tier: Optional[str] = None) -> FastAPI:
+    """
+    Build one application serving the selected tiers.
+
+    All tiers share the process-wide translator, static assets and caches from
+    `engine`, so running every tier costs about as much memory as running one.
+    """
+    selected = parse_tiers(tiers)
+    root_tier = (root_tier or DEFAULT_ROOT_TIER or selected[0]).strip().lower()
+    if root_tier not in selected:
+        raise ValueError(f"Root tier {root_tier!r} is not among the enabled tiers {selected}")
+
+    modules = {tier: importlib.import_module(TIER_MODULES[tier]) for tier in selected}
+
+    app = build_app(
+        [],
+        title="Emoji Translator AI",
+        description="Transform text with intelligent emoji translation - "
+                    f"tiers: {', '.join(selected)}",
+        version="2.0.0",
+    )
+    app.include_router(modules[root_tier].router)
+    for tier in selected:
+        app.include_router(_tier_router(modules[tier].router, tier, at_root=tier == root_tier), prefix=f"/{tier}", tags=[tier])
+    app.state.tiers = selected
+    app.state.root_tier = root_tier
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("🚀 Starting Emoji Translator AI - tiers in one process")
+    print(f"   Tiers: {DEFAULT_TIERS}")
+    uvicorn.run(
+        "app_factory:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=8000,
+        log_level="info"
+    )
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - API Benchmark
+Measure server-side requests per second for the /translate routes
+
+Requests are driven straight through the ASGI interface, so the figures cover
+routing, parsing, validation, translation and serialization without any
+client or socket overhead.
+
+Compare micro-batching with `--microbatch on` and `--microbatch off`; add
+`--unique` so identical requests are not coalesced into one translation.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import statistics
+import time
+from urllib.parse import urlencode
+
+SAMPLE_TEXT = "Good morning! I love coffee and programming."
+
+
+async def call_asgi(app, method: str, path: str, query: bytes = b"", body: bytes = b"",
+                    headers=None) -> tuple:
+    """Send one HTTP request through the ASGI app; return (status, body bytes)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": headers or [(b"content-type", b"application/json"),
+                               (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+    chunks = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+async def run_benchmark(app, method: str, requests: int, concurrency: int, text: str,
+                        unique: bool = False) -> dict:
+    """Fire `requests` calls at `app` with `concurrency` in flight; return throughput and latency."""
+    latencies = []
+    remaining = requests
+    body = json.dumps({"text": text, "density": "medium"}).encode()
+    query = urlencode({"text": text, "density": "medium"}).encode()
+
+    async def one_request():
+        if unique:
+            numbered = f"{text} #{remaining}"
+            if method == "GET":
+                return await call_asgi(app, "GET", "/translate",
+                                       query=urlencode({"text": numbered, "density": "medium"}).encode())
+            return await call_asgi(app, "POST", "/translate",
+                                   body=json.dumps({"text": numbered, "density": "medium"}).encode())
+        if method == "GET":
+            return await call_asgi(app, "GET", "/translate", query=query)
+        return await call_asgi(app, "POST", "/translate", body=body)
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status, _ = await one_request()
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"/translate returned {status}")
+
+    # Warm up routing, imports and caches before measuring
+    for _ in range(50):
+        await one_request()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /translate endpoint in-process")
+    parser.add_argument("module", nargs="?", default="api", help="Module exposing `app` (api, api_free, ...)")
+    parser.add_argument("--method", choices=["POST", "GET"], default="POST")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--text", default=SAMPLE_TEXT)
+    parser.add_argument("--unique", action="store_true", help="Make every request's text distinct")
+    parser.add_argument("--microbatch", choices=["on", "off"], help="Override EMOJI_MICROBATCH")
+    args = parser.parse_args()
+
+    if args.microbatch:
+        os.environ["EMOJI_MICROBATCH"] = args.microbatch
+    app = importlib.import_module(args.module).app
+    # Per-request INFO logging would dominate the measurement
+    logging.disable(logging.INFO)
+    result = asyncio.run(run_benchmark(app, args.method, args.requests, args.concurrency, args.text,
+                                       args.unique))
+    print(f"{args.module} {args.method} /translate: {result['rps']:.0f} req/s "
+          f"(p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, {result['requests']} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Translation Cache Benchmark
+Compare recomputing a translation with a memory hit and a disk hit, for short
+and long texts
+
+The disk level is measured with an empty memory level, i.e. the first request
+a freshly started (or another) worker serves for an entry some worker already
+cached.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from singleflight import translation_key
+from fastpath import TranslationSettings
+from translation_cache import DiskCache, LRUCache, TranslationCache
+from translator import EmojiTranslator
+
+SHORT_TEXT = "Good morning! I love coffee and pizza. This project is on fire! 🚀"
+LONG_TEXT = ("Good morning team! I love coffee, pizza and programming. The meeting went great "
+             "and the project is on fire, but the deadline is a problem. ") * 70
+
+
+def timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples) * 1e6,
+        "p99": samples[int(len(samples) * 0.99) - 1] * 1e6,
+    }
+
+
+def bench_text(label: str, text: str, repeat: int, path: str) -> None:
+    translator = EmojiTranslator()
+    request = TranslationSettings(text, "medium", "append", "fun", True, 42)
+    key = translation_key(request)
+
+    def compute():
+        return translator.translate(text, density="medium", mode="append", style="fun",
+                                    add_sentiment=True, seed=42)
+
+    cache = TranslationCache(lambda: translator.lexicon_version,
+                             disk=DiskCache(path, background=False))
+    cache.put(key, compute())
+    cache.disk.flush()
+
+    def disk_hit():
+        # Cold memory, as in a restarted or different worker
+        cache.memory.clear()
+        return cache.get(key)
+
+    results = {
+        "recompute": timed(compute, repeat),
+        "memory hit": timed(lambda: cache.get(key), repeat),
+        "disk hit": timed(disk_hit, repeat),
+    }
+    cache.disk.close()
+
+    print(f"{label} ({len(text):,} chars)")
+    base = results["recompute"]["p50"]
+    for name, result in results.items():
+        print(f"  {name:<10} p50 {result['p50']:9.1f} us   p99 {result['p99']:9.1f} us   "
+              f"{base / result['p50']:7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark translation cache hits against recomputation")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, text in (("short", SHORT_TEXT), ("long", LONG_TEXT)):
+            bench_text(label, text, args.repeat, os.path.join(directory, f"{label}.db"))
+
+
+if __name__ == "__main__":
+    main()
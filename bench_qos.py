@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - QoS Benchmark
+Measure paid-plan latency while free clients flood /translate, with and without
+the QoS scheduler
+
+Free clients send back-to-back requests and saturate the server, while a few
+paid clients send the same request at a fixed pace with a signed pro or
+enterprise key in X-API-Key. Requests are driven straight through the ASGI
+interface, as in bench_api.py, so the figures are pure server-side queueing and
+work. The default text is long enough to run on the short-lane threads, where
+FIFO queueing builds up; in-process, inline requests never wait on each other.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from bench_api import SAMPLE_TEXT, call_asgi
+
+# About 1,800 characters: above the inline threshold, within the short lane
+LONG_TEXT = " ".join([SAMPLE_TEXT] * 40)
+
+
+def summarize(latencies) -> str:
+    if not latencies:
+        return "no requests"
+    latencies = sorted(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return (f"p50 {statistics.median(latencies) * 1000:7.2f} ms, p99 {p99 * 1000:7.2f} ms "
+            f"({len(latencies)} requests)")
+
+
+async def run_mix(app, duration: float, free_clients: int, paid_clients: int, paid_interval: float,
+                  keys: dict, text: str) -> dict:
+    """Run free and paid clients against /translate for `duration` seconds."""
+    body = json.dumps({"text": text, "density": "medium"}).encode()
+    base_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    latencies = {"free": [], **{plan: [] for plan in keys}}
+    deadline = time.perf_counter() + duration
+
+    async def client(plan):
+        headers = base_headers + ([(b"x-api-key", keys[plan].encode())] if plan in keys else [])
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await call_asgi(app, "POST", "/translate", body=body, headers=headers)
+            if status != 200:
+                raise RuntimeError(f"/translate returned {status}")
+            latencies[plan].append(time.perf_counter() - start)
+            # Paid clients pace themselves; free ones only yield to the other connections
+            await asyncio.sleep(paid_interval if plan in keys else 0)
+
+    clients = [client("free") for _ in range(free_clients)]
+    for plan in keys:
+        clients += [client(plan) for _ in range(paid_clients)]
+    await asyncio.gather(*clients)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare paid-plan latency under a free flood with QoS on and off")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--free-clients", type=int, default=64)
+    parser.add_argument("--paid-clients", type=int, default=2, help="Concurrent clients per paid plan")
+    parser.add_argument("--paid-interval", type=float, default=0.01, help="Pause between a paid client's requests")
+    parser.add_argument("--text", default=LONG_TEXT)
+    args = parser.parse_args()
+
+    from app_factory import create_app
+    from engine import get_key_signer, get_translation_pool
+
+    # The premium tier installs the API key resolver the scheduler relies on
+    app = create_app(["standard", "premium"], root_tier="standard")
+    signer = get_key_signer()
+    keys = {plan: signer.issue(plan, "bench")[0] for plan in ("pro", "enterprise")}
+    pool = get_translation_pool()
+    schedulers = {name: lane.scheduler for name, lane in pool.lanes.items()}
+    if not pool.scheduled:
+        raise SystemExit("Run with EMOJI_QOS=on to compare scheduling")
+    # Per-request INFO logging would dominate the measurement
+    logging.disable(logging.INFO)
+
+    for label, enabled in (("QoS off", False), ("QoS on", True)):
+        for name, lane in pool.lanes.items():
+            lane.scheduler = schedulers[name] if enabled else None
+        latencies = asyncio.run(run_mix(app, args.duration, args.free_clients, args.paid_clients,
+                                       args.paid_interval, keys, args.text))
+        print(label)
+        for plan, values in latencies.items():
+            print(f"  {plan:<10} {summarize(values)}")
+
+
+if __name__ == "__main__":
+    main()
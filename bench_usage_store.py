@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Usage Store Benchmark
+Measure sustained usage increments per second and the count drift after a crash
+
+Each worker process counts requests through a UsageTracker backed by its own
+UsageStore on a shared SQLite file, exactly like the premium tier does. After
+the run one worker is "crashed" (its buffer dropped without a flush) and the
+others shut down cleanly; the drift is the difference between the increments
+the workers acknowledged and what ended up on disk.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from usage import UsageTracker
+from usage_store import TOTAL_COUNTER, UsageStore
+
+
+def run_worker(path: str, duration: float, users: int, flush_interval: float, crash: bool, results) -> None:
+    store = UsageStore(path, flush_interval=flush_interval)
+    tracker = UsageTracker(store=store)
+    user_ids = [f"user-{i}" for i in range(users)]
+    counted = 0
+    max_pending = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    next_sample = 0
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            tracker.check_and_increment(random.choice(user_ids))
+        counted += 1000
+        next_sample += 1
+        if next_sample % 10 == 0:
+            max_pending = max(max_pending, store.pending_total())
+    elapsed = time.perf_counter() - start
+    pending_at_exit = store.pending_total()
+    store.close(flush=not crash)
+    results.put({
+        "counted": counted,
+        "rate": counted / elapsed,
+        "flushes": store.flushes,
+        "max_pending": max_pending,
+        "lost": pending_at_exit if crash else 0,
+        "crashed": crash,
+    })
+
+
+def persisted_total(path: str) -> int:
+    connection = sqlite3.connect(path)
+    row = connection.execute("SELECT value FROM counters WHERE name = ?", (TOTAL_COUNTER,)).fetchone()
+    connection.close()
+    return row[0] if row else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the write-behind usage store")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="usage-bench-")
+    path = os.path.join(directory, "usage.db")
+    UsageStore(path, background=False).close()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(path, args.duration, args.users,
+                                                         args.flush_interval, i == 0, results))
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    counted = sum(report["counted"] for report in reports)
+    on_disk = persisted_total(path)
+    print(f"{args.workers} workers, {args.users} users, flush every {args.flush_interval}s")
+    for report in reports:
+        label = "crashed" if report["crashed"] else "clean  "
+        print(f"  {label} worker: {report['rate']:>10,.0f} increments/s, {report['flushes']} flushes, "
+              f"max buffered {report['max_pending']:,}, lost {report['lost']:,}")
+    print(f"Total: {sum(report['rate'] for report in reports):,.0f} increments/s")
+    print(f"Acknowledged {counted:,}, persisted {on_disk:,}: drift {counted - on_disk:,} "
+          f"({(counted - on_disk) / max(1, counted):.4%}); bound is one flush interval of one worker")
+
+
+if __name__ == "__main__":
+    main()
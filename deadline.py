@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Request Deadlines
+Cooperative cancellation of translations whose client left or whose budget ran out
+
+Every HTTP request gets a Deadline from DeadlineMiddleware: it expires after
+EMOJI_REQUEST_BUDGET_S seconds and is cancelled as soon as the client
+disconnects. The translator polls it between phrases and every few words and
+stops with TranslationCancelled, carrying the text translated so far, so an
+abandoned 10,000-character document stops using CPU within milliseconds
+instead of running to completion for nobody.
+
+Disconnects are only noticed while something awaits the request's receive
+channel. The middleware's watcher does that on demand: the translation pool
+listens for the disconnect while a job runs on its threads, handing any
+request message it reads on to the application.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+
+# Seconds a request may spend translating; 0 disables the budget
+REQUEST_BUDGET = float(os.environ.get("EMOJI_REQUEST_BUDGET_S", 30))
+
+# Words translated between deadline checks
+CHECK_EVERY = 32
+
+DISCONNECTED = "disconnected"
+DEADLINE_EXCEEDED = "deadline_exceeded"
+
+# Deadline of the request being handled, set by DeadlineMiddleware
+request_deadline: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar(
+    "request_deadline", default=None)
+
+
+class TranslationCancelled(Exception):
+    """A translation stopped early; `partial` holds the text translated so far, if known."""
+
+    def __init__(self, reason: str, partial: Optional[str] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.partial = partial
+
+
+class Deadline:
+    """
+    Cancellation token with an optional expiry time.
+
+    Safe to poll from worker threads; `cancel()` may be called from any thread.
+    """
+
+    __slots__ = ("expires", "reason", "disconnected", "_clock")
+
+    def __init__(self, budget: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires = clock() + budget if budget else None
+        self.reason: Optional[str] = None
+        # Awaitable factory completing when the client disconnects, if known
+        self.disconnected: Optional[Callable[[], Awaitable[None]]] = None
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.expires is not None and self._clock() >= self.expires:
+            self.reason = DEADLINE_EXCEEDED
+        return self.reason is not None
+
+    def cancel(self, reason: str = DISCONNECTED) -> None:
+        if self.reason is None:
+            self.reason = reason
+
+    def restart(self, budget: Optional[float]) -> None:
+        """Replace the expiry with `budget` seconds from now (None or 0: no expiry)."""
+        self.expires = self._clock() + budget if budget else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without an expiry."""
+        return None if self.expires is None else max(0.0, self.expires - self._clock())
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise TranslationCancelled(self.reason)
+
+    async def guard(self, future: Awaitable):
+        """
+        Await `future`, cancelling this deadline if it expires or the client
+        disconnects first. The work behind `future` is expected to notice the
+        cancellation and finish promptly, so its outcome is still awaited.
+        """
+        future = asyncio.ensure_future(future)
+        watcher = asyncio.ensure_future(self.disconnected()) if self.disconnected is not None else None
+        waiting = {future, watcher} if watcher is not None else {future}
+        try:
+            done, _ = await asyncio.wait(waiting, timeout=self.remaining(),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if future not in done:
+                self.cancel(DISCONNECTED if watcher in done else DEADLINE_EXCEEDED)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+        return await future
+
+
+class ReceiveWatch:
+    """
+    Wraps an ASGI receive channel so the server can be asked about a disconnect
+    while the application is busy, without losing messages the application
+    has yet to read.
+    """
+
+    __slots__ = ("_receive", "_deadline", "_pending", "_buffer", "_app_waiting", "_disconnect")
+
+    def __init__(self, receive, deadline: Deadline):
+        self._receive = receive
+        self._deadline = deadline
+        self._pending: Optional[asyncio.Future] = None
+        self._buffer: Deque[dict] = deque()
+        self._app_waiting = False
+        self._disconnect: Optional[dict] = None
+
+    async def _next(self) -> dict:
+        if self._disconnect is not None:
+            # Every read after a disconnect sees the disconnect again
+            return self._disconnect
+        pending = self._pending
+        if pending is None:
+            pending = self._pending = asyncio.ensure_future(self._receive())
+        message = await asyncio.shield(pending)
+        if self._pending is pending:
+            self._pending = None
+        return self._observe(message)
+
+    def _observe(self, message: dict) -> dict:
+        if message["type"] == "http.disconnect":
+            self._disconnect = message
+            self._deadline.cancel(DISCONNECTED)
+        return message
+
+    async def receive(self) -> dict:
+        """The receive channel handed to the application."""
+        if self._buffer:
+            return self._buffer.popleft()
+        if self._pending is None and self._disconnect is None:
+            # Nobody is watching: read straight through, without a task
+            return self._observe(await self._receive())
+        self._app_waiting = True
+        try:
+            return await self._next()
+        finally:
+            self._app_waiting = False
+
+    async def wait_disconnect(self) -> None:
+        while True:
+            message = await self._next()
+            if message["type"] == "http.disconnect":
+                return
+            if not self._app_waiting:
+                self._buffer.append(message)
+            if message.get("more_body", False):
+                # The application is still reading the body; leave the rest to it
+                await asyncio.get_running_loop().create_future()
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware giving each HTTP request a Deadline in `request_deadline`."""
+
+    def __init__(self, app, budget: float = REQUEST_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        deadline = Deadline(self.budget)
+        watch = ReceiveWatch(receive, deadline)
+        deadline.disconnected = watch.wait_disconnect
+        request_deadline.set(deadline)
+        await self.app(scope, watch.receive, send)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Document Streaming
+Chunked document upload with incremental translation and a streamed download
+"""
+
+import asyncio
+import codecs
+import json
+import os
+import random
+import re
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from deadline import DEADLINE_EXCEEDED, TranslationCancelled, request_deadline
+from fastpath import translation_error
+from pool import TranslationPool
+from translator import EmojiTranslator, POSITIVE_WORDS, NEGATIVE_WORDS
+
+# Hard cap on uploaded document size (bytes)
+MAX_DOCUMENT_BYTES = int(os.environ.get("EMOJI_MAX_DOCUMENT_BYTES", 50 * 1024 * 1024))
+# Seconds a document may spend translating, replacing the request budget, which
+# is sized for single texts; 0 leaves documents bounded by their size alone
+DOCUMENT_BUDGET = float(os.environ.get("EMOJI_DOCUMENT_BUDGET_S", 0))
+# Preferred segment size handed to the translator (characters)
+SEGMENT_SIZE = 1024
+# Size of the chunks read from a spooled multipart upload (bytes)
+READ_CHUNK_SIZE = 64 * 1024
+
+# Preferred cut points; characters used inside any phrase are dropped at runtime
+HARD_BOUNDARY_CHARS = ".!?;:,\n"
+WHITESPACE = re.compile(r"\s")
+
+
+class DocumentTranslator:
+    """
+    Translate a document incrementally, one segment at a time.
+
+    Input is buffered until a phrase-safe cut point is found; everything after the
+    cut is carried over to the next segment so multi-word phrases are never split.
+    Sentiment is accumulated across segments and added once at the very end.
+    """
+
+    def __init__(self, translator: EmojiTranslator, density: str = "medium", mode: str = "append",
+                 style: str = "fun", add_sentiment: bool = False, segment_size: int = SEGMENT_SIZE):
+        self.translator = translator
+        self.settings = {"density": density, "mode": mode, "style": style}
+        self.add_sentiment = add_sentiment
+        self.segment_size = segment_size
+        self.max_phrase_length = max((len(p) for p in translator.phrase_patterns), default=0)
+        self._phrase_starts = self._compile_phrase_starts(translator)
+        self._hard_boundary = self._compile_hard_boundary(translator)
+        self._buffer = ""
+        self._positive = set()
+        self._negative = set()
+        self.characters_in = 0
+        self.characters_out = 0
+
+    @staticmethod
+    def _compile_phrase_starts(translator: EmojiTranslator) -> Optional[re.Pattern]:
+        """Lookahead regex yielding the longest phrase starting at every position."""
+        phrases = sorted(translator.phrase_patterns, key=len, reverse=True)
+        if not phrases:
+            return None
+        return re.compile("(?=(" + "|".join(re.escape(p) for p in phrases) + "))", re.IGNORECASE)
+
+    @staticmethod
+    def _compile_hard_boundary(translator: EmojiTranslator) -> re.Pattern:
+        """Punctuation that no phrase contains, so no phrase can cross it."""
+        used = set("".join(translator.phrase_patterns).lower())
+        chars = "".join(c for c in HARD_BOUNDARY_CHARS if c not in used)
+        return re.compile("[" + re.escape(chars) + "]" if chars else "(?!)")
+
+    def feed(self, text: str) -> str:
+        """Add input text and return whatever translated output is ready."""
+        self.characters_in += len(text)
+        self._buffer += text
+        output = []
+        while len(self._buffer) >= self.segment_size:
+            cut = self._find_cut(self._buffer)
+            if cut <= 0:
+                break
+            segment, self._buffer = self._buffer[:cut], self._buffer[cut:]
+            output.append(self._translate_segment(segment))
+        return "".join(output)
+
+    def finish(self) -> str:
+        """Flush the carried-over tail and append the document sentiment if requested."""
+        output = self._translate_segment(self._buffer) if self._buffer else ""
+        self._buffer = ""
+        if self.add_sentiment:
+            sentiment = self.translator._sentiment_from_counts(len(self._positive), len(self._negative))
+            suffix = " " + random.choice(self.translator.sentiment_emojis[sentiment])
+            output += suffix
+            self.characters_out += len(suffix)
+        return output
+
+    @property
+    def buffered(self) -> int:
+        """Characters fed but not yet translated, carried over to the next segment."""
+        return len(self._buffer)
+
+    def sentiment_state(self) -> Dict[str, List[str]]:
+        """Sentiment words seen so far, for resuming the document elsewhere."""
+        return {"positive": sorted(self._positive), "negative": sorted(self._negative)}
+
+    def restore_sentiment(self, state: Dict[str, List[str]]) -> None:
+        self._positive.update(state.get("positive", ()))
+        self._negative.update(state.get("negative", ()))
+
+    def _find_cut(self, buffer: str) -> int:
+        """Return an index where the buffer can be split without breaking a phrase."""
+        lower, upper = self.segment_size // 2, self.segment_size
+
+        # Prefer the last punctuation or newline in the second half of the segment:
+        # no phrase crosses it
+        last = None
+        for last in self._hard_boundary.finditer(buffer, lower, upper):
+            pass
+        if last is not None:
+            return last.end()
+
+        # Otherwise fall back to whitespace that is not inside a phrase occurrence,
+        # keeping enough lookahead after it to see any phrase that could cross it
+        safe_upper = max(lower, min(upper, len(buffer) - self.max_phrase_length))
+        positions = [m.start() for m in WHITESPACE.finditer(buffer, lower, safe_upper)]
+        for position in reversed(positions):
+            if not self._inside_phrase(buffer, position):
+                return position
+
+        # Failing that, take the first boundary past the preferred segment size
+        first = self._hard_boundary.search(buffer, upper)
+        if first is not None:
+            return first.end()
+
+        # A single enormous token: nothing in the lexicon can be split by cutting it
+        return len(buffer) if len(buffer) >= 2 * self.segment_size else 0
+
+    def _inside_phrase(self, buffer: str, position: int) -> bool:
+        """Check whether any phrase occurrence straddles `position`."""
+        if self._phrase_starts is None:
+            return False
+        start = max(0, position - self.max_phrase_length)
+        window = buffer[start:position + self.max_phrase_length]
+        for match in self._phrase_starts.finditer(window):
+            if start + match.start() < position < start + match.start() + len(match.group(1)):
+                return True
+        return False
+
+    def _translate_segment(self, segment: str) -> str:
+        lowered = segment.lower()
+        self._positive.update(word for word in POSITIVE_WORDS if word in lowered)
+        self._negative.update(word for word in NEGATIVE_WORDS if word in lowered)
+        if not segment.strip():
+            translated = segment
+        else:
+            translated = self.translator.translate(segment, add_sentiment=False, **self.settings)
+        self.characters_out += len(translated)
+        return translated
+
+
+class DocumentTooLarge(Exception):
+    """A body without Content-Length grew past MAX_DOCUMENT_BYTES while streaming."""
+
+
+def format_sse(data: str, event: Optional[str] = None) -> str:
+    """Format a server-sent event; multi-line payloads become multiple data fields."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class DocumentStreamResponse(StreamingResponse):
+    """
+    Streaming response that may keep reading the request body while it sends.
+
+    StreamingResponse normally listens for disconnects on `receive`, which would
+    swallow the body chunks we are still consuming; disconnects surface through
+    `request.stream()` instead.
+
+    A body without Content-Length that turns out too large gets a 413 if no
+    output was sent yet, and a cancelled translation (budget spent, client
+    gone) the 504 or 499 of translation_error(). Past that point the response
+    is aborted instead: the final chunk is never sent, so clients see an
+    incomplete transfer rather than a translation that merely looks short.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except (OSError, ClientDisconnect, DocumentTooLarge, TranslationCancelled):
+            pass
+
+    async def stream_response(self, send) -> None:
+        chunks = self.body_iterator.__aiter__()
+        try:
+            # Hold the status line until there is output to send
+            first = await anext(chunks, None)
+        except (DocumentTooLarge, TranslationCancelled) as error:
+            if isinstance(error, DocumentTooLarge):
+                status, detail = 413, str(error)
+            else:
+                http_error = translation_error(error)
+                status, detail = http_error.status_code, http_error.detail
+            body = json.dumps({"detail": detail}).encode("utf-8")
+            await send({"type": "http.response.start", "status": status, "headers": [
+                (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if first is not None:
+            await send({"type": "http.response.body", "body": first.encode(self.charset), "more_body": True})
+            async for chunk in chunks:
+                await send({"type": "http.response.body", "body": chunk.encode(self.charset), "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _iter_upload(upload, form) -> AsyncIterator[bytes]:
+    """Yield a spooled multipart upload in fixed-size chunks."""
+    try:
+        while True:
+            chunk = await upload.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await form.close()
+
+
+async def _translate_stream(chunks: AsyncIterator[bytes], document: DocumentTranslator, sse: bool,
+                            pool: Optional[TranslationPool] = None) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def run(fn, *args) -> str:
+        if pool is None:
+            # Let other requests run between segments of a large document
+            await asyncio.sleep(0)
+            deadline = request_deadline.get()
+            if deadline is not None:
+                deadline.check()
+            return fn(*args)
+        return await pool.run(document.buffered + sum(map(len, args)), fn, *args)
+
+    received = 0
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > MAX_DOCUMENT_BYTES:
+                message = f"Document too large (max {MAX_DOCUMENT_BYTES:,} bytes)"
+                if sse:
+                    yield format_sse(message, event="error")
+                    return
+                raise DocumentTooLarge(message)
+            output = await run(document.feed, decoder.decode(chunk))
+            if output:
+                yield format_sse(output) if sse else output
+
+        output = document.feed(decoder.decode(b"", final=True)) + await run(document.finish)
+    except TranslationCancelled as error:
+        if sse and error.reason == DEADLINE_EXCEEDED:
+            yield format_sse(translation_error(error).detail, event="error")
+            return
+        # Plain text has no way to say so in-band; the response is aborted
+        raise
+    if sse:
+        if output:
+            yield format_sse(output)
+        yield format_sse(json.dumps({
+            "characters_in": document.characters_in,
+            "characters_out": document.characters_out,
+        }), event="done")
+    elif output:
+        yield output
+
+
+def create_document_router(translator: EmojiTranslator, pool: Optional[TranslationPool] = None) -> APIRouter:
+    """Build the router exposing `/translate/document`; segments are translated on `pool` when given."""
+    router = APIRouter()
+
+    @router.post("/translate/document")
+    async def translate_document(
+        request: Request,
+        density: str = Query("medium", description="Emoji density: light, medium, heavy"),
+        mode: str = Query("append", description="Translation mode: append, replace"),
+        style: str = Query("fun", description="Output style: fun, professional, meme"),
+        add_sentiment: bool = Query(False, description="Add sentiment emoji at the end"),
+    ):
+        """
+        Translate a large text document and stream the result back.
+
+        Send the document as a raw `text/plain` body or as a multipart file upload.
+        The translation is streamed as chunked `text/plain`, or as server-sent
+        events when the request has `Accept: text/event-stream`.
+        """
+        if density not in ["light", "medium", "heavy"]:
+            raise HTTPException(status_code=400, detail="Density must be 'light', 'medium', or 'heavy'")
+        if mode not in ["append", "replace"]:
+            raise HTTPException(status_code=400, detail="Mode must be 'append' or 'replace'")
+        if style not in ["fun", "professional", "meme"]:
+            raise HTTPException(status_code=400, detail="Style must be 'fun', 'professional', or 'meme'")
+
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_DOCUMENT_BYTES:
+            raise HTTPException(status_code=413, detail=f"Document too large (max {MAX_DOCUMENT_BYTES:,} bytes)")
+
+        # Documents run far longer than single texts; disconnects still cancel them
+        deadline = request_deadline.get()
+        if deadline is not None:
+            deadline.restart(DOCUMENT_BUDGET)
+
+        document = DocumentTranslator(translator, density=density, mode=mode, style=style,
+                                      add_sentiment=add_sentiment)
+        sse = "text/event-stream" in request.headers.get("accept", "")
+
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            # Starlette spools file parts to disk above 1 MB, so memory stays bounded
+            form = await request.form()
+            upload = next((value for value in form.values() if hasattr(value, "read")), None)
+            if upload is None:
+                await form.close()
+                raise HTTPException(status_code=400, detail="Multipart upload must contain a file field")
+            chunks = _iter_upload(upload, form)
+        else:
+            # Raw bodies are translated straight from the ASGI receive stream
+            chunks = request.stream()
+
+        return DocumentStreamResponse(
+            _translate_stream(chunks, document, sse, pool),
+            media_type="text/event-stream" if sse else "text/plain; charset=utf-8",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return router
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Shared Translation Engine
+Process-wide singletons shared by every API tier: translator, translation pool,
+QoS scheduler, admission control, request coalescing, micro-batching, bulk job
+queue, translation cache, memory governor, request log, heavy hitters,
+out-of-vocabulary profiler, cache warm-up, startup probe, static assets, rate
+limiter, plan resolver, usage store, key signer and caches
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from translator import EmojiTranslator
+from static_assets import PrecompressedStatic
+from rate_limit import RATE_LIMIT_BACKEND, RateLimiter, create_backend
+from usage_store import USAGE_DB_PATH, UsageStore, open_usage_store
+from signed_keys import KeySigner, RevocationList, load_secrets
+from pool import TranslationPool
+from scheduler import QOS_ENABLED, plan_weights
+from admission import ADMISSION_ENABLED, AdmissionController
+from singleflight import SingleFlight
+from microbatch import MicroBatcher
+from jobs import JOBS_DB_PATH, JobQueue
+from translation_cache import DISK_CACHE_PATH, TranslationCache, open_translation_cache
+from memory_governor import ADMIN_TOKEN, MemoryGovernor
+from warmup import REQUEST_LOG_PATH, WARMUP_ENABLED, WARMUP_SIZE, CacheWarmer, RequestLog, frequent_keys
+from heavy_hitters import HEAVY_HITTERS_ENABLED, HeavyHitters
+from oov_profiler import CONTEXTS_PER_WORD, OOV_SAMPLE_RATE, OOVProfiler
+from health import StartupProbe, register_readiness
+from metrics import register_metrics
+
+STATIC_DIRECTORY = os.environ.get("EMOJI_STATIC_DIR", "static")
+CUSTOM_EMOJI_FILE = os.environ.get("EMOJI_CUSTOM_EMOJIS")
+# Reference text for the readiness self-test; it must gain emojis when translated
+SELF_TEST_TEXT = "Good morning! I love coffee and pizza. This project is on fire!"
+
+_lock = threading.Lock()
+_translator: Optional[EmojiTranslator] = None
+_static_files: Optional[PrecompressedStatic] = None
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_created = False
+_usage_store: Optional[UsageStore] = None
+_usage_store_opened = False
+_key_signer: Optional[KeySigner] = None
+_translation_pool: Optional[TranslationPool] = None
+_admission: Optional[AdmissionController] = None
+_plan_resolver: Optional[Callable[[str], Optional[str]]] = None
+_coalescers: Dict[str, SingleFlight] = {}
+_micro_batchers: Dict[str, MicroBatcher] = {}
+_job_queue: Optional[JobQueue] = None
+_translation_cache: Optional[TranslationCache] = None
+_memory_governor: Optional[MemoryGovernor] = None
+_request_log: Optional[RequestLog] = None
+_request_log_opened = False
+_heavy_hitters: Optional[HeavyHitters] = None
+_heavy_hitters_created = False
+_oov_profiler: Optional[OOVProfiler] = None
+_oov_profiler_created = False
+_cache_warmer: Optional[CacheWarmer] = None
+_cache_warmer_created = False
+_startup_probe: Optional[StartupProbe] = None
+
+
+def get_translator() -> EmojiTranslator:
+    """Return the translator shared by all tiers in this process."""
+    global _translator
+    if _translator is None:
+        with _lock:
+            if _translator is None:
+                _translator = EmojiTranslator(custom_emoji_file=CUSTOM_EMOJI_FILE)
+    return _translator
+
+
+def get_static_files() -> PrecompressedStatic:
+    """Return the precompressed static assets shared by all tiers in this process."""
+    global _static_files
+    if _static_files is None:
+        with _lock:
+            if _static_files is None:
+                _static_files = PrecompressedStatic(STATIC_DIRECTORY)
+    return _static_files
+
+
+def set_plan_resolver(resolver: Optional[Callable[[str], Optional[str]]]) -> None:
+    """Install the API key -> plan lookup; the tier that issues keys provides it."""
+    global _plan_resolver
+    _plan_resolver = resolver
+
+
+def resolve_plan(api_key: str) -> Optional[str]:
+    """Plan of a valid API key, or None if no tier resolves keys or the key is unknown."""
+    resolver = _plan_resolver
+    return resolver(api_key) if resolver is not None else None
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the rate limiter shared by all tiers, or None if rate limiting is off."""
+    global _rate_limiter, _rate_limiter_created
+    if not _rate_limiter_created:
+        with _lock:
+            if not _rate_limiter_created:
+                backend = create_backend(RATE_LIMIT_BACKEND)
+                _rate_limiter = RateLimiter(backend, resolve_plan=resolve_plan) if backend is not None else None
+                _rate_limiter_created = True
+    return _rate_limiter
+
+
+def get_usage_store() -> Optional[UsageStore]:
+    """Return the persistent usage store shared by all tiers, or None if persistence is off."""
+    global _usage_store, _usage_store_opened
+    if not _usage_store_opened:
+        with _lock:
+            if not _usage_store_opened:
+                _usage_store = open_usage_store(USAGE_DB_PATH)
+                _usage_store_opened = True
+    return _usage_store
+
+
+def get_key_signer() -> KeySigner:
+    """Return the API key signer, sharing its secret and revocations through the usage store."""
+    global _key_signer
+    if _key_signer is None:
+        store = get_usage_store()
+        with _lock:
+            if _key_signer is None:
+                _key_signer = KeySigner(load_secrets(store=store), RevocationList(store))
+    return _key_signer
+
+
+def get_translation_pool() -> TranslationPool:
+    """Return the worker pool every tier runs translations on."""
+    global _translation_pool
+    if _translation_pool is None:
+        with _lock:
+            if _translation_pool is None:
+                _translation_pool = TranslationPool(weights=plan_weights() if QOS_ENABLED else None)
+                register_metrics("translation_pool", _translation_pool.stats)
+                if _translation_pool.scheduled:
+                    register_metrics("scheduler", _translation_pool.scheduler_stats)
+    return _translation_pool
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Return the shared admission controller, or None if load shedding is off."""
+    global _admission
+    if _admission is None and ADMISSION_ENABLED:
+        pool = get_translation_pool()
+        with _lock:
+            if _admission is None:
+                _admission = AdmissionController(pool)
+                register_metrics("admission", _admission.stats)
+    return _admission
+
+
+def get_coalescer(name: str) -> SingleFlight:
+    """
+    Return the single-flight group for one kind of translation result, such as
+    a tier's response body; results of different kinds never share a group.
+    """
+    coalescer = _coalescers.get(name)
+    if coalescer is None:
+        with _lock:
+            coalescer = _coalescers.get(name)
+            if coalescer is None:
+                coalescer = _coalescers[name] = SingleFlight()
+                register_metrics("coalescing", lambda: {
+                    group: flight.stats() for group, flight in sorted(_coalescers.items())
+                })
+    return coalescer
+
+
+def get_micro_batcher(name: str, fn: Callable) -> MicroBatcher:
+    """Return the micro-batcher running `fn` over small requests of one kind, e.g. a tier's."""
+    batcher = _micro_batchers.get(name)
+    if batcher is None:
+        pool = get_translation_pool()
+        with _lock:
+            batcher = _micro_batchers.get(name)
+            if batcher is None:
+                batcher = _micro_batchers[name] = MicroBatcher(pool, fn)
+                register_metrics("microbatch", lambda: {
+                    group: batcher.stats() for group, batcher in sorted(_micro_batchers.items())
+                })
+    return batcher
+
+
+def get_job_queue() -> JobQueue:
+    """Return the bulk translation job queue; its workers start with the app."""
+    global _job_queue
+    if _job_queue is None:
+        translator = get_translator()
+        with _lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(JOBS_DB_PATH, translator)
+                register_metrics("jobs", _job_queue.stats)
+    return _job_queue
+
+
+def get_translation_cache() -> TranslationCache:
+    """Return the translation cache: memory per process, disk shared by all workers."""
+    global _translation_cache
+    if _translation_cache is None:
+        translator = get_translator()
+        governor = get_memory_governor()
+        with _lock:
+            if _translation_cache is None:
+                _translation_cache = open_translation_cache(lambda: translator.lexicon_version, DISK_CACHE_PATH)
+                register_metrics("translation_cache", _translation_cache.stats)
+                governor.register("translation_cache", _translation_cache.memory)
+    return _translation_cache
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Return the governor every in-process cache registers with."""
+    global _memory_governor
+    if _memory_governor is None:
+        with _lock:
+            if _memory_governor is None:
+                _memory_governor = MemoryGovernor()
+                register_metrics("memory", _memory_governor.stats)
+    return _memory_governor
+
+
+def get_request_log() -> Optional[RequestLog]:
+    """Return the log of translation keys that warm-up reads, or None if logging is off."""
+    global _request_log, _request_log_opened
+    if not _request_log_opened:
+        with _lock:
+            if not _request_log_opened:
+                if REQUEST_LOG_PATH:
+                    _request_log = RequestLog(REQUEST_LOG_PATH)
+                    register_metrics("request_log", _request_log.stats)
+                _request_log_opened = True
+    return _request_log
+
+
+def get_heavy_hitters() -> Optional[HeavyHitters]:
+    """
+    Return the tracker of the most frequent translation requests, shared with
+    other workers through the usage store when there is one, or None if off.
+    """
+    global _heavy_hitters, _heavy_hitters_created
+    if not _heavy_hitters_created:
+        store = get_usage_store()
+        with _lock:
+            if not _heavy_hitters_created:
+                if HEAVY_HITTERS_ENABLED:
+                    _heavy_hitters = HeavyHitters(store)
+                    register_metrics("heavy_hitters", _heavy_hitters.stats)
+                _heavy_hitters_created = True
+    return _heavy_hitters
+
+
+def get_oov_profiler() -> Optional[OOVProfiler]:
+    """
+    Return the profiler of words missing from the lexicon, attached to the
+    shared translator, or None if sampling is off.
+    """
+    global _oov_profiler, _oov_profiler_created
+    if not _oov_profiler_created:
+        translator = get_translator()
+        with _lock:
+            if not _oov_profiler_created:
+                if OOV_SAMPLE_RATE > 0:
+                    # Example contexts are user text: keep them only if /admin/oov can be read
+                    _oov_profiler = OOVProfiler(contexts_per_word=CONTEXTS_PER_WORD if ADMIN_TOKEN else 0)
+                    translator.oov_profiler = _oov_profiler
+                    register_metrics("oov", _oov_profiler.stats)
+                _oov_profiler_created = True
+    return _oov_profiler
+
+
+def _warmup_keys() -> list:
+    """Keys to warm: all workers' heavy hitters, or else the most frequent in the request log."""
+    heavy_hitters = get_heavy_hitters()
+    keys = heavy_hitters.hot_keys(WARMUP_SIZE) if heavy_hitters is not None and heavy_hitters.store else []
+    return keys or (frequent_keys(REQUEST_LOG_PATH) if REQUEST_LOG_PATH else [])
+
+
+def get_cache_warmer() -> Optional[CacheWarmer]:
+    """
+    Return the warmer that fills the translation cache with the most frequent
+    requests, or None with nothing to learn them from; readiness waits for it
+    once it is started.
+    """
+    global _cache_warmer, _cache_warmer_created
+    if not _cache_warmer_created:
+        translator = get_translator()
+        cache = get_translation_cache()
+        heavy_hitters = get_heavy_hitters()
+        shared = heavy_hitters is not None and heavy_hitters.store is not None
+        with _lock:
+            if not _cache_warmer_created:
+                if (REQUEST_LOG_PATH or shared) and WARMUP_ENABLED and cache.enabled:
+                    _cache_warmer = CacheWarmer(translator, cache, _warmup_keys)
+                    register_metrics("warmup", _cache_warmer.stats)
+                    register_readiness("cache_warmup", _cache_warmer.ready)
+                _cache_warmer_created = True
+    return _cache_warmer
+
+
+def _check_translation_pool() -> None:
+    """Make every threaded lane start a worker and run a no-op."""
+    for lane in get_translation_pool().lanes.values():
+        if lane.executor is not None:
+            lane.executor.submit(int).result(timeout=5)
+
+
+def _check_translation_cache() -> None:
+    """Look up a key, which opens the disk level when there is one."""
+    get_translation_cache().get(("", "medium", "append", "fun", False, None))
+
+
+def _self_test() -> None:
+    """Translate the reference text; compiles the phrase patterns on the first run."""
+    translated = get_translator().translate(SELF_TEST_TEXT, density="heavy", style="fun", seed=0)
+    if translated == SELF_TEST_TEXT:
+        raise RuntimeError("Self-test translation added no emojis")
+
+
+def get_startup_probe() -> StartupProbe:
+    """Return the probe that initializes the engine and self-tests it before /readyz reports ready."""
+    global _startup_probe
+    if _startup_probe is None:
+        with _lock:
+            if _startup_probe is None:
+                _startup_probe = StartupProbe([
+                    ("lexicon", lambda: get_translator().lexicon_version),
+                    ("static_assets", get_static_files),
+                    ("translation_pool", _check_translation_pool),
+                    ("translation_cache", _check_translation_cache),
+                ], _self_test)
+                register_metrics("startup", _startup_probe.stats)
+    return _startup_probe
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Fast-Path Serialization
+Lean request decoding and byte-level responses for the hot /translate routes,
+with content negotiation between JSON, MessagePack and plain text
+"""
+
+import json
+from typing import Any, Dict, Mapping, Optional
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from pydantic import BaseModel, ValidationError
+
+from deadline import DISCONNECTED, TranslationCancelled
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+VALID_DENSITIES = frozenset(["light", "medium", "heavy"])
+VALID_MODES = frozenset(["append", "replace"])
+VALID_STYLES = frozenset(["fun", "professional", "meme"])
+
+# Wire formats
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+FORMAT_TEXT = "text"
+
+MEDIA_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_MSGPACK: "application/msgpack",
+    FORMAT_TEXT: "text/plain; charset=utf-8",
+}
+MSGPACK_MEDIA_TYPES = frozenset(["application/msgpack", "application/x-msgpack", "application/vnd.msgpack"])
+TRUE_VALUES = frozenset(["1", "true", "yes", "on"])
+FALSE_VALUES = frozenset(["0", "false", "no", "off"])
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj)
+
+    def loads(data: bytes) -> Any:
+        """Parse JSON bytes."""
+        return orjson.loads(data)
+
+    JSONDecodeError = orjson.JSONDecodeError
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes."""
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data: bytes) -> Any:
+        """Parse JSON bytes."""
+        return json.loads(data)
+
+    JSONDecodeError = json.JSONDecodeError
+
+
+class TranslationSettings:
+    """Slotted, already-validated translation request."""
+
+    __slots__ = ("text", "density", "mode", "style", "add_sentiment", "seed")
+
+    def __init__(self, text: str, density: str, mode: str, style: str, add_sentiment: bool,
+                 seed: Optional[int] = None):
+        self.text = text
+        self.density = density
+        self.mode = mode
+        self.style = style
+        self.add_sentiment = add_sentiment
+        self.seed = seed
+
+    def is_valid(self) -> bool:
+        """True when the settings pass the same checks the API handlers apply."""
+        return (self.density in VALID_DENSITIES
+                and self.mode in VALID_MODES
+                and self.style in VALID_STYLES
+                and bool(self.text.strip()))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "density": self.density,
+            "mode": self.mode,
+            "style": self.style,
+            "add_sentiment": self.add_sentiment,
+        }
+
+
+def _media_type(header: str) -> str:
+    return header.split(";", 1)[0].strip().lower()
+
+
+def request_format(content_type: Optional[str]) -> str:
+    """Wire format of a request body, from its Content-Type header."""
+    media_type = _media_type(content_type or "")
+    if media_type in MSGPACK_MEDIA_TYPES:
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="MessagePack support is not installed on this server")
+        return FORMAT_MSGPACK
+    if media_type == "text/plain":
+        return FORMAT_TEXT
+    return FORMAT_JSON
+
+
+def _quality(item: str) -> float:
+    """The q-value of one Accept header item; 1 when absent or malformed."""
+    for parameter in item.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return min(max(float(value), 0.0), 1.0)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def response_format(accept: Optional[str], default: str = FORMAT_JSON) -> str:
+    """
+    Pick the response format from an Accept header.
+
+    The supported media type with the highest q-value wins, the first listed
+    among equals; a wildcard stands for `default`, which is normally the
+    format the request body arrived in, as does a missing header.
+    """
+    best, best_quality = default, 0.0
+    for item in (accept or "").split(","):
+        media_type = _media_type(item)
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            fmt = FORMAT_MSGPACK
+        elif media_type == "text/plain":
+            fmt = FORMAT_TEXT
+        elif media_type == "application/json":
+            fmt = FORMAT_JSON
+        elif media_type in ("*/*", "application/*", "text/*"):
+            fmt = default
+        else:
+            continue
+        quality = _quality(item)
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+
+def decode_payload(body: bytes, fmt: str) -> Any:
+    """Decode a JSON or MessagePack body; raises ValueError on malformed input."""
+    if fmt == FORMAT_MSGPACK:
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:
+            raise ValueError(str(e))
+    try:
+        return loads(body)
+    except JSONDecodeError as e:
+        raise ValueError(str(e))
+
+
+def query_settings(params: Mapping[str, str], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """Translation settings from query parameters, for plain-text bodies."""
+    settings = dict(defaults)
+    for key in ("density", "mode", "style"):
+        if key in params:
+            settings[key] = params[key]
+    if "add_sentiment" in params:
+        value = params["add_sentiment"].lower()
+        if value in TRUE_VALUES:
+            settings["add_sentiment"] = True
+        elif value in FALSE_VALUES:
+            settings["add_sentiment"] = False
+        else:
+            settings["add_sentiment"] = params["add_sentiment"]
+    return settings
+
+
+def settings_from_payload(payload: Any, defaults: Dict[str, Any]) -> Optional[TranslationSettings]:
+    """
+    Build settings from a decoded payload without a pydantic model.
+
+    Returns None whenever the payload is anything other than the plain, well-typed
+    common case; callers then fall back to full pydantic validation so error
+    responses stay exactly as before.
+    """
+    if type(payload) is not dict:
+        return None
+
+    text = payload.get("text")
+    density = payload.get("density", defaults["density"])
+    mode = payload.get("mode", defaults["mode"])
+    style = payload.get("style", defaults["style"])
+    add_sentiment = payload.get("add_sentiment", defaults["add_sentiment"])
+    seed = payload.get("seed")
+
+    if (type(text) is not str or type(density) is not str or type(mode) is not str
+            or type(style) is not str or type(add_sentiment) is not bool
+            or (seed is not None and type(seed) is not int)):
+        return None
+    return TranslationSettings(text, density, mode, style, add_sentiment, seed)
+
+
+def decode_translation_request(body: bytes, defaults: Dict[str, Any], fmt: str = FORMAT_JSON,
+                               params: Optional[Mapping[str, str]] = None) -> Optional[TranslationSettings]:
+    """Decode a translation request body in any wire format; None means "use the model path"."""
+    if fmt == FORMAT_TEXT:
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return settings_from_payload(dict(query_settings(params or {}, defaults), text=text), defaults)
+    try:
+        payload = decode_payload(body, fmt)
+    except ValueError:
+        return None
+    return settings_from_payload(payload, defaults)
+
+
+def validate_with_model(model: type, body: bytes, fmt: str = FORMAT_JSON,
+                        params: Optional[Mapping[str, str]] = None,
+                        defaults: Optional[Dict[str, Any]] = None) -> BaseModel:
+    """Full pydantic validation, reporting errors the way FastAPI does for a body parameter."""
+    try:
+        if fmt == FORMAT_JSON:
+            return model.model_validate_json(body)
+        if fmt == FORMAT_TEXT:
+            payload = query_settings(params or {}, defaults or {})
+            payload["text"] = body.decode("utf-8", errors="replace")
+            return model.model_validate(payload)
+        try:
+            payload = decode_payload(body, fmt)
+        except ValueError as e:
+            raise RequestValidationError([{
+                "type": "msgpack_invalid", "loc": ("body",), "msg": f"Invalid MessagePack: {e}", "input": None,
+            }], body=body)
+        return model.model_validate(payload)
+    except ValidationError as e:
+        errors = []
+        for error in e.errors(include_url=False):
+            error = dict(error)
+            error["loc"] = ("body",) + tuple(error["loc"])
+            errors.append(error)
+        raise RequestValidationError(errors, body=body)
+
+
+def _inline_refs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve local `$defs` references so the schema can be embedded anywhere."""
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref[len("#/$defs/"):]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+def request_body_schema(model: type, text_body: bool = False) -> Dict[str, Any]:
+    """OpenAPI `requestBody` for routes that read the raw body but accept `model`."""
+    schema = _inline_refs(model.model_json_schema())
+    content = {"application/json": {"schema": schema}}
+    if msgpack is not None:
+        content["application/msgpack"] = {"schema": schema}
+    if text_body:
+        content["text/plain"] = {"schema": {"type": "string"}}
+    return {"requestBody": {"content": content, "required": True}}
+
+
+class JSONBytesResponse(Response):
+    """Response whose content is already-encoded JSON bytes."""
+
+    media_type = "application/json"
+
+
+def json_response(obj: Any, status_code: int = 200) -> JSONBytesResponse:
+    """Encode `obj` once, straight to the response body."""
+    return JSONBytesResponse(content=dumps(obj), status_code=status_code)
+
+
+def encode_response(obj: Any, fmt: str, text: Optional[str] = None, status_code: int = 200) -> Response:
+    """
+    Encode a response body in the negotiated format.
+
+    Plain-text responses carry only `text`, the translated output.
+    """
+    if fmt == FORMAT_TEXT:
+        return Response(content=(text or "").encode("utf-8"), status_code=status_code,
+                        media_type=MEDIA_TYPES[FORMAT_TEXT])
+    if fmt == FORMAT_MSGPACK:
+        return Response(content=msgpack.packb(obj, use_bin_type=True), status_code=status_code,
+                        media_type=MEDIA_TYPES[FORMAT_MSGPACK])
+    return json_response(obj, status_code=status_code)
+
+
+def translation_error(e: Exception, prefix: str = "Translation error") -> HTTPException:
+    """
+    Wrap an unexpected translator failure the way the API handlers do. Cancelled
+    translations become 499 (client gone, nginx's convention) or 504 (budget spent).
+    """
+    if isinstance(e, TranslationCancelled):
+        if e.reason == DISCONNECTED:
+            return HTTPException(status_code=499, detail="Client closed request")
+        return HTTPException(status_code=504, detail="Translation exceeded the request time budget")
+    return HTTPException(status_code=500, detail=f"{prefix}: {str(e)}")
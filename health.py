@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Liveness and Readiness
+Near-free /livez, and /readyz backed by a registry of readiness checks
+
+/livez answers from pre-encoded bytes in the outermost middleware, before
+routing or any other middleware runs: it says only that the process and its
+event loop are alive, and it never waits for warm-up.
+
+/readyz answers 503 until every registered check passes, so load balancers
+keep a cold worker out of rotation. StartupProbe contributes one check per
+engine component it initializes off the event loop (lexicon, translation
+pool, caches, ...) and a final self-test: a reference translation that must
+complete within SELF_TEST_BUDGET. Other components, such as cache warm-up,
+register their own checks.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter
+
+from fastpath import json_response
+
+logger = logging.getLogger(__name__)
+
+SELF_TEST_BUDGET = float(os.environ.get("EMOJI_SELF_TEST_BUDGET_MS", 50)) / 1000
+# The first attempt pays for cold regex caches; later ones show the steady state
+SELF_TEST_ATTEMPTS = 3
+
+LIVEZ_PATH = "/livez"
+LIVEZ_BODY = b'{"status":"alive"}'
+LIVEZ_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(LIVEZ_BODY)).encode("ascii")),
+    (b"cache-control", b"no-store"),
+]
+
+_lock = threading.Lock()
+_checks: Dict[str, Callable[[], bool]] = {}
+
+
+def register_readiness(name: str, check: Callable[[], bool]) -> None:
+    """Require `check()` to be true before reporting ready; registering a name again replaces it."""
+    with _lock:
+        _checks[name] = check
+
+
+def unregister_readiness(name: str) -> None:
+    with _lock:
+        _checks.pop(name, None)
+
+
+def readiness() -> Tuple[bool, Dict[str, bool]]:
+    """Overall readiness and the result of every check."""
+    with _lock:
+        checks = dict(_checks)
+    results = {name: bool(check()) for name, check in sorted(checks.items())}
+    return all(results.values()), results
+
+
+class StartupProbe:
+    """
+    Initialize engine components in a background thread, then time a
+    self-test translation; each step is a readiness check of its own.
+    """
+
+    def __init__(self, steps: Sequence[Tuple[str, Callable[[], None]]], self_test: Callable[[], None],
+                 budget: float = SELF_TEST_BUDGET, attempts: int = SELF_TEST_ATTEMPTS,
+                 clock=time.perf_counter):
+        self.steps = list(steps)
+        self.self_test = self_test
+        self.budget = budget
+        self.attempts = attempts
+        self.clock = clock
+        self.completed: List[str] = []
+        self.self_test_ms: Optional[float] = None
+        self.passed = False
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self) -> None:
+        """Register a readiness check per step, plus one for the self-test."""
+        for name, _ in self.steps:
+            register_readiness(name, lambda name=name: name in self.completed)
+        register_readiness("self_test", lambda: self.passed)
+
+    def start(self) -> None:
+        """Register the checks and run the probe in the background; calling it again is harmless."""
+        if self._thread is not None:
+            return
+        self.register()
+        self._thread = threading.Thread(target=self.run, name="startup-probe", daemon=True)
+        self._thread.start()
+
+    def run(self) -> None:
+        try:
+            for name, step in self.steps:
+                step()
+                self.completed.append(name)
+            for _ in range(self.attempts):
+                start = self.clock()
+                self.self_test()
+                elapsed = self.clock() - start
+                self.self_test_ms = round(elapsed * 1000, 3)
+                if elapsed <= self.budget:
+                    self.passed = True
+                    return
+            self.error = f"Self-test took {self.self_test_ms} ms, over its {self.budget * 1000:g} ms budget"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        logger.error("Startup probe failed; staying unready: %s", self.error)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "completed": list(self.completed),
+            "self_test_ms": self.self_test_ms,
+            "budget_ms": self.budget * 1000,
+            "passed": self.passed,
+            "error": self.error,
+        }
+
+
+class LivenessMiddleware:
+    """Answer /livez from constant bytes, ahead of routing and every other middleware."""
+
+    def __init__(self, app, path: str = LIVEZ_PATH):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] == self.path:
+            await send({"type": "http.response.start", "status": 200, "headers": LIVEZ_HEADERS})
+            await send({"type": "http.response.body", "body": LIVEZ_BODY})
+            return
+        await self.app(scope, receive, send)
+
+
+def create_health_router(on_startup: Sequence[Callable[[], None]] = ()) -> APIRouter:
+    """Build the router exposing `/readyz`; `on_startup` runs when the app starts, e.g. warm-up."""
+    router = APIRouter(on_startup=list(on_startup))
+
+    @router.get("/readyz")
+    async def readyz():
+        """200 once every readiness check passes, 503 until then."""
+        ready, checks = readiness()
+        return json_response({"ready": ready, "checks": checks}, status_code=200 if ready else 503)
+
+    return router
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Heavy Hitters
+Most frequent translation requests in fixed memory, mergeable across workers
+
+Two sketches are fed with every translation key (text, settings, seed):
+
+- A Count-Min Sketch of `depth` rows of `width` counters estimates how often
+  any key was seen. Estimates never undercount, and overcount by at most
+  e / width of all requests with probability 1 - e**-depth; at the default
+  2048 x 4 that is 0.13% of traffic, 98% of the time, in 64 KiB.
+- A Space-Saving summary (a stream summary of count buckets, O(1) per update)
+  keeps the `capacity` keys most likely to be heavy, each with an upper and a
+  lower bound on its count. Any key seen more often than total / capacity is
+  guaranteed to be among them.
+
+Both merge: counters add up, and merged candidates are re-ranked by the
+merged Count-Min estimate. Each worker sends what it saw since its last sync
+to the shared usage store, which holds the sum for all workers, and reads the
+merged sketch back. Counts halve every EMOJI_HEAVY_HITTERS_HALF_LIFE_S, so
+yesterday's hot texts make way for today's.
+
+The result is what is worth precomputing: cache warm-up reads hot_keys(),
+and GET /admin/hot lists them with their counts (served only once
+EMOJI_ADMIN_TOKEN is set).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from fastapi import APIRouter, Request
+
+from memory_governor import ADMIN_TOKEN, check_admin_token
+
+logger = logging.getLogger(__name__)
+
+HEAVY_HITTERS_ENABLED = os.environ.get("EMOJI_HEAVY_HITTERS", "on").lower() not in ("0", "off", "false", "no")
+SKETCH_WIDTH = int(os.environ.get("EMOJI_HEAVY_HITTERS_WIDTH", 2048))
+SKETCH_DEPTH = int(os.environ.get("EMOJI_HEAVY_HITTERS_DEPTH", 4))
+CAPACITY = int(os.environ.get("EMOJI_HEAVY_HITTERS_CAPACITY", 1000))
+HALF_LIFE = float(os.environ.get("EMOJI_HEAVY_HITTERS_HALF_LIFE_S", 24 * 3600))
+# Longer texts are rarely repeated and would make the summary's memory unbounded in practice
+MAX_TEXT_CHARS = 2000
+# Name of the merged sketch in the usage store
+STORE_NAME = "heavy_hitters"
+
+_HEADER = struct.Struct("<IIIq")
+
+
+def _hash(key: Tuple) -> Tuple[int, int]:
+    """Two independent 64-bit hashes of a key, stable across processes."""
+    data = "\x1f".join(map(str, key)).encode("utf-8", "surrogatepass")
+    digest = int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), "little")
+    # An odd step visits distinct columns in every row
+    return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+
+class CountMinSketch:
+    """Frequency estimates that never undercount; `merge` gives the sketch of both streams."""
+
+    __slots__ = ("width", "depth", "counts", "total")
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, counts: Optional[array] = None,
+                 total: int = 0):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else array("Q", bytes(8 * width * depth))
+        self.total = total
+
+    def _cells(self, hashes: Tuple[int, int]) -> List[int]:
+        h1, h2 = hashes
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, hashes: Tuple[int, int], count: int = 1) -> None:
+        counts = self.counts
+        for cell in self._cells(hashes):
+            counts[cell] += count
+        self.total += count
+
+    def estimate(self, hashes: Tuple[int, int]) -> int:
+        counts = self.counts
+        return min(counts[cell] for cell in self._cells(hashes))
+
+    @property
+    def error_bound(self) -> int:
+        """Overcount of any estimate, with probability 1 - e**-depth."""
+        return int(2.718281828 * self.total / self.width)
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        """Fold `other` into this sketch in place and return self."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge sketches of different dimensions")
+        self.counts = array("Q", map(int.__add__, self.counts, other.counts))
+        self.total += other.total
+        return self
+
+    def halve(self, times: int = 1) -> None:
+        self.counts = array("Q", (count >> times for count in self.counts))
+        self.total >>= times
+
+
+class SpaceSaving:
+    """
+    The `capacity` most frequent items of a stream. Items are grouped in
+    buckets by count, so counting one and replacing the least frequent are
+    both O(1).
+    """
+
+    __slots__ = ("capacity", "_entries", "_buckets", "_min")
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        # item -> [count, error]; count is an upper bound, count - error a lower bound
+        self._entries: Dict[Hashable, List[int]] = {}
+        # count -> items with that count, oldest first
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}
+        self._min = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _place(self, item: Hashable, count: int) -> None:
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = {}
+        bucket[item] = None
+
+    def _unplace(self, item: Hashable, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+            if count == self._min:
+                # Counts move up by one, so the next bucket up is now the lowest
+                self._min = count + 1
+
+    def add(self, item: Hashable) -> Optional[Hashable]:
+        """Count an item; returns the item it displaced from the summary, if any."""
+        entry = self._entries.get(item)
+        if entry is not None:
+            self._unplace(item, entry[0])
+            entry[0] += 1
+            self._place(item, entry[0])
+        elif len(self._entries) < self.capacity:
+            self._entries[item] = [1, 0]
+            self._place(item, 1)
+            self._min = 1
+        else:
+            # Replace the oldest of the least frequent items; the newcomer may
+            # have been seen up to that many times before
+            floor = self._min
+            victim = next(iter(self._buckets[floor]))
+            self._unplace(victim, floor)
+            del self._entries[victim]
+            self._entries[item] = [floor + 1, floor]
+            self._place(item, floor + 1)
+            return victim
+        return None
+
+    def entries(self) -> Dict[Hashable, Tuple[int, int]]:
+        """item -> (upper bound, lower bound) of its count."""
+        return {item: (count, count - error) for item, (count, error) in self._entries.items()}
+
+    def replace(self, entries: Dict[Hashable, Tuple[int, int]]) -> None:
+        """Keep the `capacity` items with the highest upper bounds from `entries`."""
+        ranked = sorted(entries.items(), key=lambda entry: entry[1][0], reverse=True)[:self.capacity]
+        self._entries = {}
+        self._buckets = {}
+        for item, (count, guaranteed) in ranked:
+            if count > 0:
+                self._entries[item] = [count, count - max(0, guaranteed)]
+                self._place(item, count)
+        self._min = min(self._buckets, default=0)
+
+
+class HeavyHitterSketch:
+    """A Count-Min Sketch and a Space-Saving summary of the same stream of translation keys."""
+
+    __slots__ = ("counts", "candidates", "epoch")
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, capacity: int = CAPACITY,
+                 epoch: int = 0):
+        self.counts = CountMinSketch(width, depth)
+        self.candidates = SpaceSaving(capacity)
+        self.epoch = epoch
+
+    def add(self, key: Tuple, hashes: Tuple[int, int]) -> None:
+        self.counts.add(hashes)
+        self.candidates.add(key)
+
+    def decay(self, epoch: int) -> None:
+        """Halve all counts once per half-life elapsed since this sketch's epoch."""
+        if epoch <= self.epoch:
+            return
+        times = min(epoch - self.epoch, 63)
+        self.counts.halve(times)
+        self.candidates.replace({item: (count >> times, guaranteed >> times)
+                                 for item, (count, guaranteed) in self.candidates.entries().items()})
+        self.epoch = epoch
+
+    def merge(self, other: "HeavyHitterSketch") -> "HeavyHitterSketch":
+        """Fold `other` into this sketch in place and return self."""
+        if other.epoch < self.epoch:
+            other = other.copy()
+            other.decay(self.epoch)
+        else:
+            self.decay(other.epoch)
+        self.counts.merge(other.counts)
+        ours, theirs = self.candidates.entries(), other.candidates.entries()
+        merged = {}
+        for item in ours.keys() | theirs.keys():
+            # The merged Count-Min estimate is a tighter upper bound than the
+            # sum of both summaries' upper bounds
+            guaranteed = ours.get(item, (0, 0))[1] + theirs.get(item, (0, 0))[1]
+            merged[item] = (self.counts.estimate(_hash(item)), guaranteed)
+        self.candidates.replace(merged)
+        return self
+
+    def copy(self) -> "HeavyHitterSketch":
+        return HeavyHitterSketch.from_bytes(self.to_bytes())
+
+    def top(self, limit: int) -> List[Tuple[Tuple, int, int]]:
+        """Up to `limit` (key, estimated count, guaranteed count), most frequent first."""
+        ranked = []
+        for item, (count, guaranteed) in self.candidates.entries().items():
+            ranked.append((item, min(count, self.counts.estimate(_hash(item))), guaranteed))
+        ranked.sort(key=lambda entry: entry[1], reverse=True)
+        return ranked[:limit]
+
+    def to_bytes(self) -> bytes:
+        counts = self.counts
+        entries = [[list(item), count, guaranteed] for item, (count, guaranteed) in self.candidates.entries().items()]
+        return (_HEADER.pack(counts.width, counts.depth, self.candidates.capacity, self.epoch)
+                + struct.pack("<Q", counts.total) + counts.counts.tobytes()
+                + json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HeavyHitterSketch":
+        width, depth, capacity, epoch = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        (total,) = struct.unpack_from("<Q", data, offset)
+        offset += 8
+        sketch = cls(width, depth, capacity, epoch)
+        end = offset + 8 * width * depth
+        sketch.counts.counts = array("Q", data[offset:end])
+        sketch.counts.total = total
+        sketch.candidates.replace({tuple(item): (count, guaranteed)
+                                   for item, count, guaranteed in json.loads(data[end:].decode("utf-8"))})
+        return sketch
+
+
+def merge_stored(stored: Optional[bytes], delta: bytes) -> bytes:
+    """Merge function for the usage store: add one worker's delta to the shared sketch."""
+    if stored is None:
+        return delta
+    try:
+        merged = HeavyHitterSketch.from_bytes(stored)
+        return merged.merge(HeavyHitterSketch.from_bytes(delta)).to_bytes()
+    except (ValueError, struct.error):
+        # Dimensions changed since it was stored: start over from this worker's view
+        return delta
+
+
+class HeavyHitters:
+    """
+    This worker's heavy-hitter tracker. Without a store it counts its own
+    requests; with one, it syncs with every other worker on the store's
+    background thread.
+    """
+
+    def __init__(self, store=None, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH,
+                 capacity: int = CAPACITY, half_life: float = HALF_LIFE, clock=time.time):
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.half_life = half_life
+        self.clock = clock
+        self.store = store
+        self._lock = threading.Lock()
+        # Seen by this worker since the last sync (everything, without a store)
+        self._recent = HeavyHitterSketch(width, depth, capacity, self._epoch())
+        # Every worker's counts as of the last sync
+        self._shared: Optional[HeavyHitterSketch] = None
+        self.recorded = 0
+        self.syncs = 0
+        if store is not None:
+            store.add_reconciler(self.sync)
+
+    def _epoch(self) -> int:
+        return int(self.clock() // self.half_life)
+
+    def record(self, key: Tuple) -> None:
+        """Count one translation request."""
+        if len(key[0]) > MAX_TEXT_CHARS:
+            return
+        hashes = _hash(key)
+        with self._lock:
+            self._recent.add(key, hashes)
+            self.recorded += 1
+
+    def sync(self) -> None:
+        """Add what this worker saw to the shared sketch and read every worker's counts back."""
+        epoch = self._epoch()
+        with self._lock:
+            recent = self._recent
+            self._recent = HeavyHitterSketch(self.width, self.depth, self.capacity, epoch)
+        recent.decay(epoch)
+        try:
+            merged = self.store.merge_blob(STORE_NAME, recent.to_bytes(), merge_stored)
+        except Exception:
+            with self._lock:
+                self._recent.merge(recent)
+            raise
+        shared = HeavyHitterSketch.from_bytes(merged)
+        shared.decay(epoch)
+        with self._lock:
+            self._shared = shared
+        self.syncs += 1
+
+    def snapshot(self) -> HeavyHitterSketch:
+        """Counts as of now: every worker's as of the last sync, plus this worker's since."""
+        epoch = self._epoch()
+        with self._lock:
+            view = self._recent.copy()
+            shared = self._shared
+        view.decay(epoch)
+        if shared is not None:
+            view.merge(shared)
+        return view
+
+    def top(self, limit: int = 100) -> List[Tuple[Tuple, int, int]]:
+        return self.snapshot().top(limit)
+
+    def hot_keys(self, limit: int = CAPACITY) -> List[Tuple]:
+        """The `limit` most frequent translation keys, e.g. to warm or pin a cache with."""
+        if self.store is not None and self._shared is None:
+            # Right after start-up, before the first background sync
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Heavy hitter sync failed")
+        return [key for key, _, _ in self.top(limit)]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            tracked = len(self._recent.candidates)
+        return {
+            "recorded": self.recorded,
+            "tracked": tracked,
+            "syncs": self.syncs,
+            "sketch_bytes": 8 * self.width * self.depth,
+        }
+
+
+def create_hot_router(tracker: HeavyHitters, token: str = ADMIN_TOKEN) -> APIRouter:
+    """Build the router exposing `/admin/hot`, guarded by `token`; 403 for everyone without one."""
+    router = APIRouter()
+
+    @router.get("/admin/hot")
+    async def hot_requests(request: Request, limit: int = 100):
+        """Most frequent translation requests across workers, with bounds on their counts."""
+        check_admin_token(request, token)
+        view = tracker.snapshot()
+        return {
+            "total": view.counts.total,
+            "error_bound": view.counts.error_bound,
+            "capacity": view.candidates.capacity,
+            "items": [
+                {"key": list(key), "count": count, "guaranteed": guaranteed}
+                for key, count, guaranteed in view.top(max(1, min(limit, tracker.capacity)))
+            ],
+        }
+
+    return router
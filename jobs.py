@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Bulk Translation Jobs
+Durable SQLite job queue for large translations, with background workers,
+progress reporting and streamed results
+
+`POST /jobs` stores the input and returns a job ID at once; worker threads
+translate the document in CHECKPOINT_CHARS slices through DocumentTranslator,
+committing each slice's output together with the input offset reached, so a
+job resumes from its last checkpoint after a restart or a crash.
+
+A worker claims a job with a lease that every checkpoint renews. A job whose
+lease has run out (its worker died) is claimed again by any worker sharing the
+database, and a job that keeps failing is given up after MAX_ATTEMPTS. On
+shutdown, workers stop at the next checkpoint and hand their jobs back to the
+queue.
+
+Request handlers reach the database through run_in_threadpool, so a busy
+database never stalls the event loop. A plain-text result stream of a job that
+fails is aborted rather than completed, so a failure never passes for a short
+translation.
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from document_stream import MAX_DOCUMENT_BYTES, DocumentTranslator, format_sse
+from fastpath import VALID_DENSITIES, VALID_MODES, VALID_STYLES, query_settings
+from translator import EmojiTranslator
+
+logger = logging.getLogger(__name__)
+
+# Path of the job database; empty keeps jobs in memory, lost on restart
+JOBS_DB_PATH = os.environ.get("EMOJI_JOBS_DB", "emoji_jobs.db")
+JOB_WORKERS = int(os.environ.get("EMOJI_JOB_WORKERS", 1))
+# Input characters translated between checkpoints
+CHECKPOINT_CHARS = int(os.environ.get("EMOJI_JOB_CHECKPOINT_CHARS", 64 * 1024))
+# A claimed job whose worker has not checkpointed for this long is claimed again
+LEASE_SECONDS = float(os.environ.get("EMOJI_JOB_LEASE_S", 60.0))
+# Finished jobs and their results are deleted after this long
+RETENTION_SECONDS = float(os.environ.get("EMOJI_JOB_RETENTION_S", 7 * 24 * 3600))
+POLL_INTERVAL = 0.5
+MAX_ATTEMPTS = 3
+# Output chunks read per query while streaming results
+STREAM_PAGE = 64
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+JOB_DEFAULTS = {"density": "medium", "mode": "append", "style": "fun", "add_sentiment": False}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    total_chars INTEGER NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0,
+    chars_out INTEGER NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    sentiment TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_inputs (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS job_outputs (
+    id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class JobQueue:
+    """SQLite-backed job queue and the worker threads that drain it."""
+
+    def __init__(self, path: str, translator: EmojiTranslator, workers: int = JOB_WORKERS,
+                 checkpoint_chars: int = CHECKPOINT_CHARS, lease: float = LEASE_SECONDS,
+                 retention: float = RETENTION_SECONDS, clock=time.time):
+        self.path = path
+        self.translator = translator
+        self.workers = workers
+        self.checkpoint_chars = checkpoint_chars
+        self.lease = lease
+        self.retention = retention
+        self.clock = clock
+        # One connection shared under a lock: statements are short, and it also
+        # lets an in-memory database be used from every thread
+        self._db = sqlite3.connect(path or ":memory:", timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+        self._db_lock = threading.Lock()
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+        self.checkpoints = 0
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _transaction(self, statements) -> List[int]:
+        """Run (sql, params) pairs in one write transaction; returns their row counts."""
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                counts = [self._db.execute(sql, params).rowcount for sql, params in statements]
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        return counts
+
+    # Request path
+
+    def submit(self, text: str, settings: Dict[str, Any]) -> str:
+        """Store a job and wake a worker; returns the job ID."""
+        job_id = uuid.uuid4().hex
+        now = self.clock()
+        self._transaction([
+            ("INSERT INTO jobs (id, status, settings, total_chars, created_at, updated_at) "
+             "VALUES (?, ?, ?, ?, ?, ?)", (job_id, QUEUED, json.dumps(settings), len(text), now, now)),
+            ("INSERT INTO job_inputs (id, text) VALUES (?, ?)", (job_id, text)),
+        ])
+        self._wake.set()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT status, settings, total_chars, offset, chars_out, attempts, error, created_at, updated_at "
+            "FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        status, settings, total, offset, chars_out, attempts, error, created_at, updated_at = rows[0]
+        return {
+            "id": job_id,
+            "status": status,
+            "progress": 1.0 if status == DONE else round(offset / total, 4) if total else 0.0,
+            "characters_in": offset if status != DONE else total,
+            "total_characters": total,
+            "characters_out": chars_out,
+            "settings": json.loads(settings),
+            "attempts": attempts,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def results(self, job_id: str, after: int = -1, limit: int = STREAM_PAGE) -> List[tuple]:
+        """Output chunks of a job as (seq, text), in order, starting after `after`."""
+        return self._query(
+            "SELECT seq, text FROM job_outputs WHERE id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit)
+        )
+
+    # Workers
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job: queued, or running under an expired lease."""
+        now = self.clock()
+        owner = uuid.uuid4().hex
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, status, settings, total_chars, offset, chunks, sentiment, attempts "
+                    "FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1", (QUEUED, RUNNING, now)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?", (RUNNING, owner, now + self.lease, now, row[0])
+                    )
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job_id, status, settings, total, offset, chunks, sentiment, attempts = row
+        return {
+            "id": job_id, "owner": owner, "settings": json.loads(settings), "total": total,
+            "offset": offset, "chunks": chunks,
+            "sentiment": json.loads(sentiment) if sentiment else {}, "attempts": attempts + 1,
+            "was_started": offset > 0 or status == RUNNING,
+        }
+
+    def process_next(self) -> bool:
+        """Claim and work on one job; False when there was nothing to do."""
+        job = self.claim()
+        if job is None:
+            return False
+        if job["was_started"]:
+            self.resumed += 1
+        if job["attempts"] > MAX_ATTEMPTS:
+            self._finish(job, FAILED, error=f"Gave up after {MAX_ATTEMPTS} attempts")
+            return True
+        try:
+            self._process(job)
+        except Exception as e:
+            logger.exception("Translation job %s failed", job["id"])
+            self._finish(job, FAILED, error=str(e))
+        return True
+
+    def _process(self, job: Dict[str, Any]) -> None:
+        settings = job["settings"]
+        document = DocumentTranslator(self.translator, density=settings["density"], mode=settings["mode"],
+                                      style=settings["style"], add_sentiment=settings["add_sentiment"])
+        document.restore_sentiment(job["sentiment"])
+        fed = job["offset"]
+        while fed < job["total"]:
+            chunk = self._query(
+                "SELECT substr(text, ?, ?) FROM job_inputs WHERE id = ?",
+                (fed + 1, self.checkpoint_chars, job["id"])
+            )[0][0]
+            if not chunk:
+                raise RuntimeError("Job input is missing")
+            fed += len(chunk)
+            output = document.feed(chunk)
+            # Input still buffered is not covered by this checkpoint; a resumed
+            # job feeds it again
+            if not self._checkpoint(job, fed - document.buffered, output, document):
+                return
+            if self._stop.is_set():
+                self._release(job)
+                return
+        if self._checkpoint(job, fed, document.finish(), document):
+            self._finish(job, DONE)
+
+    def _checkpoint(self, job: Dict[str, Any], offset: int, output: str, document: DocumentTranslator) -> bool:
+        """Commit output and progress while the lease is still ours; False if it was lost."""
+        now = self.clock()
+        statements = []
+        if output:
+            statements.append(("INSERT INTO job_outputs (id, seq, text) VALUES (?, ?, ?)",
+                               (job["id"], job["chunks"], output)))
+        if not self._while_owned(job, (
+            "UPDATE jobs SET offset = ?, chars_out = chars_out + ?, chunks = chunks + ?, sentiment = ?, "
+            "lease_until = ?, updated_at = ? WHERE id = ? AND owner = ?",
+            (offset, len(output), 1 if output else 0, json.dumps(document.sentiment_state()),
+             now + self.lease, now, job["id"], job["owner"])
+        ), statements):
+            return False
+        if output:
+            job["chunks"] += 1
+        self.checkpoints += 1
+        return True
+
+    def _while_owned(self, job: Dict[str, Any], update, statements) -> bool:
+        """
+        Run `update`, which must match on the job's owner, then `statements`, in
+        one transaction; roll back and return False if another worker has taken
+        the job over since our lease ran out.
+        """
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute(*update).rowcount != 1:
+                    self._db.execute("ROLLBACK")
+                    return False
+                for sql, params in statements:
+                    self._db.execute(sql, params)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                raise
+        return True
+
+    def _release(self, job: Dict[str, Any]) -> None:
+        """Hand a job back to the queue at its last checkpoint."""
+        self._query(
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, attempts = attempts - 1, "
+            "updated_at = ? WHERE id = ? AND owner = ?", (QUEUED, self.clock(), job["id"], job["owner"])
+        )
+
+    def _finish(self, job: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        offset = "total_chars" if status == DONE else "offset"
+        if not self._while_owned(job, (
+            f"UPDATE jobs SET status = ?, error = ?, offset = {offset}, owner = NULL, lease_until = NULL, "
+            "updated_at = ? WHERE id = ? AND owner = ?", (status, error, self.clock(), job["id"], job["owner"])
+        ), [("DELETE FROM job_inputs WHERE id = ?", (job["id"],))]):
+            return
+        if status == DONE:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention period; returns how many."""
+        cutoff = self.clock() - self.retention
+        expired = [row[0] for row in self._query(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff)
+        )]
+        for job_id in expired:
+            self._transaction([
+                ("DELETE FROM job_outputs WHERE id = ?", (job_id,)),
+                ("DELETE FROM job_inputs WHERE id = ?", (job_id,)),
+                ("DELETE FROM jobs WHERE id = ?", (job_id,)),
+            ])
+        return len(expired)
+
+    def _run(self) -> None:
+        next_purge = 0.0
+        while not self._stop.is_set():
+            try:
+                if self.process_next():
+                    continue
+                now = time.monotonic()
+                if now >= next_purge:
+                    self.purge()
+                    next_purge = now + 3600
+            except sqlite3.Error:
+                logger.exception("Job queue error; will retry")
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the worker threads; calling it again is harmless."""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"translation-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Drain: workers stop at their next checkpoint and requeue unfinished jobs."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
+
+    def stats(self) -> Dict[str, object]:
+        counts = dict(self._query("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {
+            "workers": len(self._threads),
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "completed": self.completed,
+            "failures": self.failed,
+            "resumed": self.resumed,
+            "checkpoints": self.checkpoints,
+        }
+
+
+class JobFailed(Exception):
+    """The job behind a result stream failed, or disappeared, while it was streamed."""
+
+
+class JobResultResponse(StreamingResponse):
+    """Streaming response that is aborted, without its final chunk, when the job fails."""
+
+    async def stream_response(self, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        try:
+            async for chunk in self.body_iterator:
+                await send({"type": "http.response.body", "body": chunk.encode(self.charset), "more_body": True})
+        except JobFailed:
+            return
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, refused with a 413 as soon as it grows past `limit` bytes."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail=f"Document too large (max {limit:,} bytes)")
+    return bytes(body)
+
+
+async def _stream_results(queue: JobQueue, job_id: str, sse: bool) -> AsyncIterator[str]:
+    """Yield a job's output as it is committed, until the job finishes."""
+    after = -1
+    while True:
+        status = await run_in_threadpool(queue.status, job_id)
+        rows = await run_in_threadpool(queue.results, job_id, after)
+        for after, text in rows:
+            yield format_sse(text) if sse else text
+        if len(rows) == STREAM_PAGE:
+            continue
+        if status is None or status["status"] in FINISHED:
+            # Chunks committed before the status was read have all been sent
+            break
+        if sse:
+            yield format_sse(json.dumps({"progress": status["progress"]}), event="progress")
+        await asyncio.sleep(POLL_INTERVAL)
+    if sse:
+        if status is None or status["status"] == FAILED:
+            yield format_sse(status["error"] if status else "Job not found", event="error")
+        else:
+            yield format_sse(json.dumps({
+                "characters_in": status["total_characters"],
+                "characters_out": status["characters_out"],
+            }), event="done")
+    elif status is None or status["status"] == FAILED:
+        # Plain text has no way to say so in-band; the response is aborted
+        raise JobFailed(status["error"] if status else "Job not found")
+
+
+def create_jobs_router(queue: JobQueue) -> APIRouter:
+    """Build the router exposing `/jobs`; its workers start and drain with the app."""
+    router = APIRouter(on_startup=[queue.start], on_shutdown=[queue.close])
+
+    @router.post("/jobs", status_code=202)
+    async def submit_job(request: Request):
+        """
+        Queue a bulk translation and return its ID.
+
+        Send a JSON body with `text` and the usual settings, a raw `text/plain`
+        body, or a multipart file upload; for the last two, settings come from
+        the query string.
+        """
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > MAX_DOCUMENT_BYTES:
+            raise HTTPException(status_code=413, detail=f"Document too large (max {MAX_DOCUMENT_BYTES:,} bytes)")
+
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            try:
+                upload = next((value for value in form.values() if hasattr(value, "read")), None)
+                if upload is None:
+                    raise HTTPException(status_code=400, detail="Multipart upload must contain a file field")
+                body = await upload.read(MAX_DOCUMENT_BYTES + 1)
+            finally:
+                await form.close()
+            payload = query_settings(request.query_params, JOB_DEFAULTS)
+        else:
+            # Chunked bodies carry no Content-Length; stop reading at the limit
+            body = await _read_body(request, MAX_DOCUMENT_BYTES)
+            payload = query_settings(request.query_params, JOB_DEFAULTS)
+        if len(body) > MAX_DOCUMENT_BYTES:
+            raise HTTPException(status_code=413, detail=f"Document too large (max {MAX_DOCUMENT_BYTES:,} bytes)")
+        if content_type.startswith("application/json"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid JSON body")
+            if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+                raise HTTPException(status_code=400, detail="JSON body must contain a 'text' string")
+            text = payload["text"]
+        else:
+            text = body.decode("utf-8", errors="replace")
+
+        settings = {key: payload.get(key, default) for key, default in JOB_DEFAULTS.items()}
+        if settings["density"] not in VALID_DENSITIES:
+            raise HTTPException(status_code=400, detail="Density must be 'light', 'medium', or 'heavy'")
+        if settings["mode"] not in VALID_MODES:
+            raise HTTPException(status_code=400, detail="Mode must be 'append' or 'replace'")
+        if settings["style"] not in VALID_STYLES:
+            raise HTTPException(status_code=400, detail="Style must be 'fun', 'professional', or 'meme'")
+        if not isinstance(settings["add_sentiment"], bool):
+            raise HTTPException(status_code=400, detail="add_sentiment must be a boolean")
+        if not text.strip():
+            raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+        job_id = await run_in_threadpool(queue.submit, text, settings)
+        status_url = f"{request.url.path.rstrip('/')}/{job_id}"
+        return JSONResponse(status_code=202, content={
+            "id": job_id,
+            "status": QUEUED,
+            "status_url": status_url,
+            "result_url": f"{status_url}/result",
+        })
+
+    @router.get("/jobs/{job_id}")
+    async def get_job(job_id: str):
+        """Status and progress of a translation job."""
+        status = await run_in_threadpool(queue.status, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return status
+
+    @router.get("/jobs/{job_id}/result")
+    async def get_job_result(
+        job_id: str,
+        request: Request,
+        wait: bool = Query(True, description="Keep streaming until the job finishes"),
+    ):
+        """
+        Stream a job's translated output as chunked `text/plain`, or as
+        server-sent events with progress updates for `Accept: text/event-stream`.
+        Output already translated is sent at once, the rest as it is produced.
+        A plain-text stream whose job fails midway is aborted, never completed.
+        """
+        status = await run_in_threadpool(queue.status, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if not wait and status["status"] not in FINISHED:
+            raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+        if status["status"] == FAILED:
+            raise HTTPException(status_code=500, detail=f"Job failed: {status['error']}")
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        return JobResultResponse(
+            _stream_results(queue, job_id, sse),
+            media_type="text/event-stream" if sse else "text/plain; charset=utf-8",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return router
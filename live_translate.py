@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Live Translation Channel
+WebSocket endpoint that keeps per-connection state and pushes incremental updates
+"""
+
+import asyncio
+import difflib
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from fastpath import VALID_DENSITIES, VALID_MODES, VALID_STYLES
+from pool import TranslationPool
+from translator import EmojiTranslator
+
+DEFAULT_SETTINGS = {
+    "density": "medium",
+    "mode": "append",
+    "style": "fun",
+    "add_sentiment": False,
+}
+
+# Edits arriving within this window of each other are folded into one translation
+COALESCE_WINDOW = 0.12
+# A continuous stream of edits is still translated at least this often
+MAX_COALESCE_DELAY = 0.5
+MAX_TEXT_LENGTH = 10000
+# Above this size the changed middle is sent as a single span instead of being diffed
+MAX_DIFF_LENGTH = 2000
+
+
+def diff_spans(old: str, new: str) -> List[Dict[str, Any]]:
+    """
+    Return the spans of `old` that must be replaced to obtain `new`.
+
+    Spans are sorted by position and refer to offsets in `old`; clients apply
+    them from last to first so earlier offsets stay valid.
+    """
+    if old == new:
+        return []
+
+    # Trim the common prefix and suffix first; typing usually touches one region
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+
+    if len(old_mid) + len(new_mid) > MAX_DIFF_LENGTH:
+        return [{"start": prefix, "end": prefix + len(old_mid), "text": new_mid}]
+
+    spans = []
+    matcher = difflib.SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            spans.append({"start": prefix + i1, "end": prefix + i2, "text": new_mid[j1:j2]})
+    return spans
+
+
+class LiveTranslationSession:
+    """State for one WebSocket connection: settings, input text and last output."""
+
+    def __init__(self, translator: EmojiTranslator, window: float = COALESCE_WINDOW,
+                 max_delay: float = MAX_COALESCE_DELAY, pool: Optional[TranslationPool] = None,
+                 seed: Optional[int] = None):
+        self.translator = translator
+        self.pool = pool
+        # One seed per session keeps the emoji choices for unchanged text stable
+        # across edits, so patches only cover what the edit actually changed
+        self.seed = random.randrange(2 ** 31) if seed is None else seed
+        self.window = window
+        self.max_delay = max_delay
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.text = ""
+        self.output = ""
+        self.rev = 0
+        self.translations = 0
+        self._dirty = asyncio.Event()
+        self._first_edit = 0.0
+        self._last_edit = 0.0
+
+    def apply_message(self, message: Dict[str, Any]) -> Optional[str]:
+        """Apply a client message to the session state. Returns an error message or None."""
+        kind = message.get("type")
+
+        if kind == "settings":
+            settings = dict(self.settings)
+            for key in DEFAULT_SETTINGS:
+                if key in message:
+                    settings[key] = message[key]
+            if settings["density"] not in VALID_DENSITIES:
+                return "Density must be 'light', 'medium', or 'heavy'"
+            if settings["mode"] not in VALID_MODES:
+                return "Mode must be 'append' or 'replace'"
+            if settings["style"] not in VALID_STYLES:
+                return "Style must be 'fun', 'professional', or 'meme'"
+            if not isinstance(settings["add_sentiment"], bool):
+                return "add_sentiment must be true or false"
+            self.settings = settings
+
+        elif kind == "edit":
+            if "text" in message and "start" not in message:
+                text = message["text"]
+            else:
+                # Splice edit: replace text[start:end] with `text`
+                try:
+                    start = int(message["start"])
+                    end = int(message.get("end", start))
+                except (KeyError, TypeError, ValueError):
+                    return "Edit requires 'text' or 'start'/'end' offsets"
+                if not 0 <= start <= end <= len(self.text):
+                    return "Edit offsets out of range"
+                text = self.text[:start] + str(message.get("text", "")) + self.text[end:]
+            if not isinstance(text, str):
+                return "Text must be a string"
+            if len(text) > MAX_TEXT_LENGTH:
+                return f"Text too long (max {MAX_TEXT_LENGTH:,} characters)"
+            self.text = text
+
+        else:
+            return f"Unknown message type: {kind!r}"
+
+        if "rev" in message:
+            try:
+                self.rev = int(message["rev"])
+            except (TypeError, ValueError):
+                pass
+        self._mark_dirty()
+        return None
+
+    def _mark_dirty(self) -> None:
+        now = time.monotonic()
+        if not self._dirty.is_set():
+            self._first_edit = now
+        self._last_edit = now
+        self._dirty.set()
+
+    async def retranslate(self) -> Dict[str, Any]:
+        """
+        Translate the current text, on the translation pool when there is one,
+        and return a patch against the previous output.
+        """
+        text, settings, rev = self.text, dict(self.settings), self.rev
+        if not text.strip():
+            output = ""
+        elif self.pool is not None:
+            output = await self.pool.run(len(text), self.translator.translate, text=text,
+                                        seed=self.seed, **settings)
+        else:
+            output = self.translator.translate(text=text, seed=self.seed, **settings)
+        spans = diff_spans(self.output, output)
+        self.output = output
+        self.translations += 1
+        return {"type": "patch", "rev": rev, "spans": spans, "length": len(output)}
+
+    async def _wait_for_quiet(self) -> None:
+        """Sleep until edits pause for `window` seconds or `max_delay` has passed."""
+        while True:
+            now = time.monotonic()
+            quiet_at = self._last_edit + self.window
+            deadline = self._first_edit + self.max_delay
+            wake = min(quiet_at, deadline)
+            if now >= wake:
+                return
+            await asyncio.sleep(wake - now)
+
+    async def _receive_loop(self, websocket: WebSocket) -> None:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (ValueError, KeyError, TypeError):
+                # Not a JSON text frame; the connection itself is fine
+                await websocket.send_json({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            error = self.apply_message(message)
+            if error:
+                await websocket.send_json({"type": "error", "rev": self.rev, "message": error})
+
+    async def _translate_loop(self, websocket: WebSocket) -> None:
+        while True:
+            await self._dirty.wait()
+            await self._wait_for_quiet()
+            self._dirty.clear()
+            await websocket.send_json(await self.retranslate())
+
+    async def run(self, websocket: WebSocket) -> None:
+        """Serve the connection until the client disconnects."""
+        tasks = [
+            asyncio.ensure_future(self._receive_loop(websocket)),
+            asyncio.ensure_future(self._translate_loop(websocket)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error and not isinstance(error, WebSocketDisconnect):
+                    raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def create_live_router(translator: EmojiTranslator, pool: Optional[TranslationPool] = None) -> APIRouter:
+    """
+    Build the router exposing the `/ws/translate` live translation channel;
+    translations run on `pool` when one is given.
+    """
+    router = APIRouter()
+
+    @router.websocket("/ws/translate")
+    async def live_translate(websocket: WebSocket):
+        """
+        Live translation channel.
+
+        Client messages:
+        - `{"type": "settings", "density": ..., "mode": ..., "style": ..., "add_sentiment": ...}`
+        - `{"type": "edit", "text": "full text", "rev": 3}`
+        - `{"type": "edit", "start": 4, "end": 9, "text": "inserted", "rev": 4}`
+
+        Server messages:
+        - `{"type": "patch", "rev": 4, "spans": [{"start", "end", "text"}], "length": 42}`
+        - `{"type": "error", "rev": 4, "message": "..."}`
+        """
+        await websocket.accept()
+        session = LiveTranslationSession(translator, pool=pool)
+        try:
+            await session.run(websocket)
+        except WebSocketDisconnect:
+            pass
+
+    return router
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Memory Governor
+Process-wide accounting of cache memory with cross-cache eviction
+
+Every in-process cache registers here. Each keeps its own size bound, but
+those bounds add up to more than a worker should hold, so the governor also
+enforces one budget across all of them: EMOJI_CACHE_MEMORY_BUDGET bytes of
+cached data and, optionally, EMOJI_RSS_BUDGET bytes of process RSS.
+
+Once over budget, it trims caches in order of their recent hit rate per byte,
+least useful first, until the total is back under LOW_WATERMARK of the budget.
+A large cache that is rarely hit is emptied before a small, busy one loses
+anything.
+
+A registered cache exposes `bytes` (approximate footprint) and `hits` (a
+running count), and implements `shrink(nbytes) -> freed`, evicting its least
+recently used entries first. See translation_cache.LRUCache.
+"""
+
+import atexit
+import hmac
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+
+logger = logging.getLogger(__name__)
+
+CACHE_MEMORY_BUDGET = int(os.environ.get("EMOJI_CACHE_MEMORY_BUDGET", 64 * 1024 * 1024))
+# Resident set size that also triggers eviction; 0 disables the check
+RSS_BUDGET = int(os.environ.get("EMOJI_RSS_BUDGET", 0))
+CHECK_INTERVAL = float(os.environ.get("EMOJI_MEMORY_CHECK_INTERVAL", 5.0))
+# Required in X-Admin-Token for /admin routes; without one they are not served
+ADMIN_TOKEN = os.environ.get("EMOJI_ADMIN_TOKEN", "")
+# Eviction stops at this fraction of the budget, so it does not run every check
+LOW_WATERMARK = 0.9
+# Weight of the latest interval in each cache's smoothed hit rate
+RATE_SMOOTHING = 0.5
+# Freed memory shows up in RSS slowly, if at all; trim at most this share of
+# the caches per check on RSS alone
+RSS_TRIM_FRACTION = 0.25
+
+
+def process_rss() -> Optional[int]:
+    """Current resident set size in bytes, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Registration:
+    __slots__ = ("name", "cache", "last_hits", "hit_rate", "trimmed")
+
+    def __init__(self, name: str, cache: Any):
+        self.name = name
+        self.cache = cache
+        self.last_hits = cache.hits
+        self.hit_rate = 0.0
+        self.trimmed = 0
+
+    def sample(self) -> None:
+        hits = self.cache.hits
+        self.hit_rate += RATE_SMOOTHING * ((hits - self.last_hits) - self.hit_rate)
+        self.last_hits = hits
+
+    def value_per_byte(self) -> float:
+        return self.hit_rate / max(self.cache.bytes, 1)
+
+
+class MemoryGovernor:
+    """Cross-cache memory budget, checked by a background thread."""
+
+    def __init__(self, budget: int = CACHE_MEMORY_BUDGET, rss_budget: int = RSS_BUDGET,
+                 interval: float = CHECK_INTERVAL, rss: Callable[[], Optional[int]] = process_rss,
+                 background: bool = True):
+        self.budget = budget
+        self.rss_budget = rss_budget
+        self.interval = interval
+        self.rss = rss
+        self._caches: Dict[str, _Registration] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.enforcements = 0
+        self.freed = 0
+        if background:
+            self._thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def register(self, name: str, cache: Any) -> None:
+        """Account `cache` under `name`; registering a name again replaces it."""
+        with self._lock:
+            self._caches[name] = _Registration(name, cache)
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._caches.pop(name, None)
+
+    def footprint(self) -> int:
+        """Approximate bytes held by all registered caches."""
+        with self._lock:
+            return sum(registration.cache.bytes for registration in self._caches.values())
+
+    def _excess(self, total: int) -> int:
+        """Bytes to free now, from the cache budget and the RSS budget."""
+        excess = total - int(self.budget * LOW_WATERMARK) if total > self.budget else 0
+        if self.rss_budget:
+            rss = self.rss()
+            if rss is not None and rss > self.rss_budget:
+                rss_excess = rss - int(self.rss_budget * LOW_WATERMARK)
+                excess = max(excess, min(rss_excess, int(total * RSS_TRIM_FRACTION)))
+        return excess
+
+    def enforce(self) -> int:
+        """Sample hit rates and trim caches if over budget; returns bytes freed."""
+        with self._lock:
+            registrations: List[_Registration] = list(self._caches.values())
+        for registration in registrations:
+            registration.sample()
+        excess = self._excess(sum(registration.cache.bytes for registration in registrations))
+        if excess <= 0:
+            return 0
+
+        freed = 0
+        for registration in sorted(registrations, key=_Registration.value_per_byte):
+            if freed >= excess:
+                break
+            released = registration.cache.shrink(excess - freed)
+            registration.trimmed += released
+            freed += released
+        self.enforcements += 1
+        self.freed += freed
+        return freed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception:
+                logger.exception("Memory governor check failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def report(self) -> Dict[str, object]:
+        """Per-cache footprint, hit rate and trimming, with the budgets."""
+        with self._lock:
+            registrations = list(self._caches.values())
+        caches = {
+            registration.name: {
+                "bytes": registration.cache.bytes,
+                "hits": registration.cache.hits,
+                "hit_rate": round(registration.hit_rate / self.interval, 2),
+                "hits_per_mb": round(registration.value_per_byte() / self.interval * 1024 * 1024, 2),
+                "trimmed_bytes": registration.trimmed,
+            }
+            for registration in sorted(registrations, key=lambda registration: registration.name)
+        }
+        return {
+            "budget": self.budget,
+            "footprint": sum(cache["bytes"] for cache in caches.values()),
+            "rss": self.rss(),
+            "rss_budget": self.rss_budget or None,
+            "caches": caches,
+        }
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "footprint": self.footprint(),
+            "budget": self.budget,
+            "enforcements": self.enforcements,
+            "freed": self.freed,
+        }
+
+
+def check_admin_token(request: Request, token: str = ADMIN_TOKEN) -> None:
+    """Reject an /admin request without the right X-Admin-Token, or any when no token is set."""
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set EMOJI_ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def create_admin_router(governor: MemoryGovernor, token: str = ADMIN_TOKEN) -> APIRouter:
+    """Build the router exposing `/admin/memory`, guarded by `token`."""
+    router = APIRouter()
+
+    @router.get("/admin/memory")
+    async def memory_report(request: Request):
+        """Memory held by each registered cache, its recent hit rate and how much was trimmed."""
+        check_admin_token(request, token)
+        return governor.report()
+
+    return router
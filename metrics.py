@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Metrics
+Process-wide registry of metric providers, exported as JSON at /metrics
+"""
+
+import threading
+from typing import Any, Callable, Dict
+
+from fastapi import APIRouter
+
+_lock = threading.Lock()
+_providers: Dict[str, Callable[[], Any]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], Any]) -> None:
+    """Publish `provider()` under `name`; registering a name again replaces it."""
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in sorted(providers.items())}
+
+
+def create_metrics_router() -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/metrics")
+    async def get_metrics():
+        """Operational counters: admission, pools and other registered providers."""
+        return collect_metrics()
+
+    return router
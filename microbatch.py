@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Micro-Batching
+Collect concurrent small translations into batches that run as one pool job
+
+Every small request translated inline holds the event loop while it runs, and
+every one sent to a thread pays for its own hand-off. The batcher groups small
+requests and runs each group as a single job on the translation pool, handing
+every caller its own result or exception.
+
+Batching is driven by load rather than a timer. While fewer than `concurrency`
+batches are running, whatever has arrived by the end of the current event-loop
+iteration is dispatched at once, and a batch of one runs inline as before, so
+an idle or lightly loaded server adds no waiting. Once every slot is busy, new
+requests collect until a batch finishes or MAX_BATCH of them are waiting: the
+busier the server, the larger the batches.
+
+Batches are formed per plan, so QoS scheduling still sees each plan's work,
+and each item keeps its own request deadline.
+"""
+
+import asyncio
+import contextvars
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from deadline import request_deadline
+from pool import INLINE, SHORT, TranslationPool
+from scheduler import request_plan
+
+MICROBATCH_ENABLED = os.environ.get("EMOJI_MICROBATCH", "on").lower() not in ("0", "off", "false", "no")
+MAX_BATCH = int(os.environ.get("EMOJI_MICROBATCH_SIZE", 32))
+
+
+class _Entry:
+    __slots__ = ("item", "size", "deadline", "future")
+
+    def __init__(self, item: Any, size: int, deadline, future: asyncio.Future):
+        self.item = item
+        self.size = size
+        self.deadline = deadline
+        self.future = future
+
+
+class MicroBatcher:
+    """Load-adaptive micro-batcher in front of a TranslationPool. Event-loop thread only."""
+
+    def __init__(self, pool: TranslationPool, fn: Callable[[Any], Any], max_batch: int = MAX_BATCH,
+                 concurrency: Optional[int] = None, enabled: bool = MICROBATCH_ENABLED):
+        self.pool = pool
+        self.fn = fn
+        self.max_batch = max_batch
+        # Batches run on the short lane; keep at most one per worker in flight
+        self.concurrency = concurrency or pool.lanes[SHORT].workers
+        self.enabled = enabled
+        self.running = 0
+        self._pending: Dict[str, List[_Entry]] = {}
+        self._flush_scheduled = False
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+
+    async def submit(self, item: Any, size: int) -> Any:
+        """Return `fn(item)`, computed as part of a batch."""
+        if not self.enabled:
+            return await self.pool.run(size, self.fn, item)
+        loop = asyncio.get_running_loop()
+        plan = request_plan.get()
+        entry = _Entry(item, size, request_deadline.get(), loop.create_future())
+        pending = self._pending.setdefault(plan, [])
+        pending.append(entry)
+        if len(pending) >= self.max_batch:
+            self.full_batches += 1
+            self._start(plan)
+        elif self.running < self.concurrency and not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        return await entry.future
+
+    def _flush(self) -> None:
+        """Start batches for waiting plans while there is spare concurrency."""
+        self._flush_scheduled = False
+        while self._pending and self.running < self.concurrency:
+            # Largest group first; the scheduler orders plans within the lane
+            plan = max(self._pending, key=lambda name: len(self._pending[name]))
+            self._start(plan)
+
+    def _start(self, plan: str) -> None:
+        entries = self._pending.pop(plan)
+        self.running += 1
+        self.batches += 1
+        self.items += len(entries)
+        # Run under the batch's plan, without any one caller's deadline
+        context = contextvars.copy_context()
+        context.run(request_plan.set, plan)
+        context.run(request_deadline.set, None)
+        context.run(asyncio.get_running_loop().create_task, self._run(entries))
+
+    async def _run(self, entries: List[_Entry]) -> None:
+        size = sum(entry.size for entry in entries)
+        # A lone request is cheaper inline than handed to a thread
+        lane = self.pool.lanes[SHORT if len(entries) > 1 else INLINE]
+        try:
+            outcomes = await self.pool.run_in(lane, size, self._run_batch, entries)
+        except BaseException as e:
+            outcomes = [(False, e)] * len(entries)
+        finally:
+            self.running -= 1
+            self._flush()
+        for entry, (ok, value) in zip(entries, outcomes):
+            if entry.future.done():
+                continue
+            if ok:
+                entry.future.set_result(value)
+            else:
+                entry.future.set_exception(value)
+
+    def _run_batch(self, entries: List[_Entry]) -> List[Tuple[bool, Any]]:
+        outcomes = []
+        for entry in entries:
+            token = request_deadline.set(entry.deadline)
+            try:
+                outcomes.append((True, self.fn(entry.item)))
+            except Exception as e:
+                outcomes.append((False, e))
+            finally:
+                request_deadline.reset(token)
+        return outcomes
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "waiting": sum(len(entries) for entries in self._pending.values()),
+            "batches": self.batches,
+            "items": self.items,
+            "full_batches": self.full_batches,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Out-of-Vocabulary Profiler
+Which words miss the emoji lexicon most often, with example contexts, so
+emoji_map grows where it pays off most
+
+The translator hands a random sample of the texts it translates
+(EMOJI_OOV_SAMPLE_RATE) to the profiler; every other translation pays for one
+random draw. The first MAX_SCAN_CHARS of a sampled text are split into words
+with the translator's word pattern, and those that are neither in the lexicon
+(emoji_map, or part of a phrase) nor stop words are counted in a Space-Saving
+summary of CAPACITY words (see heavy_hitters.py), each with up to
+CONTEXTS_PER_WORD example snippets. Memory stays bounded whatever the traffic.
+Snippets are user text, so the server keeps them only when EMOJI_ADMIN_TOKEN
+is set, i.e. when someone can read them.
+
+Counts are per worker and cover translations actually computed: cache hits
+never reach the translator. GET /admin/oov lists the top words (served only
+once EMOJI_ADMIN_TOKEN is set), and
+
+    python oov_profiler.py corpus.txt [more.txt ...] --top 30
+
+profiles text files offline against the built-in lexicon.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+from typing import Dict, FrozenSet, List, Optional
+
+from fastapi import APIRouter, Request
+
+from heavy_hitters import SpaceSaving
+from memory_governor import ADMIN_TOKEN, check_admin_token
+
+OOV_SAMPLE_RATE = float(os.environ.get("EMOJI_OOV_SAMPLE_RATE", 0.05))
+CAPACITY = int(os.environ.get("EMOJI_OOV_CAPACITY", 2000))
+CONTEXTS_PER_WORD = 3
+MAX_SCAN_CHARS = 4096
+MIN_WORD_CHARS = 3
+# Characters of text kept on each side of a word in its example contexts
+CONTEXT_CHARS = 30
+
+# Same tokenization as EmojiTranslator._replace_words
+WORD_PATTERN = re.compile(r'\b\w+\b')
+
+# Words no emoji would ever be added for
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+get got going im ive dont doesnt didnt cant wont isnt arent wasnt let lets yes yeah okay ok really much
+many one two three first new like make made way well still even back there thing things something
+""".split())
+
+
+def _snippet(text: str, start: int, end: int) -> str:
+    """The word at text[start:end] with some text around it, on one line."""
+    left = max(0, start - CONTEXT_CHARS)
+    right = min(len(text), end + CONTEXT_CHARS)
+    snippet = " ".join(text[left:right].split())
+    return ("…" if left else "") + snippet + ("…" if right < len(text) else "")
+
+
+class OOVProfiler:
+    """Bounded frequency tracker of words the translator has no emoji for."""
+
+    def __init__(self, sample_rate: float = OOV_SAMPLE_RATE, capacity: int = CAPACITY,
+                 contexts_per_word: int = CONTEXTS_PER_WORD, rng: Optional[random.Random] = None):
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.contexts_per_word = contexts_per_word
+        # Own generator, so sampling never shifts the translator's random choices
+        self._rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._summary = SpaceSaving(capacity)
+        # word -> example snippets, for words in the summary only
+        self._contexts: Dict[str, List[str]] = {}
+        self._vocabulary: FrozenSet[str] = frozenset()
+        self._vocabulary_version: Optional[str] = None
+        self.texts = 0
+        self.words = 0
+        self.misses = 0
+
+    def sample(self) -> bool:
+        """Whether to profile the text being translated."""
+        return self.sample_rate >= 1 or self._rng.random() < self.sample_rate
+
+    def _vocabulary_of(self, translator) -> FrozenSet[str]:
+        """Every word the translator has an emoji or a phrase for, rebuilt when its lexicon changes."""
+        version = translator.lexicon_version
+        if version != self._vocabulary_version:
+            words = set(translator.emoji_map)
+            for phrase in translator.phrase_patterns:
+                words.update(WORD_PATTERN.findall(phrase.lower()))
+            self._vocabulary = frozenset(words)
+            self._vocabulary_version = version
+        return self._vocabulary
+
+    def observe(self, text: str, translator) -> None:
+        """Count the words of `text` missing from the translator's lexicon."""
+        text = text[:MAX_SCAN_CHARS]
+        vocabulary = self._vocabulary_of(translator)
+        words = 0
+        misses = []
+        for match in WORD_PATTERN.finditer(text):
+            words += 1
+            word = match.group().lower()
+            if (word in vocabulary or word in STOP_WORDS or len(word) < MIN_WORD_CHARS
+                    or word.isdigit() or "_" in word):
+                continue
+            misses.append((word, match.start(), match.end()))
+
+        with self._lock:
+            self.texts += 1
+            self.words += words
+            self.misses += len(misses)
+            for word, start, end in misses:
+                displaced = self._summary.add(word)
+                if displaced is not None:
+                    self._contexts.pop(displaced, None)
+                if not self.contexts_per_word:
+                    continue
+                contexts = self._contexts.setdefault(word, [])
+                if len(contexts) < self.contexts_per_word:
+                    snippet = _snippet(text, start, end)
+                    if snippet not in contexts:
+                        contexts.append(snippet)
+
+    def top(self, limit: int = 50) -> List[Dict[str, object]]:
+        """The `limit` most frequent missing words, with their count bounds and example contexts."""
+        with self._lock:
+            entries = self._summary.entries()
+            contexts = {word: list(self._contexts.get(word, ())) for word in entries}
+        ranked = sorted(entries.items(), key=lambda entry: entry[1][0], reverse=True)[:limit]
+        return [
+            {"word": word, "count": count, "guaranteed": guaranteed, "contexts": contexts[word]}
+            for word, (count, guaranteed) in ranked
+        ]
+
+    def report(self, limit: int = 50) -> Dict[str, object]:
+        return {
+            "sample_rate": self.sample_rate,
+            "texts": self.texts,
+            "words": self.words,
+            "misses": self.misses,
+            "miss_rate": round(self.misses / self.words, 4) if self.words else 0.0,
+            "capacity": self.capacity,
+            "top": self.top(limit),
+        }
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "sample_rate": self.sample_rate,
+            "texts": self.texts,
+            "misses": self.misses,
+            "tracked": len(self._summary),
+        }
+
+
+def create_oov_router(profiler: OOVProfiler, token: str = ADMIN_TOKEN) -> APIRouter:
+    """Build the router exposing `/admin/oov`, guarded by `token`; 403 for everyone without one."""
+    router = APIRouter()
+
+    @router.get("/admin/oov")
+    async def oov_report(request: Request, limit: int = 50):
+        """Most frequent words missing from the lexicon in sampled translations, with example contexts."""
+        check_admin_token(request, token)
+        return profiler.report(max(1, min(limit, profiler.capacity)))
+
+    return router
+
+
+def main():
+    """Profile text files (or stdin) against the lexicon and print the top missing words."""
+    from translator import EmojiTranslator
+
+    parser = argparse.ArgumentParser(description='List the most frequent words missing from the emoji lexicon')
+    parser.add_argument('files', nargs='*', help='Text files to profile (default: stdin)')
+    parser.add_argument('--top', type=int, default=30, help='Number of words to list')
+    parser.add_argument('--custom-emojis', help='Path to custom emoji mappings file')
+    args = parser.parse_args()
+
+    translator = EmojiTranslator(custom_emoji_file=args.custom_emojis)
+    profiler = OOVProfiler(sample_rate=1.0, capacity=max(CAPACITY, args.top))
+    streams = [open(path, encoding='utf-8', errors='replace') for path in args.files] or [sys.stdin]
+    for stream in streams:
+        with stream:
+            for line in stream:
+                if line.strip():
+                    profiler.observe(line, translator)
+
+    report = profiler.report(args.top)
+    print(f"{report['misses']:,} of {report['words']:,} words missed the lexicon ({report['miss_rate']:.1%})")
+    for entry in report['top']:
+        example = entry['contexts'][0] if entry['contexts'] else ''
+        print(f"{entry['count']:>8,}  {entry['word']:<20} {example}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Pricing Plans
+Plan limits shared by usage tracking, rate limiting and scheduling across all tiers
+"""
+
+# Pricing plans; `rate_limit` is a sustained rate per minute plus a burst allowance,
+# `qos_weight` the plan's share of translation capacity under contention
+PRICING_PLANS = {
+    "free": {"daily_limit": 100, "features": ["basic_translation"], "price": 0,
+             "rate_limit": {"per_minute": 60, "burst": 30}, "qos_weight": 1},
+    "premium": {"daily_limit": 1000, "features": ["all_styles", "premium_emojis", "analytics"], "price": 4.99,
+                "rate_limit": {"per_minute": 300, "burst": 60}, "qos_weight": 2},
+    "pro": {"daily_limit": 10000, "features": ["unlimited", "api_access", "custom_branding"], "price": 19.99,
+            "rate_limit": {"per_minute": 1200, "burst": 200}, "qos_weight": 4},
+    "enterprise": {"daily_limit": 100000, "features": ["white_label", "priority_support", "custom_features"], "price": 99.99,
+                   "rate_limit": {"per_minute": 6000, "burst": 1000}, "qos_weight": 8}
+}
+
+# Plan fields shown to clients; rate limits and QoS weights stay internal
+PUBLIC_PLAN_FIELDS = ("daily_limit", "features", "price")
+
+# Plans that only get capacity no paid plan is waiting for
+SPARE_CAPACITY_PLANS = ("free",)
+
+# Plan applied to anonymous clients, identified by IP address
+DEFAULT_PLAN = "free"
+
+
+def public_plans():
+    """PRICING_PLANS restricted to PUBLIC_PLAN_FIELDS, for the pricing page."""
+    return {
+        name: {field: plan[field] for field in PUBLIC_PLAN_FIELDS}
+        for name, plan in PRICING_PLANS.items()
+    }
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Translation Pool
+Run translations off the event loop, with short and long jobs on separate threads
+
+Translation is CPU-bound Python, so running a large one inline in an async
+handler stalls every other connection on the worker, health checks included.
+Small jobs are still run inline: under the GIL a thread hand-off costs more
+than a short translation (about 40% of throughput on typical requests), and
+they finish well within the loop-lag budget. Larger jobs go to the threads,
+keeping the loop free for I/O, and the pool reports how much work is waiting,
+which the admission controller uses to shed load.
+
+Jobs are classified into three lanes by their predicted cost:
+
+    inline  up to EMOJI_INLINE_BUDGET_MS   on the event loop
+    short   up to EMOJI_SHORT_BUDGET_MS    on EMOJI_SHORT_WORKERS threads
+    long    anything larger                on EMOJI_LONG_WORKERS threads
+
+so a 10,000-character document only ever waits behind other long jobs and
+never takes a thread a 50-character request needs. The prediction is size
+times the per-character CPU cost, a moving average over recent jobs measured
+in thread CPU time (GIL waits excluded), so the character thresholds follow
+the real cost of the lexicon on this machine. A batch is classified as one job
+by its total size, each item counting at least ITEM_MIN_CHARS.
+
+With QoS weights every lane has its own scheduler, and each job first waits
+for a slot in the plan order of the request it belongs to (see scheduler.py).
+
+Jobs of a request whose deadline has passed or whose client has gone are not
+started; while a job runs on a thread the pool watches for both and cancels
+the deadline, which the translator polls (see deadline.py).
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from deadline import TranslationCancelled, request_deadline
+from scheduler import QOS_CAPACITY, FairScheduler, request_plan
+
+SHORT_WORKERS = int(os.environ.get("EMOJI_SHORT_WORKERS", 2))
+LONG_WORKERS = int(os.environ.get("EMOJI_LONG_WORKERS", 2))
+# Predicted CPU time up to which a job runs inline, or on the short lane
+INLINE_BUDGET = float(os.environ.get("EMOJI_INLINE_BUDGET_MS", 4)) / 1000
+SHORT_BUDGET = float(os.environ.get("EMOJI_SHORT_BUDGET_MS", 50)) / 1000
+# Inline threshold used until the first costs are measured
+INLINE_MAX_CHARS = int(os.environ.get("EMOJI_INLINE_MAX_CHARS", 1000))
+
+# Jobs smaller than this are dominated by fixed overhead and not sampled
+MIN_SAMPLE_CHARS = 200
+COST_SMOOTHING = 0.05
+# The per-character cost is kept within this factor of the initial estimate
+COST_CLAMP = 20.0
+# Smallest size a batch item counts as when classifying a batch
+ITEM_MIN_CHARS = 64
+# Characters that count as one unit of scheduling cost
+COST_UNIT_CHARS = 1000
+
+INLINE, SHORT, LONG = "inline", "short", "long"
+
+
+class Lane:
+    """One class of work: its threads (none when inline), scheduler and counters."""
+
+    __slots__ = ("name", "workers", "executor", "scheduler", "queued", "active", "completed", "cancelled")
+
+    def __init__(self, name: str, workers: int, executor: Optional[ThreadPoolExecutor],
+                 scheduler: Optional[FairScheduler]):
+        self.name = name
+        self.workers = workers
+        self.executor = executor
+        self.scheduler = scheduler
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.cancelled = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"workers": self.workers, "queued": self.queued, "active": self.active,
+                "completed": self.completed, "cancelled": self.cancelled}
+
+
+class TranslationPool:
+    """Size-classified lanes with adaptive thresholds and queue-depth accounting."""
+
+    def __init__(self, short_workers: int = SHORT_WORKERS, long_workers: int = LONG_WORKERS,
+                 name: str = "translate", inline_budget: float = INLINE_BUDGET,
+                 short_budget: float = SHORT_BUDGET, inline_max_chars: int = INLINE_MAX_CHARS,
+                 weights: Optional[Dict[str, float]] = None, adaptive: bool = True):
+        self.name = name
+        self.inline_budget = inline_budget
+        self.short_budget = short_budget
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+
+        def scheduler(capacity: int) -> Optional[FairScheduler]:
+            return FairScheduler(weights, capacity=capacity) if weights else None
+
+        def executor(lane: str, workers: int) -> ThreadPoolExecutor:
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-{lane}")
+
+        self.lanes: Dict[str, Lane] = {
+            INLINE: Lane(INLINE, 0, None, scheduler(QOS_CAPACITY)),
+            SHORT: Lane(SHORT, short_workers, executor(SHORT, short_workers), scheduler(short_workers)),
+            LONG: Lane(LONG, long_workers, executor(LONG, long_workers), scheduler(long_workers)),
+        }
+        self._initial_cost = inline_budget / max(1, inline_max_chars)
+        self.char_cost = self._initial_cost
+        self._set_thresholds()
+
+    def _set_thresholds(self) -> None:
+        self.inline_max_chars = int(self.inline_budget / self.char_cost)
+        self.short_max_chars = int(self.short_budget / self.char_cost)
+
+    def observe(self, size: int, cpu: float) -> None:
+        """Fold the CPU time of a `size`-character job into the per-character cost."""
+        if not self.adaptive or size < MIN_SAMPLE_CHARS:
+            return
+        low, high = self._initial_cost / COST_CLAMP, self._initial_cost * COST_CLAMP
+        with self._lock:
+            cost = self.char_cost + COST_SMOOTHING * (cpu / size - self.char_cost)
+            self.char_cost = min(high, max(low, cost))
+            self._set_thresholds()
+
+    def classify(self, size: int, items: int = 1) -> Lane:
+        """Lane for a job of `size` characters spread over `items` texts."""
+        if items > 1:
+            size = max(size, items * ITEM_MIN_CHARS)
+        if size <= self.inline_max_chars:
+            return self.lanes[INLINE]
+        if size <= self.short_max_chars:
+            return self.lanes[SHORT]
+        return self.lanes[LONG]
+
+    def _measure(self, size: int, fn: Callable[..., Any], args, kwargs) -> Any:
+        start = time.thread_time()
+        result = fn(*args, **kwargs)
+        self.observe(size, time.thread_time() - start)
+        return result
+
+    def _call(self, lane: Lane, size: int, fn: Callable[..., Any], args, kwargs) -> Any:
+        with self._lock:
+            lane.queued -= 1
+            lane.active += 1
+        try:
+            # Skip jobs whose request was cancelled while they queued
+            deadline = request_deadline.get()
+            if deadline is not None:
+                deadline.check()
+            return self._measure(size, fn, args, kwargs)
+        finally:
+            with self._lock:
+                lane.active -= 1
+                lane.completed += 1
+
+    async def _execute(self, lane: Lane, size: int, fn: Callable[..., Any], args, kwargs) -> Any:
+        deadline = request_deadline.get()
+        if deadline is not None:
+            deadline.check()
+        if lane.executor is None:
+            lane.completed += 1
+            return self._measure(size, fn, args, kwargs)
+        with self._lock:
+            lane.queued += 1
+        loop = asyncio.get_running_loop()
+        # The job sees the request's context vars (plan, deadline) on its thread
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(lane.executor, context.run, self._call, lane, size, fn, args, kwargs)
+        if deadline is None:
+            return await future
+        return await deadline.guard(future)
+
+    async def run_in(self, lane: Lane, size: int, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` for an input of `size` characters on `lane`.
+        Raises TranslationCancelled without running it once the request's deadline is cancelled.
+        """
+        deadline = request_deadline.get()
+        try:
+            if deadline is not None:
+                deadline.check()
+            if lane.scheduler is None:
+                return await self._execute(lane, size, fn, args, kwargs)
+            async with lane.scheduler.slot(request_plan.get(), cost=1 + size / COST_UNIT_CHARS):
+                return await self._execute(lane, size, fn, args, kwargs)
+        except TranslationCancelled:
+            lane.cancelled += 1
+            raise
+
+    async def run(self, size: int, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` for an input of `size` characters on the lane
+        its predicted cost falls into.
+        """
+        return await self.run_in(self.classify(size), size, fn, *args, **kwargs)
+
+    @property
+    def scheduled(self) -> bool:
+        return any(lane.scheduler is not None for lane in self.lanes.values())
+
+    @property
+    def depth(self) -> int:
+        """Calls waiting for a scheduler slot or a free worker."""
+        depth = 0
+        for lane in self.lanes.values():
+            depth += lane.queued + (lane.scheduler.waiting if lane.scheduler is not None else 0)
+        return depth
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "queued": sum(lane.queued for lane in self.lanes.values()),
+                "char_cost_us": round(self.char_cost * 1e6, 3),
+                "thresholds": {"inline_max_chars": self.inline_max_chars,
+                               "short_max_chars": self.short_max_chars},
+                "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            }
+
+    def scheduler_stats(self) -> Dict[str, object]:
+        return {name: lane.scheduler.stats() for name, lane in self.lanes.items()
+                if lane.scheduler is not None}
+
+    def shutdown(self) -> None:
+        for lane in self.lanes.values():
+            if lane.executor is not None:
+                lane.executor.shutdown(wait=False, cancel_futures=True)
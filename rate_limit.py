@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Rate Limiting
+GCRA token-bucket limiter per API key and per client IP, as a pure ASGI middleware
+
+Each active key costs one float: its theoretical arrival time (TAT). A request
+is allowed when the bucket has room, i.e. when pushing the TAT forward by one
+emission interval keeps it within `burst` intervals of now. Refill is implicit
+in the passage of time, and a bucket whose TAT is in the past is full and can
+be forgotten, so idle keys are evicted without losing anything.
+
+Behind a reverse proxy every request arrives from the proxy's address, so
+anonymous clients would all share one bucket. EMOJI_TRUST_PROXY_HEADERS gives
+the number of proxies in front of the app ("1"/"true" for one, as on Railway
+or Heroku); clients are then identified by the X-Forwarded-For entry the
+outermost of them appended. Entries further left are sent by the client itself
+and never trusted.
+
+The SQLite backend blocks on its database, so the middleware calls it on a
+worker thread; the memory backend runs inline.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from plans import DEFAULT_PLAN, PRICING_PLANS
+
+# "memory" (per process), "sqlite:<path>" (shared by all workers on a host) or "off"
+RATE_LIMIT_BACKEND = os.environ.get("EMOJI_RATE_LIMIT_BACKEND", "memory")
+
+
+def _proxy_count(value: str) -> int:
+    """Number of trusted proxies from EMOJI_TRUST_PROXY_HEADERS: a count, or a boolean meaning one."""
+    value = value.strip().lower()
+    if value in ("true", "yes", "on"):
+        return 1
+    return int(value) if value.isdigit() else 0
+
+
+# Proxies in front of the app whose X-Forwarded-For entries are honoured; 0 ignores the header
+TRUST_PROXY_HEADERS = _proxy_count(os.environ.get("EMOJI_TRUST_PROXY_HEADERS", ""))
+
+# Idle buckets are swept at most this often (seconds)
+SWEEP_INTERVAL = 60.0
+
+# Cheap endpoints that are never limited
+EXEMPT_PREFIXES = ("/static/",)
+EXEMPT_SUFFIXES = ("/health", "/livez", "/readyz")
+
+RATE_LIMITED_BODY = b'{"detail":"Rate limit exceeded"}'
+
+# Slack for float rounding when a burst is spent in the same instant
+EPSILON = 1e-6
+
+
+def gcra(tat: float, now: float, interval: float, burst: int) -> Tuple[float, float]:
+    """
+    One GCRA step. Returns `(new_tat, retry_after)`; the request is allowed when
+    `retry_after` is 0, in which case `new_tat` must be stored.
+    """
+    new_tat = max(tat, now) + interval
+    allow_at = new_tat - burst * interval
+    if allow_at > now + EPSILON:
+        return tat, allow_at - now
+    return new_tat, 0.0
+
+
+class MemoryBackend:
+    """Buckets in a dict, private to this process."""
+
+    # Cheap enough to call on the event loop
+    blocking = False
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def acquire(self, key: str, now: float, interval: float, burst: int) -> float:
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tat, retry_after = gcra(self._tats.get(key, now), now, interval, burst)
+            if not retry_after:
+                self._tats[key] = tat
+            return retry_after
+
+    def _sweep(self, now: float) -> None:
+        # A bucket whose TAT has passed is full again; dropping it changes nothing
+        idle = [key for key, tat in self._tats.items() if tat <= now]
+        for key in idle:
+            del self._tats[key]
+        self._next_sweep = now + SWEEP_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteBackend:
+    """
+    Buckets in a SQLite table, shared by every worker process on the host.
+
+    The database runs in WAL mode without fsync: limiter state is worth nothing
+    after a crash. If the database is locked for longer than the busy timeout
+    the request is let through rather than stalled.
+    """
+
+    # Waits on the database; call it from a worker thread
+    blocking = True
+
+    def __init__(self, path: str, busy_timeout: float = 0.05):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._local.connection = connection
+        return connection
+
+    def acquire(self, key: str, now: float, interval: float, burst: int) -> float:
+        connection = self._connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if now >= self._next_sweep:
+                    connection.execute("DELETE FROM rate_buckets WHERE tat <= ?", (now,))
+                    self._next_sweep = now + SWEEP_INTERVAL
+                row = connection.execute("SELECT tat FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tat, retry_after = gcra(row[0] if row else now, now, interval, burst)
+                if not retry_after:
+                    connection.execute("INSERT OR REPLACE INTO rate_buckets (key, tat) VALUES (?, ?)", (key, tat))
+                connection.execute("COMMIT")
+                return retry_after
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.OperationalError:
+            return 0.0
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+
+
+def create_backend(spec: str = RATE_LIMIT_BACKEND):
+    """Backend from a spec string; None disables rate limiting."""
+    spec = spec.strip()
+    if spec in ("", "off", "none", "0"):
+        return None
+    if spec == "memory":
+        return MemoryBackend()
+    if spec.startswith("sqlite:"):
+        return SQLiteBackend(spec[len("sqlite:"):])
+    raise ValueError(f"Unknown rate limit backend {spec!r}")
+
+
+class RateLimiter:
+    """Per-plan GCRA limits on top of a bucket backend."""
+
+    def __init__(self, backend, plans: Dict[str, Dict] = PRICING_PLANS, default_plan: str = DEFAULT_PLAN,
+                 resolve_plan: Optional[Callable[[str], Optional[str]]] = None, clock=time.time):
+        self.backend = backend
+        self.default_plan = default_plan
+        # API key -> plan name, or None for unknown keys; set by the tier that issues keys
+        self.resolve_plan = resolve_plan
+        self._clock = clock
+        self.rates: Dict[str, Tuple[float, int]] = {}
+        for name, plan in plans.items():
+            limit = plan["rate_limit"]
+            self.rates[name] = (60.0 / limit["per_minute"], max(1, int(limit["burst"])))
+
+    @property
+    def blocking(self) -> bool:
+        """Whether acquire() may block and belongs off the event loop."""
+        return self.backend.blocking
+
+    def plan_for(self, api_key: Optional[str]) -> Optional[str]:
+        """Plan of a known API key, or None."""
+        if api_key and self.resolve_plan is not None:
+            plan = self.resolve_plan(api_key)
+            if plan in self.rates:
+                return plan
+        return None
+
+    def acquire(self, client: str, api_key: Optional[str] = None) -> float:
+        """Count one request; returns 0 if allowed, else seconds until it would be."""
+        plan = self.plan_for(api_key)
+        if plan is None:
+            # Unknown keys share their client's anonymous bucket, so inventing keys gains nothing
+            plan, key = self.default_plan, f"ip:{client}"
+        else:
+            key = f"key:{api_key}"
+        interval, burst = self.rates[plan]
+        return self.backend.acquire(key, self._clock(), interval, burst)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _query_api_key(scope) -> Optional[str]:
+    query = scope.get("query_string", b"")
+    if b"api_key=" not in query:
+        return None
+    for part in query.decode("latin-1").split("&"):
+        name, _, value = part.partition("=")
+        if name == "api_key" and value:
+            return value
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Reject over-limit HTTP requests with 429 before routing or body parsing.
+
+    Clients are identified by the `X-API-Key` header or `api_key` query
+    parameter when present, otherwise by IP address. Keys sent only inside a
+    request body cannot be seen here and are limited at the anonymous rate.
+    `trust_proxy_headers` is the number of trusted proxies in front of the app.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, trust_proxy_headers: int = TRUST_PROXY_HEADERS):
+        self.app = app
+        self.limiter = limiter
+        self.trust_proxy_headers = trust_proxy_headers
+
+    def _client(self, scope) -> str:
+        if self.trust_proxy_headers:
+            forwarded = _header(scope, b"x-forwarded-for")
+            if forwarded:
+                # Each proxy appends the address it saw; the client controls the rest
+                hops = [hop.strip() for hop in forwarded.split(",")]
+                return hops[-min(int(self.trust_proxy_headers), len(hops))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if path.startswith(EXEMPT_PREFIXES) or path.endswith(EXEMPT_SUFFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = _header(scope, b"x-api-key") or _query_api_key(scope)
+        if self.limiter.blocking:
+            retry_after = await run_in_threadpool(self.limiter.acquire, self._client(scope), api_key)
+        else:
+            retry_after = self.limiter.acquire(self._client(scope), api_key)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(RATE_LIMITED_BODY)).encode("ascii")),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": RATE_LIMITED_BODY})
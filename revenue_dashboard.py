@@ -9,10 +9,14 @@ from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import pandas as pd
 from typing import Dict, List
+from hyperloglog import ActiveUsers, HyperLogLog
 
 class RevenueDashboard:
     def __init__(self):
-        self.user_data = {}
+        # Per-day action counts, plus distinct-user sketches instead of a record per user
+        self.daily_actions = {}
+        self.all_users = HyperLogLog()
+        self.active_users = ActiveUsers()
         self.revenue_data = {}
         self.conversion_rates = {
             "free_to_premium": 0.03,  # 3% conversion rate
@@ -21,19 +25,13 @@ class RevenueDashboard:
         
     def track_user_action(self, user_id: str, action: str, value: float = 0):
         """Track user actions for analytics."""
-        today = datetime.now().date().isoformat()
+        today = datetime.now().date()
         
-        if user_id not in self.user_data:
-            self.user_data[user_id] = {}
+        self.all_users.add(user_id)
+        self.active_users.add(user_id, today.toordinal())
         
-        if today not in self.user_data[user_id]:
-            self.user_data[user_id][today] = []
-        
-        self.user_data[user_id][today].append({
-            "action": action,
-            "value": value,
-            "timestamp": datetime.now().isoformat()
-        })
+        actions = self.daily_actions.setdefault(today.isoformat(), {})
+        actions[action] = actions.get(action, 0) + 1
     
     def calculate_daily_revenue(self, date: str = None) -> Dict:
         """Calculate revenue for a specific date."""
@@ -48,35 +46,22 @@ class RevenueDashboard:
             "total": 0
         }
         
-        # Calculate from user actions
-        for user_id, user_dates in self.user_data.items():
-            if date in user_dates:
-                for action in user_dates[date]:
-                    if action["action"] == "premium_upgrade":
-                        revenue["premium_subscriptions"] += 4.99
-                    elif action["action"] == "pro_upgrade":
-                        revenue["pro_subscriptions"] += 19.99
-                    elif action["action"] == "enterprise_upgrade":
-                        revenue["enterprise_subscriptions"] += 99.99
-                    elif action["action"] == "ad_click":
-                        revenue["ad_revenue"] += 0.50  # Average ad click value
+        # Calculate from the day's action counts
+        actions = self.daily_actions.get(date, {})
+        revenue["premium_subscriptions"] = actions.get("premium_upgrade", 0) * 4.99
+        revenue["pro_subscriptions"] = actions.get("pro_upgrade", 0) * 19.99
+        revenue["enterprise_subscriptions"] = actions.get("enterprise_upgrade", 0) * 99.99
+        revenue["ad_revenue"] = actions.get("ad_click", 0) * 0.50  # Average ad click value
         
         revenue["total"] = sum(revenue.values())
         return revenue
     
     def get_user_metrics(self) -> Dict:
-        """Get user engagement metrics."""
-        total_users = len(self.user_data)
-        active_today = 0
-        daily_translations = 0
-        
-        today = datetime.now().date().isoformat()
-        
-        for user_id, user_dates in self.user_data.items():
-            if today in user_dates:
-                active_today += 1
-                translations = len([a for a in user_dates[today] if a["action"] == "translation"])
-                daily_translations += translations
+        """Get user engagement metrics (user counts are HyperLogLog estimates)."""
+        today = datetime.now().date()
+        total_users = self.all_users.count()
+        active_today = self.active_users.count(today.toordinal(), today.toordinal())
+        daily_translations = self.daily_actions.get(today.isoformat(), {}).get("translation", 0)
         
         return {
             "total_users": total_users,
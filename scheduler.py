@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - QoS Scheduler
+Weighted fair queuing of translation work by pricing plan
+
+Every translation waits for a slot from the scheduler. Paid plans are served in
+weighted-fair order: each job gets a virtual finish tag of
+`max(virtual_time, plan's last tag) + cost / weight`, and the smallest tag runs
+next, so under contention enterprise, pro and premium receive capacity in the
+ratio of their weights no matter how much any of them submits. Spare-capacity
+plans (free) are only dispatched when no paid job is waiting, and never into the
+last `paid_reserve` slots while paid jobs are running, so a free flood cannot
+delay paid traffic by more than the jobs already running. With no paid work in
+flight free jobs may use every slot; capacity is never left idle for nobody.
+
+Slots are handed out by a dispatcher that runs once per event-loop iteration.
+Requests that reach the scheduler in the same iteration are therefore ordered
+by plan rather than by arrival, which is what matters when translations run
+inline on the loop and the loop itself is the contended resource.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from plans import DEFAULT_PLAN, PRICING_PLANS, SPARE_CAPACITY_PLANS
+
+QOS_ENABLED = os.environ.get("EMOJI_QOS", "on").lower() not in ("0", "off", "false", "no")
+# Inline jobs admitted per dispatch; this bounds how long a newly arrived paid
+# request can be kept behind already-admitted work (threaded lanes use their
+# worker count)
+QOS_CAPACITY = int(os.environ.get("EMOJI_QOS_CAPACITY", 4))
+# Slots kept from spare-capacity plans while paid jobs are running
+PAID_RESERVE = int(os.environ.get("EMOJI_QOS_PAID_RESERVE", 1))
+
+# Wait-time percentiles are computed over this many recent jobs per plan
+WAIT_SAMPLES = 1024
+
+# Plan of the request being handled, set by PlanMiddleware or the handler
+request_plan: contextvars.ContextVar[str] = contextvars.ContextVar("request_plan", default=DEFAULT_PLAN)
+
+
+class TierStats:
+    """Queue wait times of one plan."""
+
+    __slots__ = ("dispatched", "total_wait", "max_wait", "recent")
+
+    def __init__(self):
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def record(self, wait: float) -> None:
+        self.dispatched += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(wait)
+
+    def as_dict(self, waiting: int) -> Dict[str, float]:
+        recent = sorted(self.recent)
+
+        def percentile(q: float) -> float:
+            return round(recent[min(len(recent) - 1, int(len(recent) * q))] * 1000, 3) if recent else 0.0
+
+        return {
+            "waiting": waiting,
+            "dispatched": self.dispatched,
+            "mean_wait_ms": round(self.total_wait / self.dispatched * 1000, 3) if self.dispatched else 0.0,
+            "p50_wait_ms": percentile(0.50),
+            "p99_wait_ms": percentile(0.99),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+class FairScheduler:
+    """Weighted fair queuing with spare-capacity-only plans. Event-loop thread only."""
+
+    def __init__(self, weights: Dict[str, float], capacity: int = QOS_CAPACITY,
+                 spare_only: Iterable[str] = SPARE_CAPACITY_PLANS, paid_reserve: int = PAID_RESERVE,
+                 default_plan: str = DEFAULT_PLAN):
+        self.weights = dict(weights)
+        self.capacity = max(1, capacity)
+        self.spare_only = frozenset(spare_only)
+        self.paid_reserve = min(paid_reserve, self.capacity - 1)
+        self.default_plan = default_plan
+        self.active = 0
+        self.active_paid = 0
+        self._virtual_time = 0.0
+        self._last_tag: Dict[str, float] = {plan: 0.0 for plan in self.weights}
+        # plan -> FIFO of (finish tag, start tag, future, enqueued_at); tags only grow within a plan
+        self._queues: Dict[str, Deque[Tuple[float, float, asyncio.Future, float]]] = {
+            plan: deque() for plan in self.weights
+        }
+        self._stats: Dict[str, TierStats] = {plan: TierStats() for plan in self.weights}
+        self._dispatch_pending = False
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _schedule_dispatch(self) -> None:
+        if not self._dispatch_pending:
+            self._dispatch_pending = True
+            asyncio.get_running_loop().call_soon(self._dispatch)
+
+    def _next_plan(self) -> Optional[str]:
+        best_plan, best_tag = None, None
+        for plan, queue in self._queues.items():
+            if queue and plan not in self.spare_only and (best_tag is None or queue[0][0] < best_tag):
+                best_plan, best_tag = plan, queue[0][0]
+        if best_plan is not None:
+            return best_plan
+        reserve = self.paid_reserve if self.active_paid else 0
+        if self.active >= self.capacity - reserve:
+            return None
+        for plan, queue in self._queues.items():
+            if queue and (best_tag is None or queue[0][0] < best_tag):
+                best_plan, best_tag = plan, queue[0][0]
+        return best_plan
+
+    def _dispatch(self) -> None:
+        self._dispatch_pending = False
+        now = time.perf_counter()
+        while self.active < self.capacity:
+            plan = self._next_plan()
+            if plan is None:
+                break
+            _, start, future, enqueued_at = self._queues[plan].popleft()
+            if future.done():
+                # Cancelled while waiting
+                continue
+            self._virtual_time = max(self._virtual_time, start)
+            self.active += 1
+            if plan not in self.spare_only:
+                self.active_paid += 1
+            self._stats[plan].record(now - enqueued_at)
+            future.set_result(None)
+
+    async def acquire(self, plan: str, cost: float = 1.0) -> None:
+        """Wait for a slot; every acquire must be paired with release(plan)."""
+        if plan not in self.weights:
+            plan = self.default_plan
+        start = max(self._virtual_time, self._last_tag[plan])
+        tag = start + cost / self.weights[plan]
+        self._last_tag[plan] = tag
+        future = asyncio.get_running_loop().create_future()
+        self._queues[plan].append((tag, start, future, time.perf_counter()))
+        self._schedule_dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled; hand the slot back
+                self.release(plan)
+            raise
+
+    def release(self, plan: str) -> None:
+        if plan not in self.weights:
+            plan = self.default_plan
+        self.active -= 1
+        if plan not in self.spare_only:
+            self.active_paid -= 1
+        self._schedule_dispatch()
+
+    @asynccontextmanager
+    async def slot(self, plan: str, cost: float = 1.0):
+        await self.acquire(plan, cost)
+        try:
+            yield
+        finally:
+            self.release(plan)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "plans": {plan: self._stats[plan].as_dict(len(self._queues[plan])) for plan in self.weights},
+        }
+
+
+def plan_weights(plans: Dict[str, Dict] = PRICING_PLANS) -> Dict[str, float]:
+    return {name: float(plan.get("qos_weight", 1)) for name, plan in plans.items()}
+
+
+def _api_key(scope) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == b"x-api-key":
+            return value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if b"api_key=" in query:
+        for part in query.decode("latin-1").split("&"):
+            name, _, value = part.partition("=")
+            if name == "api_key" and value:
+                return value
+    return None
+
+
+class PlanMiddleware:
+    """Resolve the caller's plan from X-API-Key / ?api_key= into `request_plan`."""
+
+    def __init__(self, app, resolve_plan: Callable[[str], Optional[str]]):
+        self.app = app
+        self.resolve_plan = resolve_plan
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            api_key = _api_key(scope)
+            plan = self.resolve_plan(api_key) if api_key else None
+            request_plan.set(plan or DEFAULT_PLAN)
+        await self.app(scope, receive, send)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Signed API Keys
+Self-describing API keys carrying plan, tenant and expiry, authenticated with HMAC-SHA256
+
+A key looks like `etk1.<payload>.<signature>` where the payload is the
+base64url encoding of `plan:tenant:expires:key_id` and the signature is a
+truncated HMAC of the payload. Any worker holding the secret verifies a key
+with one HMAC and a constant-time compare, without consulting a store. The
+only shared state is a small revocation list of key IDs, whose entries are
+dropped once the key would have expired anyway.
+
+Several secrets may be configured: the first signs new keys and all of them
+verify, which allows rotating the secret without invalidating issued keys.
+"""
+
+import base64
+import binascii
+import hmac
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+KEY_PREFIX = "etk1"
+SIGNATURE_BYTES = 16
+KEY_ID_BYTES = 8
+
+# Comma-separated secrets; the first one signs
+API_KEY_SECRETS = os.environ.get("EMOJI_API_KEY_SECRETS", "")
+KEY_TTL_DAYS = int(os.environ.get("EMOJI_API_KEY_TTL_DAYS", 365))
+
+REVOKED_KIND = "revoked_api_keys"
+SECRET_KIND = "secrets"
+SECRET_NAME = "api_key_hmac"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def is_signed_key(api_key: str) -> bool:
+    return api_key.startswith(KEY_PREFIX + ".")
+
+
+class KeyClaims:
+    """What a verified key says about its holder."""
+
+    __slots__ = ("plan", "tenant", "expires", "key_id")
+
+    def __init__(self, plan: str, tenant: str, expires: int, key_id: str):
+        self.plan = plan
+        self.tenant = tenant
+        self.expires = expires
+        self.key_id = key_id
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"plan": self.plan, "tenant": self.tenant, "expires": self.expires, "key_id": self.key_id}
+
+
+class RevocationList:
+    """
+    Revoked key IDs with their expiry, optionally persisted in the usage store.
+
+    Lookups only touch memory; the store's reconcile pass refreshes the list
+    so revocations made by other workers take effect within seconds.
+    """
+
+    def __init__(self, store=None, clock=time.time):
+        self.store = store
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, int] = {}
+        if store is not None:
+            self.refresh()
+            store.add_reconciler(self.refresh)
+
+    def revoke(self, key_id: str, expires: int) -> None:
+        with self._lock:
+            self._revoked[key_id] = expires
+        if self.store is not None:
+            self.store.put_record(REVOKED_KIND, key_id, expires)
+
+    def refresh(self) -> None:
+        """Reload from the store and forget entries whose keys have expired."""
+        now = self._clock()
+        stored = self.store.load_records(REVOKED_KIND)
+        for key_id, expires in stored.items():
+            if expires < now:
+                self.store.delete_record(REVOKED_KIND, key_id)
+        with self._lock:
+            stored.update(self._revoked)
+            self._revoked = {key_id: expires for key_id, expires in stored.items() if expires >= now}
+
+    def __contains__(self, key_id: str) -> bool:
+        return key_id in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+class KeySigner:
+    """Issue and verify signed API keys."""
+
+    def __init__(self, secret_list: Iterable[bytes], revoked: Optional[RevocationList] = None,
+                 clock=time.time):
+        self.secrets: List[bytes] = [secret for secret in secret_list if secret]
+        if not self.secrets:
+            raise ValueError("At least one signing secret is required")
+        self.revoked = revoked if revoked is not None else RevocationList()
+        self._clock = clock
+
+    def _sign(self, payload: bytes, secret: bytes) -> bytes:
+        return hmac.digest(secret, payload, "sha256")[:SIGNATURE_BYTES]
+
+    def issue(self, plan: str, tenant: str, ttl_days: int = KEY_TTL_DAYS) -> Tuple[str, KeyClaims]:
+        """Create a key for `tenant` on `plan` that expires after `ttl_days`."""
+        if ":" in plan or ":" in tenant:
+            raise ValueError("Plan and tenant must not contain ':'")
+        expires = int(self._clock()) + ttl_days * 86400
+        key_id = secrets.token_hex(KEY_ID_BYTES)
+        payload = f"{plan}:{tenant}:{expires}:{key_id}".encode("utf-8")
+        signature = self._sign(payload, self.secrets[0])
+        api_key = f"{KEY_PREFIX}.{_b64encode(payload)}.{_b64encode(signature)}"
+        return api_key, KeyClaims(plan, tenant, expires, key_id)
+
+    def decode(self, api_key: str) -> Optional[KeyClaims]:
+        """Claims of an authentic key, expired or not; None if forged or malformed."""
+        parts = api_key.split(".")
+        if len(parts) != 3 or parts[0] != KEY_PREFIX:
+            return None
+        try:
+            payload = _b64decode(parts[1])
+            signature = _b64decode(parts[2])
+        except (binascii.Error, ValueError):
+            return None
+        if not any(hmac.compare_digest(signature, self._sign(payload, secret)) for secret in self.secrets):
+            return None
+        try:
+            plan, tenant, expires, key_id = payload.decode("utf-8").split(":")
+            return KeyClaims(plan, tenant, int(expires), key_id)
+        except ValueError:
+            return None
+
+    def verify(self, api_key: str) -> Optional[KeyClaims]:
+        """Claims of a valid key: authentic, unexpired and not revoked."""
+        claims = self.decode(api_key)
+        if claims is None or claims.expires < self._clock() or claims.key_id in self.revoked:
+            return None
+        return claims
+
+    def revoke(self, api_key: str) -> Optional[KeyClaims]:
+        """Revoke an authentic key; returns its claims, or None if it was not one of ours."""
+        claims = self.decode(api_key)
+        if claims is not None:
+            self.revoked.revoke(claims.key_id, claims.expires)
+        return claims
+
+
+def load_secrets(configured: str = API_KEY_SECRETS, store=None) -> List[bytes]:
+    """
+    Signing secrets from EMOJI_API_KEY_SECRETS, else one shared through the
+    usage store so all workers agree, else a per-process random secret (keys
+    then only verify in the process that issued them).
+    """
+    if configured:
+        return [secret.strip().encode("utf-8") for secret in configured.split(",") if secret.strip()]
+    if store is not None:
+        return [store.setdefault_record(SECRET_KIND, SECRET_NAME, secrets.token_hex(32)).encode("ascii")]
+    return [secrets.token_bytes(32)]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Request Coalescing
+Single-flight execution of identical concurrent translations
+
+When a burst of identical requests arrives (a shared link, a marketing push),
+only the first one translates; the others wait for its result. Requests are
+identical when their normalized settings and seed match, see translation_key().
+Unseeded translations are random anyway, so sharing one draw between callers
+that asked at the same moment changes nothing they could tell apart, and the
+same key can address a response cache.
+
+A leader that is cancelled (its client left, see deadline.py) does not take its
+followers down: they retry, and one of them leads the next attempt.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from deadline import TranslationCancelled
+
+COALESCING_ENABLED = os.environ.get("EMOJI_COALESCING", "on").lower() not in ("0", "off", "false", "no")
+
+
+def translation_key(request: Any, style: Optional[str] = None, seed: Optional[int] = None) -> Tuple:
+    """
+    Key identifying a validated translation request: text, settings and seed.
+    `style` and `seed` override the request's own values.
+    """
+    if seed is None:
+        seed = getattr(request, "seed", None)
+    return (request.text, request.density, request.mode, style or request.style,
+            bool(request.add_sentiment), seed)
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one. Event-loop thread only."""
+
+    def __init__(self, enabled: bool = COALESCING_ENABLED):
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return `await fn()`, or the result of an identical call already in flight."""
+        if not self.enabled:
+            return await fn()
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                return await self._lead(key, fn)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except (TranslationCancelled, asyncio.CancelledError):
+                if future.done() and (future.cancelled()
+                                      or isinstance(future.exception(), TranslationCancelled)):
+                    # The leader was cancelled for its own reasons; try again
+                    self.coalesced -= 1
+                    self.retried += 1
+                    continue
+                raise
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers, if any, re-raise it; don't warn about it otherwise
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "inflight": self.inflight,
+        }
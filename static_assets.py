@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Static Assets and Compression
+Precompressed static files with per-encoding ETags, plus size-thresholded response compression
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Responses smaller than this are never compressed; 0 turns dynamic compression off
+GZIP_MINIMUM_SIZE = int(os.environ.get("EMOJI_GZIP_MIN_SIZE", 4096))
+GZIP_LEVEL = int(os.environ.get("EMOJI_GZIP_LEVEL", 6))
+
+# /static URLs keep their address across deploys, so clients revalidate them by ETag
+STATIC_CACHE_CONTROL = os.environ.get("EMOJI_STATIC_CACHE_CONTROL", "no-cache")
+# The HTML entry point keeps its URL across deploys, so browsers revalidate it by ETag
+PAGE_CACHE_CONTROL = "no-cache"
+
+# Files smaller than this are not worth a compressed variant
+PRECOMPRESS_MINIMUM_SIZE = 256
+
+
+class StaticAsset:
+    """One file held in memory with its precompressed variants."""
+
+    __slots__ = ("path", "media_type", "etags", "variants")
+
+    def __init__(self, path: Path):
+        data = path.read_bytes()
+        self.path = path
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if self.media_type.startswith("text/") or self.media_type in ("application/javascript", "application/json"):
+            self.media_type += "; charset=utf-8"
+        self.variants: Dict[str, bytes] = {"identity": data}
+        # Each encoding is a different representation, so it gets its own strong ETag
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self.etags: Dict[str, str] = {"identity": f'"{digest}"'}
+
+        if len(data) >= PRECOMPRESS_MINIMUM_SIZE:
+            if brotli is not None:
+                self._add_variant("br", brotli.compress(data, quality=11))
+            self._add_variant("gzip", gzip.compress(data, compresslevel=9, mtime=0))
+
+    def _add_variant(self, encoding: str, data: bytes) -> None:
+        # Only keep a variant if it actually saves bytes
+        if len(data) < len(self.variants["identity"]):
+            self.variants[encoding] = data
+            self.etags[encoding] = self.etags["identity"][:-1] + "-" + encoding + '"'
+
+    def select_encoding(self, accept_encoding: str) -> str:
+        """Pick the smallest variant the client accepts."""
+        accepted = set()
+        for item in accept_encoding.lower().split(","):
+            name, _, params = item.strip().partition(";")
+            if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(name.strip())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        """Serve the asset, honouring If-None-Match and Accept-Encoding."""
+        encoding = self.select_encoding(request.headers.get("accept-encoding", ""))
+        etag = self.etags[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        # If-None-Match uses weak comparison: proxies that re-encode may add W/
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = self.variants[encoding]
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            return Response(status_code=200, headers=headers, media_type=self.media_type)
+        return Response(content=body, headers=headers, media_type=self.media_type)
+
+
+class PrecompressedStatic:
+    """All files of a static directory, loaded and compressed once at startup."""
+
+    def __init__(self, directory: str = "static", cache_control: str = STATIC_CACHE_CONTROL):
+        self.directory = Path(directory)
+        self.cache_control = cache_control
+        self.assets: Dict[str, StaticAsset] = {}
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                self.assets[path.relative_to(self.directory).as_posix()] = StaticAsset(path)
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self.assets.get(name)
+
+    def page(self, request: Request, name: str = "index.html") -> Response:
+        """Serve an HTML entry point that must be revalidated on every visit."""
+        asset = self.assets.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        return asset.response(request, PAGE_CACHE_CONTROL)
+
+    @staticmethod
+    def _route_path(scope) -> str:
+        """Path relative to the mount point."""
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
+
+    async def __call__(self, scope, receive, send) -> None:
+        """ASGI app for mounting under `/static`."""
+        request = Request(scope, receive)
+        if request.method not in ("GET", "HEAD"):
+            response = Response(status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            asset = self.assets.get(self._route_path(scope).lstrip("/"))
+            if asset is None:
+                response = Response("Not Found", status_code=404, media_type="text/plain")
+            else:
+                response = asset.response(request, self.cache_control)
+        await response(scope, receive, send)
+
+
+def add_response_compression(app: FastAPI, minimum_size: int = GZIP_MINIMUM_SIZE,
+                             level: int = GZIP_LEVEL) -> None:
+    """
+    Gzip dynamic responses above `minimum_size` bytes.
+
+    Small replies such as a typical /translate response stay uncompressed, since
+    compressing them costs more latency than it saves on the wire. Responses that
+    already carry a Content-Encoding (the precompressed assets) are left alone.
+    """
+    if minimum_size > 0:
+        app.add_middleware(GZipMiddleware, minimum_size=minimum_size, compresslevel=level)
@@ -0,0 +1,14 @@
+import os
+
+# The shared limiter would throttle the test client's many requests from one IP;
+# rate limiting is exercised with its own limiters in test_rate_limit.py
+os.environ.setdefault("EMOJI_RATE_LIMIT_BACKEND", "off")
+
+# Keep the usage store in memory unless a test opens its own database
+os.environ.setdefault("EMOJI_USAGE_DB", "")
+
+# Likewise for the bulk job queue
+os.environ.setdefault("EMOJI_JOBS_DB", "")
+
+# And the disk level of the translation cache
+os.environ.setdefault("EMOJI_DISK_CACHE", "")
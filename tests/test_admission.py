@@ -0,0 +1,108 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware, LoopLagMonitor
+from pool import TranslationPool
+
+
+def make_client(controller):
+    app = FastAPI()
+
+    @app.get("/translate")
+    async def translate():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return TestClient(app)
+
+
+def test_sheds_on_queue_depth():
+    pool = TranslationPool(short_workers=1, long_workers=1)
+    controller = AdmissionController(pool, max_queue_depth=2, max_loop_lag=10)
+    client = make_client(controller)
+    assert client.get("/translate").status_code == 200
+
+    pool.lanes["long"].queued = 2
+    response = client.get("/translate")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/health").status_code == 200
+    assert controller.stats()["shed"] == {"loop_lag": 0, "queue_depth": 1}
+
+
+def test_sheds_on_loop_lag():
+    monitor = LoopLagMonitor(smoothing=1.0)
+    controller = AdmissionController(TranslationPool(short_workers=1, long_workers=1), monitor, max_loop_lag=0.1)
+    client = make_client(controller)
+    monitor.observe(0.5)
+    assert client.get("/translate").status_code == 503
+    monitor.observe(0.0)
+    assert client.get("/translate").status_code == 200
+    assert controller.stats()["shed_total"] == 1
+
+
+def test_lag_monitor_sees_blocked_loop():
+    monitor = LoopLagMonitor(interval=0.01, smoothing=1.0)
+
+    async def scenario():
+        monitor.ensure_started()
+        await asyncio.sleep(0.02)
+        import time
+        time.sleep(0.1)  # block the loop
+        await asyncio.sleep(0.03)
+
+    asyncio.run(scenario())
+    assert monitor.max_lag >= 0.05
+
+
+def test_pool_runs_off_loop_and_counts():
+    pool = TranslationPool(inline_budget=0.01, short_budget=0.02, inline_max_chars=10, adaptive=False)
+
+    async def scenario():
+        return await asyncio.gather(*(pool.run(5 * i, sum, [i, 1]) for i in range(5)))
+
+    assert asyncio.run(scenario()) == [1, 2, 3, 4, 5]
+    lanes = pool.stats()["lanes"]
+    assert [lanes[name]["completed"] for name in ("inline", "short", "long")] == [3, 2, 0]
+    assert pool.depth == 0
+    pool.shutdown()
+
+
+def test_metrics_exported():
+    import api_free
+
+    stats = TestClient(api_free.app).get("/metrics").json()
+    assert "admission" in stats and "translation_pool" in stats
+
+
+def test_pool_thresholds_follow_measured_cost():
+    pool = TranslationPool(inline_budget=0.001, short_budget=0.01, inline_max_chars=1000)
+    assert pool.classify(1000).name == "inline"
+    assert pool.classify(5000).name == "short"
+    assert pool.classify(20000).name == "long"
+
+    # Translations turn out ten times as expensive per character as assumed
+    for _ in range(200):
+        pool.observe(1000, 0.01)
+    assert pool.inline_max_chars < 150
+    assert pool.classify(1000).name == "short"
+    assert pool.classify(5000).name == "long"
+    pool.shutdown()
+
+
+def test_batches_classified_by_total_size_and_items():
+    pool = TranslationPool(inline_budget=0.001, short_budget=0.01, inline_max_chars=1000, adaptive=False)
+    assert pool.classify(900, items=1).name == "inline"
+    # Many tiny items still add up
+    assert pool.classify(100, items=50).name == "short"
+    pool.shutdown()
@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import api_free
+import api_premium
+from app_factory import create_app, parse_tiers
+
+
+def test_tiers_share_one_engine():
+    assert api.translator is api_free.translator is api_premium.translator
+    assert api.static_files is api_free.static_files is api_premium.static_files
+
+
+def test_all_tiers_served_from_one_app():
+    client = TestClient(create_app("free,standard,premium"))
+    # The root tier behaves like its standalone app
+    assert client.post("/translate", json={"text": "Good morning"}).json()["status"] == "success"
+    assert client.get("/stats").status_code == 200
+    # Every tier is reachable under its prefix
+    assert client.post("/free/translate", json={"text": "happy cat"}).json()["status"] == "success"
+    assert client.post("/standard/translate/batch", json={"items": [{"text": "dog"}]}).json()["count"] == 1
+    plans = client.get("/premium/pricing").json()["plans"]
+    assert set(plans["pro"]) == {"daily_limit", "features", "price"}
+    assert client.get("/static/index.html").status_code == 200
+
+
+def test_default_is_the_free_tier_alone():
+    app = create_app()
+    assert app.state.tiers == ["free"]
+    client = TestClient(app)
+    assert client.post("/translate", json={"text": "happy cat"}).json()["status"] == "success"
+    assert client.get("/premium/pricing").status_code == 404
+    assert client.get("/standard/info").status_code == 404
+
+
+def test_root_tier_selection():
+    client = TestClient(create_app(["standard", "premium"], root_tier="premium"))
+    assert client.get("/pricing").status_code == 200
+    assert client.get("/free/stats").status_code == 404
+    # No EMOJI_ADMIN_TOKEN in the test environment: admin routes are not served
+    assert client.get("/admin/memory").status_code == 404
+    assert client.get("/admin/hot").status_code == 404
+    assert client.get("/admin/oov").status_code == 404
+
+
+def test_route_table():
+    app = create_app(["standard", "premium"], root_tier="premium")
+    with warnings.catch_warnings():
+        # e.g. "Duplicate Operation ID" when a path is mounted twice
+        warnings.simplefilter("error")
+        app.openapi()
+    operations = {
+        (method.upper(), path): operation["summary"]
+        for path, methods in app.openapi()["paths"].items()
+        for method, operation in methods.items()
+    }
+    # The root tier keeps its standalone paths
+    assert operations[("POST", "/translate")] == "Translate Text"
+    assert operations[("POST", "/premium/translate")] == "Premium Translate"
+    # Under its prefix, the premium endpoint is not re-prefixed and takes the
+    # place of the plain /translate it would otherwise collide with
+    assert ("POST", "/premium/premium/translate") not in operations
+    assert operations[("GET", "/premium/pricing")] == "Get Pricing"
+    assert operations[("POST", "/standard/translate")] == "Translate Text Post"
+    assert not any(path.startswith(("/premium/premium", "/standard/standard")) for _, path in operations)
+    client = TestClient(app)
+    response = client.post("/premium/translate", json={"text": "happy cat", "api_key": "demo"})
+    assert "premium_features_used" in response.json()
+
+
+def test_invalid_tiers_rejected():
+    assert parse_tiers(" Premium, free,premium ") == ["premium", "free"]
+    with pytest.raises(ValueError):
+        parse_tiers("gold")
+    with pytest.raises(ValueError):
+        create_app("free", root_tier="premium")
@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+
+import pytest
+
+from deadline import (
+    DEADLINE_EXCEEDED, DISCONNECTED, Deadline, ReceiveWatch, TranslationCancelled, request_deadline,
+)
+from pool import TranslationPool
+from translator import EmojiTranslator
+
+LONG_TEXT = " ".join(["Good morning! I love coffee and programming."] * 200)
+
+
+@pytest.fixture(scope="module")
+def translator():
+    return EmojiTranslator()
+
+
+def test_deadline_expires_on_its_clock():
+    now = [100.0]
+    deadline = Deadline(5, clock=lambda: now[0])
+    assert not deadline.cancelled and deadline.remaining() == 5
+    now[0] = 105.0
+    assert deadline.cancelled and deadline.reason == DEADLINE_EXCEEDED
+    # The first reason sticks
+    deadline.cancel(DISCONNECTED)
+    assert deadline.reason == DEADLINE_EXCEEDED
+    assert Deadline().remaining() is None
+
+
+def test_translator_stops_with_partial_text(translator):
+    deadline = Deadline()
+    deadline.cancel()
+    with pytest.raises(TranslationCancelled) as excinfo:
+        translator.translate(LONG_TEXT, deadline=deadline)
+    assert excinfo.value.reason == DISCONNECTED
+    assert excinfo.value.partial == LONG_TEXT
+    # An untouched deadline changes nothing
+    assert "☕" in translator.translate("I love coffee", density="heavy", deadline=Deadline(60))
+
+
+def test_pool_cancels_threaded_job_on_disconnect(translator):
+    pool = TranslationPool(inline_max_chars=10, adaptive=False)
+
+    async def disconnect_soon():
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        deadline = Deadline()
+        deadline.disconnected = disconnect_soon
+        request_deadline.set(deadline)
+        start = time.perf_counter()
+        with pytest.raises(TranslationCancelled) as excinfo:
+            await pool.run(len(LONG_TEXT), translator.translate, LONG_TEXT, deadline=deadline)
+        # Cancelled jobs of the same request are not started at all
+        with pytest.raises(TranslationCancelled):
+            await pool.run(5, str.upper, "never")
+        return excinfo.value, time.perf_counter() - start
+
+    error, elapsed = asyncio.run(scenario())
+    assert error.reason == DISCONNECTED and error.partial
+    assert elapsed < 0.5
+    pool.shutdown()
+
+
+def test_receive_watch_keeps_messages_for_the_app():
+    messages = [
+        {"type": "http.request", "body": b"hello", "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        await asyncio.sleep(0)
+        return messages.pop(0)
+
+    async def scenario():
+        deadline = Deadline()
+        watch = ReceiveWatch(receive, deadline)
+        await watch.wait_disconnect()
+        return deadline, await watch.receive(), await watch.receive()
+
+    deadline, body, disconnect = asyncio.run(scenario())
+    assert deadline.reason == DISCONNECTED
+    assert body["body"] == b"hello"
+    assert disconnect["type"] == "http.disconnect"
+
+
+def test_standard_tier_returns_truncated_partial():
+    import api
+
+    deadline = Deadline()
+    deadline.cancel(DEADLINE_EXCEEDED)
+    request = api.TranslationRequest(text=LONG_TEXT)
+
+    token = request_deadline.set(deadline)
+    try:
+        result = api._translate_validated(request)
+    finally:
+        request_deadline.reset(token)
+    assert result["truncated"] is True
+    assert result["translated_text"] == LONG_TEXT
@@ -0,0 +1,155 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import document_stream
+from document_stream import (
+    DocumentStreamResponse, DocumentTooLarge, DocumentTranslator, create_document_router, format_sse,
+)
+from pool import TranslationPool
+from translator import EmojiTranslator
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(create_document_router(EmojiTranslator(), TranslationPool(short_workers=1, long_workers=1)))
+    return TestClient(app)
+
+
+class TestDocumentTranslator:
+    def setup_method(self):
+        self.translator = EmojiTranslator()
+
+    def test_phrases_survive_segment_boundaries(self):
+        document = DocumentTranslator(self.translator, density="heavy", mode="replace", segment_size=64)
+        # No punctuation, so every cut has to fall back to phrase-safe whitespace
+        text = " ".join(["we have a good morning ahead"] * 200)
+        output = ""
+        for start in range(0, len(text), 7):
+            output += document.feed(text[start:start + 7])
+        output += document.finish()
+        assert output.count("🌅") == 200
+        assert "morning" not in output
+
+    def test_output_preserves_text_in_append_mode(self):
+        document = DocumentTranslator(self.translator, density="light", style="professional", segment_size=128)
+        text = "Plain words only, nothing to translate here.\n" * 100
+        output = document.feed(text) + document.finish()
+        assert output == text
+        assert document.characters_in == len(text)
+
+    def test_sentiment_added_once(self):
+        document = DocumentTranslator(self.translator, add_sentiment=True, segment_size=64)
+        text = "This is terrible and awful. " * 20
+        output = document.feed(text) + document.finish()
+        assert output.count(" 😢") + output.count(" 😞") + output.count(" 😔") + \
+            output.count(" 😟") + output.count(" 👎") == 1
+
+
+def test_format_sse_splits_lines():
+    assert format_sse("a\nb", event="chunk") == "event: chunk\ndata: a\ndata: b\n\n"
+
+
+def test_raw_upload_streams_translation():
+    client = make_client()
+    body = ("I love coffee. " * 2000).encode("utf-8")
+    response = client.post("/translate/document?density=heavy&mode=replace", content=body,
+                           headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    assert response.text.count("☕") == 2000
+
+
+def test_multipart_upload_with_sse():
+    client = make_client()
+    files = {"file": ("doc.txt", "Good morning! Time for coffee.\n" * 50, "text/plain")}
+    response = client.post("/translate/document?density=heavy", files=files,
+                           headers={"Accept": "text/event-stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: done" in response.text
+
+
+def test_invalid_settings_rejected_before_streaming():
+    client = make_client()
+    response = client.post("/translate/document?style=loud", content=b"hello")
+    assert response.status_code == 400
+
+
+def test_oversized_body_without_length_is_rejected(monkeypatch):
+    monkeypatch.setattr(document_stream, "MAX_DOCUMENT_BYTES", 10_000)
+    client = make_client()
+
+    def body():
+        for _ in range(20):
+            yield b"I love coffee. " * 100
+
+    response = client.post("/translate/document", content=body(), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 413
+
+
+def test_document_too_large_mid_stream_aborts_the_response():
+    async def chunks():
+        yield "I love coffee☕. "
+        raise DocumentTooLarge("Document too large")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(DocumentStreamResponse(chunks(), media_type="text/plain")({"type": "http"}, None, send))
+    assert sent[0]["status"] == 200
+    # Output already went out, but the response is never completed
+    assert all(message.get("more_body", True) for message in sent[1:])
+
+
+def make_budgeted_client(budget):
+    from deadline import DeadlineMiddleware
+
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware, budget=budget)
+    app.include_router(create_document_router(EmojiTranslator(), TranslationPool(short_workers=1, long_workers=1)))
+    return TestClient(app)
+
+
+def test_large_document_outlives_the_request_budget():
+    client = make_budgeted_client(0.05)
+    body = ("I love coffee. Good morning to all of you. " * 6000).encode("utf-8")
+    response = client.post("/translate/document?density=heavy&mode=replace", content=body,
+                           headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    assert response.text.count("☕") == 6000
+
+
+def test_document_budget_cancels_the_stream(monkeypatch):
+    monkeypatch.setattr(document_stream, "DOCUMENT_BUDGET", 1e-6)
+    client = make_budgeted_client(30)
+    body = ("I love coffee. " * 20000).encode("utf-8")
+    # Spent before any output: an error status, not an empty 200
+    response = client.post("/translate/document", content=body, headers={"Content-Type": "text/plain"})
+    assert response.status_code == 504
+    response = client.post("/translate/document", content=body,
+                           headers={"Content-Type": "text/plain", "Accept": "text/event-stream"})
+    assert "event: error" in response.text and "event: done" not in response.text
+
+
+def test_cancelled_translation_mid_stream_aborts_the_response():
+    from deadline import DEADLINE_EXCEEDED, TranslationCancelled
+
+    async def chunks():
+        yield "I love coffee☕. "
+        raise TranslationCancelled(DEADLINE_EXCEEDED)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(DocumentStreamResponse(chunks(), media_type="text/plain")({"type": "http"}, None, send))
+    assert sent[0]["status"] == 200
+    assert all(message.get("more_body", True) for message in sent[1:])
@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import api_free
+from fastpath import decode_translation_request, dumps, loads, response_format
+
+DEFAULTS = {"density": "medium", "mode": "append", "style": "fun", "add_sentiment": False}
+
+
+class TestDecodeTranslationRequest:
+    def test_defaults_applied(self):
+        request = decode_translation_request(b'{"text": "hello"}', DEFAULTS)
+        assert request.text == "hello"
+        assert request.as_dict() == DEFAULTS
+        assert request.is_valid()
+
+    def test_unusual_payloads_fall_back(self):
+        for body in [b"not json", b"[1, 2]", b'{"density": "heavy"}', b'{"text": 5}',
+                     b'{"text": "hi", "add_sentiment": "yes"}', b'{"text": "hi", "density": null}']:
+            assert decode_translation_request(body, DEFAULTS) is None
+
+    def test_invalid_settings_detected(self):
+        assert not decode_translation_request(b'{"text": "hi", "style": "loud"}', DEFAULTS).is_valid()
+        assert not decode_translation_request(b'{"text": "   "}', DEFAULTS).is_valid()
+
+    def test_round_trip_keeps_emoji(self):
+        assert loads(dumps({"text": "☕"})) == {"text": "☕"}
+
+
+class TestApiFastPath:
+    def setup_method(self):
+        self.client = TestClient(api.app)
+
+    def test_post_response_schema_unchanged(self):
+        response = self.client.post("/translate", json={"text": "I love coffee", "density": "heavy"})
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"original_text", "translated_text", "settings", "timestamp", "statistics", "truncated"}
+        assert data["settings"] == {"density": "heavy", "mode": "append", "style": "fun", "add_sentiment": False}
+        assert data["statistics"]["original_length"] == len("I love coffee")
+
+    def test_get_matches_post_schema(self):
+        response = self.client.get("/translate", params={"text": "happy cat", "mode": "replace"})
+        assert response.status_code == 200
+        assert response.json()["settings"]["mode"] == "replace"
+
+    def test_missing_text_is_still_a_validation_error(self):
+        response = self.client.post("/translate", json={"density": "heavy"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "text"]
+
+    def test_invalid_settings_use_model_path(self):
+        response = self.client.post("/translate", json={"text": "hi", "style": "loud"})
+        assert response.status_code == 500
+        assert "Style must be" in response.json()["detail"]
+
+    def test_openapi_keeps_request_schema(self):
+        schema = self.client.get("/openapi.json").json()
+        body = schema["paths"]["/translate"]["post"]["requestBody"]
+        assert "text" in body["content"]["application/json"]["schema"]["properties"]
+
+
+def test_free_api_fast_path():
+    client = TestClient(api_free.app)
+    response = client.post("/translate", json={"text": "Good morning"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    assert client.post("/translate", json={"text": "x" * 10001}).status_code == 400
+    assert client.post("/translate", json={"text": "hi", "add_sentiment": "true"}).status_code == 200
+
+
+class TestContentNegotiation:
+    def setup_method(self):
+        self.client = TestClient(api.app)
+
+    def test_response_format_from_accept(self):
+        assert response_format(None) == "json"
+        assert response_format("*/*", default="text") == "text"
+        assert response_format("text/plain;q=0.9, application/json") == "json"
+        assert response_format("application/json;q=0.5, text/plain") == "text"
+        assert response_format("text/plain, application/json") == "text"
+        assert response_format("text/plain;q=0, */*;q=0.1", default="json") == "json"
+        assert response_format("application/msgpack") == "msgpack"
+
+    def test_plain_text_round_trip(self):
+        response = self.client.post("/translate?density=heavy&mode=replace&style=professional",
+                                    content="meeting today".encode("utf-8"),
+                                    headers={"Content-Type": "text/plain"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "meeting" not in response.text and "today" not in response.text
+
+    def test_json_request_with_text_accept(self):
+        response = self.client.post("/translate", json={"text": "plain words"},
+                                    headers={"Accept": "text/plain"})
+        assert response.text == "plain words"
+
+    def test_msgpack_round_trip(self):
+        msgpack = pytest.importorskip("msgpack")
+        response = self.client.post("/translate", content=msgpack.packb({"text": "I love coffee"}),
+                                    headers={"Content-Type": "application/msgpack"})
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content)["original_text"] == "I love coffee"
+
+    def test_batch_json_and_text(self):
+        response = self.client.post("/translate/batch", json={"items": [{"text": "happy cat"}, {"text": "dog"}]})
+        assert response.json()["count"] == 2
+        response = self.client.post("/translate/batch?style=professional", content=b"one\ntwo\nthree",
+                                    headers={"Content-Type": "text/plain"})
+        assert response.text == "one\ntwo\nthree"
+        response = self.client.post("/translate/batch", content=b"one\n\nthree",
+                                    headers={"Content-Type": "text/plain"})
+        assert response.status_code == 400
+        assert "Line 2" in response.json()["detail"]
+
+    def test_batch_item_errors_point_at_item(self):
+        response = self.client.post("/translate/batch", json={"items": [{"text": "ok"}, {"mode": "append"}]})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "items", 1, "text"]
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from health import LIVEZ_BODY, LivenessMiddleware, StartupProbe, create_health_router, unregister_readiness
+
+
+def ticking_clock(step):
+    """A clock that advances by `step` seconds on every reading."""
+    now = [0.0]
+
+    def clock():
+        now[0] += step
+        return now[0]
+    return clock
+
+
+def test_livez_answers_before_the_app():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = LivenessMiddleware(app)
+    asyncio.run(middleware({"type": "http", "path": "/livez"}, None, send))
+    asyncio.run(middleware({"type": "http", "path": "/translate"}, None, send))
+
+    assert calls == ["/translate"]
+    assert sent[0]["status"] == 200 and sent[1]["body"] == LIVEZ_BODY
+
+
+def test_probe_gates_readiness_until_self_test_passes():
+    ran = []
+    probe = StartupProbe([("probe_a", lambda: ran.append("a")), ("probe_b", lambda: ran.append("b"))],
+                         lambda: ran.append("self_test"), budget=1.0, clock=ticking_clock(0.5))
+    probe.register()
+    app = FastAPI()
+    app.add_middleware(LivenessMiddleware)
+    app.include_router(create_health_router())
+    client = TestClient(app)
+
+    try:
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["checks"]["probe_a"] is False
+        assert client.get("/livez").status_code == 200
+
+        probe.run()
+        assert ran == ["a", "b", "self_test"]
+        assert client.get("/readyz").json()["checks"] == {"probe_a": True, "probe_b": True, "self_test": True}
+        assert probe.stats()["self_test_ms"] == 500.0
+    finally:
+        for name in ("probe_a", "probe_b", "self_test"):
+            unregister_readiness(name)
+
+
+def test_probe_stays_unready_when_self_test_is_too_slow_or_fails():
+    slow = StartupProbe([("probe_a", lambda: None)], lambda: None, budget=0.1, attempts=3,
+                        clock=ticking_clock(0.5))
+    slow.run()
+    assert not slow.passed and "over its 100 ms budget" in slow.error
+
+    def broken():
+        raise RuntimeError("lexicon missing")
+
+    failed = StartupProbe([("probe_a", broken)], lambda: None)
+    failed.run()
+    assert failed.completed == [] and not failed.passed
+    assert failed.error == "RuntimeError: lexicon missing"
@@ -0,0 +1,106 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from heavy_hitters import HeavyHitters, HeavyHitterSketch, SpaceSaving, create_hot_router
+from usage_store import UsageStore
+
+
+def key(text):
+    return (text, "medium", "append", "fun", False, None)
+
+
+def zipf_stream(count, distinct, rng):
+    """Translation keys where the i-th most popular text is ~1/i as frequent as the first."""
+    weights = [1 / rank for rank in range(1, distinct + 1)]
+    return [key(f"text {index}") for index in rng.choices(range(distinct), weights, k=count)]
+
+
+def test_space_saving_keeps_heavy_items_with_bounds():
+    rng = random.Random(7)
+    stream = zipf_stream(20_000, 5_000, rng)
+    summary = SpaceSaving(capacity=50)
+    exact = {}
+    for item in stream:
+        summary.add(item)
+        exact[item] = exact.get(item, 0) + 1
+
+    entries = summary.entries()
+    assert len(entries) == 50
+    for item, (upper, lower) in entries.items():
+        assert lower <= exact[item] <= upper
+    # Anything above total / capacity must be tracked
+    assert all(item in entries for item, count in exact.items() if count > len(stream) / 50)
+
+
+def test_sketch_finds_top_keys_and_round_trips():
+    rng = random.Random(3)
+    tracker = HeavyHitters(width=512, depth=4, capacity=100)
+    stream = zipf_stream(20_000, 5_000, rng)
+    for item in stream:
+        tracker.record(item)
+    tracker.record(("x" * 5000, "medium", "append", "fun", False, None))
+
+    exact = {}
+    for item in stream:
+        exact[item] = exact.get(item, 0) + 1
+    expected = sorted(exact, key=exact.get, reverse=True)[:5]
+    assert tracker.hot_keys(5) == expected
+
+    view = tracker.snapshot()
+    restored = HeavyHitterSketch.from_bytes(view.to_bytes())
+    assert restored.top(10) == view.top(10)
+    for item, count, guaranteed in view.top(20):
+        assert guaranteed <= exact[item] <= count <= exact[item] + view.counts.error_bound
+
+
+def test_workers_merge_through_the_store_and_decay(tmp_path):
+    store = UsageStore(str(tmp_path / "usage.db"), background=False)
+    now = [0.0]
+    workers = [HeavyHitters(store, width=256, depth=4, capacity=20, half_life=100, clock=lambda: now[0])
+               for _ in range(2)]
+    for _ in range(30):
+        workers[0].record(key("good morning"))
+        workers[1].record(key("I love pizza"))
+    for _ in range(40):
+        workers[1].record(key("good morning"))
+
+    # Worker 0 syncs before worker 1 has contributed, so it catches up on the next round
+    store.reconcile()
+    store.reconcile()
+    top = workers[0].top(2)
+    assert [(item, count) for item, count, _ in top] == [(key("good morning"), 70), (key("I love pizza"), 30)]
+    # Syncing again adds nothing twice
+    store.reconcile()
+    assert workers[1].top(1)[0][1] == 70
+
+    now[0] = 250
+    store.reconcile()
+    assert workers[0].top(1)[0][1] == 70 >> 2
+    store.close()
+
+
+def test_admin_endpoint_lists_hot_keys_behind_token():
+    tracker = HeavyHitters(width=256, depth=4, capacity=20)
+    for _ in range(3):
+        tracker.record(key("hello"))
+    tracker.record(key("bye"))
+    app = FastAPI()
+    app.include_router(create_hot_router(tracker, token="secret"))
+    client = TestClient(app)
+
+    assert client.get("/admin/hot").status_code == 403
+    body = client.get("/admin/hot", params={"limit": 1}, headers={"X-Admin-Token": "secret"}).json()
+    assert body["total"] == 4
+    assert body["items"] == [{"key": list(key("hello")), "count": 3, "guaranteed": 3}]
+
+
+def test_admin_endpoint_closed_without_token():
+    app = FastAPI()
+    app.include_router(create_hot_router(HeavyHitters(width=256, depth=4, capacity=20), token=""))
+    assert TestClient(app).get("/admin/hot", headers={"X-Admin-Token": ""}).status_code == 403
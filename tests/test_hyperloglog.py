@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from hyperloglog import ActiveUsers, HyperLogLog
+from usage import UsageTracker
+from usage_store import UsageStore
+
+
+@pytest.mark.parametrize("precision,n", [(10, 500), (12, 20000), (14, 100000)])
+def test_estimate_within_error_bound(precision, n):
+    sketch = HyperLogLog(precision)
+    for i in range(n):
+        sketch.add(f"user-{i}")
+        sketch.add(f"user-{i}")
+    assert abs(sketch.count() - n) / n < 4 * sketch.standard_error
+
+
+def test_merge_is_union_and_serializes():
+    a, b, both = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    for i in range(3000):
+        a.add(str(i))
+        both.add(str(i))
+    for i in range(2000, 6000):
+        b.add(str(i))
+        both.add(str(i))
+    restored = HyperLogLog.from_bytes(a.to_bytes())
+    assert restored.merge(b).registers == both.registers
+    with pytest.raises(ValueError):
+        a.merge(HyperLogLog(10))
+
+
+def test_active_user_windows():
+    active = ActiveUsers(precision=12)
+    for day in range(100, 110):
+        for i in range(100):
+            active.add(f"u{day}-{i}", day)
+    assert active.estimates(day=109, month_start=105) == {
+        "daily": pytest.approx(100, rel=0.05),
+        "weekly": pytest.approx(700, rel=0.05),
+        "monthly": pytest.approx(500, rel=0.05),
+    }
+
+
+def test_sketches_merge_across_workers(tmp_path):
+    path = str(tmp_path / "usage.db")
+    first = UsageTracker(store=UsageStore(path, background=False))
+    second = UsageTracker(store=UsageStore(path, background=False))
+    for i in range(300):
+        first.check_and_increment(f"a{i}")
+        second.check_and_increment(f"b{i}")
+        second.check_and_increment(f"a{i}")
+    first.reconcile()
+    second.reconcile()
+    first.reconcile()
+    assert first.active_user_estimates()["daily"] == pytest.approx(600, rel=0.05)
+    assert second.active_user_estimates()["monthly"] == first.active_user_estimates()["monthly"]
+    assert first.active_user_estimates()["all_time"] == pytest.approx(600, rel=0.05)
+    assert second.active_user_estimates()["all_time"] == first.active_user_estimates()["all_time"]
@@ -0,0 +1,130 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from document_stream import DocumentTranslator
+import jobs
+from jobs import DONE, FAILED, QUEUED, JobQueue, JobResultResponse, _stream_results, create_jobs_router
+from translator import EmojiTranslator
+
+# Nothing here is in the lexicon, so the output must equal the input exactly
+PLAIN_TEXT = "Plain words only, nothing to translate here.\n" * 400
+PLAIN_SETTINGS = {"density": "light", "mode": "append", "style": "professional", "add_sentiment": False}
+
+
+def read_output(queue, job_id):
+    return "".join(text for _, text in queue.results(job_id, limit=10_000))
+
+
+def test_job_runs_to_completion():
+    queue = JobQueue("", EmojiTranslator(), workers=0, checkpoint_chars=4096)
+    job_id = queue.submit(PLAIN_TEXT, PLAIN_SETTINGS)
+    assert queue.status(job_id)["status"] == QUEUED
+
+    assert queue.process_next()
+    assert not queue.process_next()
+    status = queue.status(job_id)
+    assert status["status"] == DONE and status["progress"] == 1.0
+    assert status["characters_out"] == len(PLAIN_TEXT)
+    assert read_output(queue, job_id) == PLAIN_TEXT
+
+
+def test_job_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobQueue(path, EmojiTranslator(), workers=0, checkpoint_chars=4096)
+    job_id = first.submit(PLAIN_TEXT, PLAIN_SETTINGS)
+    # A draining worker stops after its next checkpoint and requeues the job
+    first._stop.set()
+    first.process_next()
+    status = first.status(job_id)
+    assert status["status"] == QUEUED and 0 < status["progress"] < 1
+    assert status["attempts"] == 0
+
+    second = JobQueue(path, EmojiTranslator(), workers=0, checkpoint_chars=4096)
+    assert second.process_next()
+    assert second.status(job_id)["status"] == DONE
+    assert read_output(second, job_id) == PLAIN_TEXT
+    assert second.resumed == 1
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    now = [1000.0]
+    queue = JobQueue(str(tmp_path / "jobs.db"), EmojiTranslator(), workers=0, lease=30, clock=lambda: now[0])
+    job_id = queue.submit(PLAIN_TEXT, PLAIN_SETTINGS)
+    crashed = queue.claim()
+    assert queue.claim() is None
+
+    now[0] += 31
+    assert queue.process_next()
+    assert queue.status(job_id)["status"] == DONE
+    # The dead worker's lease is gone, so it can no longer write
+    assert not queue._checkpoint(crashed, 0, "stale", DocumentTranslator(queue.translator))
+    assert read_output(queue, job_id) == PLAIN_TEXT
+
+
+def test_jobs_api():
+    queue = JobQueue("", EmojiTranslator(), workers=0)
+    app = FastAPI()
+    app.include_router(create_jobs_router(queue))
+    client = TestClient(app)
+
+    response = client.post("/jobs", json=dict(PLAIN_SETTINGS, text=PLAIN_TEXT))
+    assert response.status_code == 202
+    job = response.json()
+    assert client.get(job["status_url"]).json()["status"] == QUEUED
+    assert client.get(job["result_url"], params={"wait": False}).status_code == 409
+
+    queue.process_next()
+    assert client.get(job["status_url"]).json()["progress"] == 1.0
+    assert client.get(job["result_url"]).text == PLAIN_TEXT
+
+    response = client.post("/jobs?style=meme", content="I love pizza", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 202
+    assert client.get(response.json()["status_url"]).json()["settings"]["style"] == "meme"
+
+    assert client.post("/jobs", json={"text": "hi", "density": "extreme"}).status_code == 400
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_chunked_body_is_bounded(monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_DOCUMENT_BYTES", 10_000)
+    queue = JobQueue("", EmojiTranslator(), workers=0)
+    app = FastAPI()
+    app.include_router(create_jobs_router(queue))
+
+    def body():
+        for _ in range(20):
+            yield b"I love coffee. " * 100
+
+    response = TestClient(app).post("/jobs", content=body(), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 413
+    assert queue.stats()["queued"] == 0
+
+
+def test_failed_job_aborts_plain_text_stream():
+    queue = JobQueue("", EmojiTranslator(), workers=0, checkpoint_chars=4096)
+    job_id = queue.submit(PLAIN_TEXT, PLAIN_SETTINGS)
+    job = queue.claim()
+    assert queue._checkpoint(job, 4096, "partial output", DocumentTranslator(queue.translator))
+    queue._finish(job, FAILED, error="boom")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = JobResultResponse(_stream_results(queue, job_id, sse=False), media_type="text/plain")
+    asyncio.run(response.stream_response(send))
+    assert sent[1]["body"] == b"partial output"
+    # The failure never looks like a complete, short translation
+    assert all(message.get("more_body", True) for message in sent[1:])
+
+    async def collect():
+        return "".join([chunk async for chunk in _stream_results(queue, job_id, sse=True)])
+
+    assert "event: error\ndata: boom" in asyncio.run(collect())
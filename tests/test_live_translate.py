@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pool import TranslationPool
+from live_translate import LiveTranslationSession, create_live_router, diff_spans
+from translator import EmojiTranslator
+
+
+def apply_spans(text, spans):
+    for span in reversed(spans):
+        text = text[:span["start"]] + span["text"] + text[span["end"]:]
+    return text
+
+
+class TestDiffSpans:
+    def test_identical_text_has_no_spans(self):
+        assert diff_spans("hello", "hello") == []
+
+    @pytest.mark.parametrize("old,new", [
+        ("", "I love coffee☕"),
+        ("I love coffee☕", ""),
+        ("I love☕ coffee", "I love❤️ coffee☕ and tea"),
+        ("happy😊 cat🐱", "sad😢 cat🐈 dog🐶"),
+        ("a" * 3000, "b" * 3000),
+    ])
+    def test_spans_rebuild_new_text(self, old, new):
+        assert apply_spans(old, diff_spans(old, new)) == new
+
+    def test_typing_at_end_touches_only_the_tail(self):
+        spans = diff_spans("Good morning", "Good morning!")
+        assert spans == [{"start": 12, "end": 12, "text": "!"}]
+
+
+class TestLiveTranslationSession:
+    def setup_method(self):
+        self.session = LiveTranslationSession(EmojiTranslator())
+
+    def test_settings_are_validated(self):
+        assert self.session.apply_message({"type": "settings", "density": "extreme"})
+        assert self.session.settings["density"] == "medium"
+        assert self.session.apply_message({"type": "settings", "density": "heavy"}) is None
+        assert self.session.settings["density"] == "heavy"
+        assert self.session.apply_message({"type": "settings", "add_sentiment": "false"})
+        assert self.session.settings["add_sentiment"] is False
+
+    def test_splice_edits_update_text(self):
+        self.session.apply_message({"type": "edit", "text": "I love tea"})
+        self.session.apply_message({"type": "edit", "start": 7, "end": 10, "text": "coffee"})
+        assert self.session.text == "I love coffee"
+        assert self.session.apply_message({"type": "edit", "start": 20, "text": "x"})
+
+    def test_patches_track_translated_output(self):
+        self.session.apply_message({"type": "settings", "density": "heavy"})
+        self.session.apply_message({"type": "edit", "text": "I love coffee", "rev": 7})
+        patch = asyncio.run(self.session.retranslate())
+        assert patch["rev"] == 7
+        assert apply_spans("", patch["spans"]) == self.session.output
+        assert "☕" in self.session.output
+
+    def test_appending_keeps_earlier_emoji_choices(self):
+        text = "I love pizza and coffee with my dog at the beach, happy party time " * 3
+        self.session.apply_message({"type": "settings", "density": "heavy"})
+        self.session.apply_message({"type": "edit", "text": text})
+        asyncio.run(self.session.retranslate())
+        before = self.session.output
+
+        self.session.apply_message({"type": "edit", "start": len(text), "text": "cat"})
+        patch = asyncio.run(self.session.retranslate())
+        assert apply_spans(before, patch["spans"]) == self.session.output
+        assert all(span["start"] >= len(before) - 1 for span in patch["spans"])
+
+
+def test_websocket_coalesces_rapid_edits():
+    app = FastAPI()
+    pool = TranslationPool(short_workers=1, long_workers=1)
+    app.include_router(create_live_router(EmojiTranslator(), pool))
+    client = TestClient(app)
+
+    with client.websocket_connect("/ws/translate") as websocket:
+        websocket.send_json({"type": "settings", "density": "heavy", "mode": "replace"})
+        for rev, prefix in enumerate(["I", "I lo", "I love", "I love cof", "I love coffee"], 1):
+            websocket.send_json({"type": "edit", "text": prefix, "rev": rev})
+
+        patch = websocket.receive_json()
+        assert patch["type"] == "patch"
+        assert patch["rev"] == 5
+        output = apply_spans("", patch["spans"])
+        assert output.endswith("☕")
+        assert len(output) == patch["length"]
+
+        websocket.send_json({"type": "edit", "text": "", "rev": 6})
+        patch = websocket.receive_json()
+        assert apply_spans(output, patch["spans"]) == ""
+
+        websocket.send_json({"type": "shout"})
+        assert websocket.receive_json()["type"] == "error"
+
+        # A malformed frame is reported, and the connection stays usable
+        websocket.send_text("{not json")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"type": "edit", "text": "I love coffee", "rev": 7})
+        assert websocket.receive_json()["rev"] == 7
+    pool.shutdown()
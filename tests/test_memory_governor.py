@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from memory_governor import MemoryGovernor, create_admin_router
+from translation_cache import LRUCache
+
+ENTRY = "x" * 10_000
+
+
+def filled(entries: int) -> LRUCache:
+    cache = LRUCache(max_bytes=10 * 1024 * 1024)
+    for index in range(entries):
+        cache.put(index, ENTRY + str(index))
+    return cache
+
+
+def test_trims_least_useful_cache_first():
+    governor = MemoryGovernor(budget=20 * sys.getsizeof(ENTRY), background=False)
+    busy, idle = filled(10), filled(20)
+    governor.register("busy", busy)
+    governor.register("idle", idle)
+    for _ in range(50):
+        busy.get(9)
+
+    assert governor.enforce() > 0
+    assert governor.footprint() <= governor.budget
+    # The idle cache pays for all of it; the busy one keeps every entry
+    assert len(busy) == 10 and len(idle) < 20
+    assert governor.report()["caches"]["idle"]["trimmed_bytes"] > 0
+
+
+def test_under_budget_leaves_caches_alone():
+    governor = MemoryGovernor(budget=10 * 1024 * 1024, background=False)
+    cache = filled(5)
+    governor.register("translation_cache", cache)
+    assert governor.enforce() == 0 and len(cache) == 5
+
+
+def test_rss_budget_trims_a_bounded_share():
+    rss = [500 * 1024 * 1024]
+    governor = MemoryGovernor(budget=10 * 1024 * 1024, rss_budget=100 * 1024 * 1024,
+                              rss=lambda: rss[0], background=False)
+    cache = filled(20)
+    governor.register("translation_cache", cache)
+    before = cache.bytes
+    freed = governor.enforce()
+    assert 0 < freed and cache.bytes >= before * 0.7
+
+
+def test_admin_endpoint_reports_footprint_behind_token():
+    governor = MemoryGovernor(background=False)
+    governor.register("translation_cache", filled(3))
+    app = FastAPI()
+    app.include_router(create_admin_router(governor, token="s3cret"))
+    client = TestClient(app)
+
+    assert client.get("/admin/memory").status_code == 403
+    report = client.get("/admin/memory", headers={"X-Admin-Token": "s3cret"}).json()
+    assert report["caches"]["translation_cache"]["bytes"] == report["footprint"] > 30_000
+
+
+def test_admin_endpoint_closed_without_token():
+    app = FastAPI()
+    app.include_router(create_admin_router(MemoryGovernor(background=False), token=""))
+    client = TestClient(app)
+    assert client.get("/admin/memory").status_code == 403
+    assert client.get("/admin/memory", headers={"X-Admin-Token": ""}).status_code == 403
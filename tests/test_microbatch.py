@@ -0,0 +1,81 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from microbatch import MicroBatcher
+from pool import TranslationPool
+
+
+def _pool():
+    return TranslationPool(short_workers=1, long_workers=1, name="test-microbatch", adaptive=False)
+
+
+def test_concurrent_requests_share_batches():
+    pool = _pool()
+    batcher = MicroBatcher(pool, lambda item: item * 2, max_batch=8)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(n, 10) for n in range(20)))
+
+    try:
+        assert asyncio.run(scenario()) == [n * 2 for n in range(20)]
+    finally:
+        pool.shutdown()
+    stats = batcher.stats()
+    assert stats["items"] == 20
+    assert stats["batches"] < 20
+    assert stats["full_batches"] >= 1
+    assert stats["running"] == 0 and stats["waiting"] == 0
+
+
+def test_errors_reach_only_their_caller():
+    pool = _pool()
+
+    def work(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    batcher = MicroBatcher(pool, work)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(n, 10) for n in range(6)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert isinstance(results[3], ValueError)
+    assert [r for i, r in enumerate(results) if i != 3] == [0, 1, 2, 4, 5]
+
+
+def test_lone_request_runs_inline():
+    pool = _pool()
+    batcher = MicroBatcher(pool, lambda item: item.upper())
+
+    async def scenario():
+        return await batcher.submit("hi", 2)
+
+    try:
+        assert asyncio.run(scenario()) == "HI"
+        assert pool.stats()["lanes"]["inline"]["completed"] == 1
+        assert pool.stats()["lanes"]["short"]["completed"] == 0
+    finally:
+        pool.shutdown()
+    assert batcher.stats()["batches"] == 1
+
+
+def test_disabled_batcher_calls_through():
+    pool = _pool()
+    batcher = MicroBatcher(pool, lambda item: item + 1, enabled=False)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(n, 1) for n in range(4)))
+
+    try:
+        assert asyncio.run(scenario()) == [1, 2, 3, 4]
+    finally:
+        pool.shutdown()
+    assert batcher.stats()["batches"] == 0
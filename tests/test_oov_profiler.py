@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from oov_profiler import OOVProfiler, create_oov_router
+from translator import EmojiTranslator
+
+
+def test_translator_reports_missing_words_with_contexts():
+    translator = EmojiTranslator()
+    translator.oov_profiler = profiler = OOVProfiler(sample_rate=1.0)
+    translator.translate("I love pizza, but the kubernetes rollout is late", seed=1)
+    translator.translate("Kubernetes again! 42 times", seed=1)
+
+    top = {entry["word"]: entry for entry in profiler.top()}
+    assert top["kubernetes"]["count"] == 2
+    assert top["kubernetes"]["contexts"] == ["I love pizza, but the kubernetes rollout is late",
+                                             "Kubernetes again! 42 times"]
+    # Lexicon words, stop words and numbers are not reported
+    assert not {"love", "pizza", "the", "but", "42"} & set(top)
+    assert profiler.report()["texts"] == 2
+
+
+def test_sampling_and_bounded_memory():
+    translator = EmojiTranslator()
+    translator.oov_profiler = profiler = OOVProfiler(sample_rate=0.1, rng=random.Random(5))
+    for _ in range(1000):
+        translator.translate("the kubernetes rollout", seed=1)
+    assert 50 < profiler.texts < 150
+
+    profiler = OOVProfiler(sample_rate=1.0, capacity=10)
+    for index in range(200):
+        profiler.observe(f"unmapped{index} kubernetes", translator)
+    assert profiler.stats()["tracked"] == 10
+    assert len(profiler._contexts) == 10
+    assert profiler.top(1)[0]["word"] == "kubernetes"
+
+
+def test_admin_endpoint_reports_top_words_behind_token():
+    profiler = OOVProfiler(sample_rate=1.0)
+    profiler.observe("deploy the kubernetes cluster with kubernetes", EmojiTranslator())
+    app = FastAPI()
+    app.include_router(create_oov_router(profiler, token="secret"))
+    client = TestClient(app)
+
+    assert client.get("/admin/oov").status_code == 403
+    body = client.get("/admin/oov", params={"limit": 1}, headers={"X-Admin-Token": "secret"}).json()
+    assert [entry["word"] for entry in body["top"]] == ["kubernetes"]
+    assert body["top"][0]["count"] == 2 and len(body["top"][0]["contexts"]) == 2
+
+
+def test_no_token_no_contexts():
+    profiler = OOVProfiler(sample_rate=1.0, contexts_per_word=0)
+    profiler.observe("deploy the kubernetes cluster", EmojiTranslator())
+    assert profiler.top(1)[0]["contexts"] == [] and not profiler._contexts
+
+    app = FastAPI()
+    app.include_router(create_oov_router(profiler, token=""))
+    assert TestClient(app).get("/admin/oov", headers={"X-Admin-Token": ""}).status_code == 403
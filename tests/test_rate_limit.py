@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from rate_limit import MemoryBackend, RateLimiter, RateLimitMiddleware, SQLiteBackend, gcra
+
+PLANS = {
+    "free": {"rate_limit": {"per_minute": 60, "burst": 3}},
+    "pro": {"rate_limit": {"per_minute": 600, "burst": 10}},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_gcra_allows_burst_then_paces():
+    tat, now = 0.0, 10.0
+    for _ in range(3):
+        tat, retry_after = gcra(tat, now, interval=1.0, burst=3)
+        assert retry_after == 0
+    _, retry_after = gcra(tat, now, interval=1.0, burst=3)
+    assert retry_after == 1.0
+    _, retry_after = gcra(tat, now + 1.0, interval=1.0, burst=3)
+    assert retry_after == 0
+
+
+def test_plans_and_unknown_keys():
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBackend(), PLANS, "free",
+                          resolve_plan={"k1": "pro"}.get, clock=clock)
+    assert all(limiter.acquire("1.2.3.4", "k1") == 0 for _ in range(10))
+    assert limiter.acquire("1.2.3.4", "k1") > 0
+    # A made-up key does not get a fresh bucket
+    assert [limiter.acquire("5.6.7.8", f"guess{i}") == 0 for i in range(4)] == [True, True, True, False]
+
+
+def test_idle_buckets_are_evicted():
+    clock = FakeClock()
+    backend = MemoryBackend()
+    limiter = RateLimiter(backend, PLANS, "free", clock=clock)
+    for i in range(50):
+        limiter.acquire(f"10.0.0.{i}")
+    assert len(backend) == 50
+    clock.now += 120
+    limiter.acquire("10.0.0.1")
+    assert len(backend) == 1
+
+
+def test_sqlite_backend_shared_between_instances(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first, second = SQLiteBackend(path), SQLiteBackend(path)
+    assert first.acquire("ip:a", 100.0, 1.0, 2) == 0
+    assert second.acquire("ip:a", 100.0, 1.0, 2) == 0
+    assert first.acquire("ip:a", 100.0, 1.0, 2) == 1.0
+
+
+def test_middleware_returns_429_before_handler():
+    calls = []
+    app = FastAPI()
+
+    @app.post("/translate")
+    async def translate(payload: dict):
+        calls.append(payload)
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(MemoryBackend(), PLANS, "free", clock=FakeClock()))
+    client = TestClient(app)
+    statuses = [client.post("/translate", json={"text": "hi"}).status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    assert len(calls) == 3
+
+    limited = client.post("/translate", json={"text": "hi"})
+    assert limited.headers["retry-after"] == "1"
+    assert limited.json() == {"detail": "Rate limit exceeded"}
+    assert client.get("/health").status_code == 200
+
+
+def test_forwarded_client_behind_trusted_proxies():
+    app = FastAPI()
+
+    @app.get("/translate")
+    async def translate():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(MemoryBackend(), PLANS, "free", clock=FakeClock()),
+                       trust_proxy_headers=1)
+    client = TestClient(app)
+    # Visitors behind the same proxy get their own buckets; a forged leftmost entry changes nothing
+    for visitor in ("1.1.1.1", "2.2.2.2"):
+        statuses = [client.get("/translate", headers={"X-Forwarded-For": f"9.9.9.{i}, {visitor}"}).status_code
+                    for i in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+
+def test_sqlite_backend_runs_off_the_event_loop(tmp_path):
+    import threading
+
+    threads = []
+    backend = SQLiteBackend(str(tmp_path / "limits.db"))
+    acquire = backend.acquire
+    backend.acquire = lambda *args: threads.append(threading.current_thread()) or acquire(*args)
+
+    app = FastAPI()
+
+    @app.get("/translate")
+    async def translate():
+        return {"thread": threading.current_thread().name}
+
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(backend, PLANS, "free", clock=FakeClock()))
+    client = TestClient(app)
+    loop_thread = client.get("/translate").json()["thread"]
+    assert threads and threads[0].name != loop_thread
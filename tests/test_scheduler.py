@@ -0,0 +1,116 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pool import TranslationPool
+from scheduler import FairScheduler, PlanMiddleware, request_plan
+
+WEIGHTS = {"free": 1, "premium": 2, "pro": 4, "enterprise": 8}
+
+
+def run_order(scheduler, jobs):
+    """Submit (plan, cost) jobs in one loop iteration; return the order they ran in."""
+    order = []
+
+    async def job(plan, cost):
+        async with scheduler.slot(plan, cost):
+            order.append(plan)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await asyncio.gather(*(job(plan, cost) for plan, cost in jobs))
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_paid_plans_go_before_free_arrivals():
+    scheduler = FairScheduler(WEIGHTS, capacity=1, paid_reserve=0)
+    order = run_order(scheduler, [("free", 1)] * 5 + [("premium", 1), ("enterprise", 1)])
+    assert order[:2] == ["enterprise", "premium"]
+    assert order[2:] == ["free"] * 5
+
+
+def test_paid_plans_share_by_weight():
+    scheduler = FairScheduler(WEIGHTS, capacity=1, paid_reserve=0)
+    order = run_order(scheduler, [("premium", 1)] * 20 + [("enterprise", 1)] * 20)
+    # Enterprise (weight 8) gets four slots for every premium (weight 2) one
+    assert order[:10].count("enterprise") == 8
+    stats = scheduler.stats()["plans"]
+    assert stats["premium"]["dispatched"] == stats["enterprise"]["dispatched"] == 20
+    assert scheduler.active == 0
+
+
+def test_free_takes_the_paid_reserve_only_while_no_paid_work_runs():
+    scheduler = FairScheduler(WEIGHTS, capacity=3, paid_reserve=1)
+    peak = {"idle": 0, "beside_paid": 0}
+
+    async def job(plan, duration=0.001):
+        async with scheduler.slot(plan):
+            if plan == "free":
+                key = "beside_paid" if scheduler.active_paid else "idle"
+                peak[key] = max(peak[key], scheduler.active - scheduler.active_paid)
+            await asyncio.sleep(duration)
+
+    async def scenario():
+        # Idle capacity is not held back for paid work that is not there
+        await asyncio.gather(*(job("free") for _ in range(6)))
+        paid = asyncio.ensure_future(job("pro", duration=0.05))
+        while not scheduler.active_paid:
+            await asyncio.sleep(0)
+        await asyncio.gather(*(job("free") for _ in range(6)))
+        await paid
+
+    asyncio.run(scenario())
+    assert peak == {"idle": 3, "beside_paid": 1}
+    assert scheduler.active == scheduler.active_paid == 0
+
+
+def test_cancelled_waiter_is_skipped():
+    scheduler = FairScheduler(WEIGHTS, capacity=1, paid_reserve=0)
+
+    async def scenario():
+        await scheduler.acquire("pro")
+        waiter = asyncio.ensure_future(scheduler.acquire("pro"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        scheduler.release("pro")
+        await scheduler.acquire("free")
+        scheduler.release("free")
+
+    asyncio.run(scenario())
+    assert scheduler.active == 0
+    assert scheduler.waiting == 0
+
+
+def test_pool_schedules_under_request_plan():
+    pool = TranslationPool(short_workers=1, long_workers=1, weights=WEIGHTS)
+
+    async def scenario():
+        request_plan.set("pro")
+        return await pool.run(5, str.upper, "hello")
+
+    assert asyncio.run(scenario()) == "HELLO"
+    assert pool.scheduler_stats()["inline"]["plans"]["pro"]["dispatched"] == 1
+    pool.shutdown()
+
+
+def test_plan_middleware_resolves_header_and_query():
+    app = FastAPI()
+
+    @app.get("/plan")
+    async def plan():
+        return {"plan": request_plan.get()}
+
+    app.add_middleware(PlanMiddleware, resolve_plan={"k1": "pro"}.get)
+    client = TestClient(app)
+    assert client.get("/plan", headers={"X-API-Key": "k1"}).json() == {"plan": "pro"}
+    assert client.get("/plan?api_key=k1").json() == {"plan": "pro"}
+    assert client.get("/plan", headers={"X-API-Key": "bogus"}).json() == {"plan": "free"}
+    assert client.get("/plan").json() == {"plan": "free"}
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from signed_keys import KeySigner, RevocationList, load_secrets
+from usage_store import UsageStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_issue_and_verify():
+    signer = KeySigner([b"secret"])
+    api_key, claims = signer.issue("pro", "acme", ttl_days=30)
+    verified = signer.verify(api_key)
+    assert verified.as_dict() == claims.as_dict()
+    assert verified.plan == "pro" and verified.tenant == "acme"
+
+
+def test_tampered_and_foreign_keys_rejected():
+    signer = KeySigner([b"secret"])
+    api_key, _ = signer.issue("premium", "acme")
+    prefix, payload, signature = api_key.split(".")
+    forged_payload = payload[:-2] + ("AA" if payload[-2:] != "AA" else "BB")
+    assert signer.verify(f"{prefix}.{forged_payload}.{signature}") is None
+    assert KeySigner([b"other"]).verify(api_key) is None
+    assert signer.verify("etk1.garbage") is None
+    assert signer.verify("etk1.!!.??") is None
+
+
+def test_expiry_and_rotation():
+    clock = FakeClock()
+    old = KeySigner([b"old"], clock=clock)
+    api_key, _ = old.issue("premium", "acme", ttl_days=1)
+    rotated = KeySigner([b"new", b"old"], clock=clock)
+    assert rotated.verify(api_key) is not None
+    clock.now += 2 * 86400
+    assert rotated.verify(api_key) is None
+
+
+def test_revocation_shared_through_store(tmp_path):
+    path = str(tmp_path / "usage.db")
+    first_store, second_store = UsageStore(path, background=False), UsageStore(path, background=False)
+    secret = load_secrets("", first_store)
+    assert load_secrets("", second_store) == secret
+    first = KeySigner(secret, RevocationList(first_store))
+    second = KeySigner(load_secrets("", second_store), RevocationList(second_store))
+
+    api_key, _ = first.issue("pro", "acme")
+    assert second.verify(api_key) is not None
+    first.revoke(api_key)
+    assert first.verify(api_key) is None
+    first_store.flush()
+    second_store.reconcile()
+    assert second.verify(api_key) is None
+
+
+def test_premium_endpoints_accept_signed_and_legacy_keys(monkeypatch):
+    import api_premium
+
+    client = TestClient(api_premium.app)
+    # Anyone can get a free key; paid plans need the admin token
+    assert client.post("/generate-api-key").json()["plan"] == "free"
+    assert client.post("/generate-api-key", params={"plan": "pro"}).status_code == 403
+    monkeypatch.setattr(api_premium, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/generate-api-key", params={"plan": "pro"}).status_code == 403
+    issued = client.post("/generate-api-key", params={"plan": "pro", "tenant": "acme"},
+                         headers={"X-Admin-Token": "s3cret"}).json()
+    assert issued["api_key"].startswith("etk1.") and issued["tenant"] == "acme"
+    response = client.post("/premium/translate", json={"text": "hello", "api_key": issued["api_key"]})
+    assert response.json()["plan"] == "pro"
+
+    api_premium.api_keys["legacy-uuid"] = {"plan": "premium", "created": "2025-01-01", "usage": 0}
+    response = client.post("/premium/translate", json={"text": "hello", "api_key": "legacy-uuid"})
+    assert response.json()["plan"] == "premium"
+
+    assert client.post("/revoke-api-key", headers={"X-API-Key": issued["api_key"]}).json() == {"revoked": True}
+    response = client.post("/premium/translate", json={"text": "hello", "api_key": issued["api_key"]})
+    assert response.json()["plan"] == "free"
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from deadline import TranslationCancelled
+from fastpath import TranslationSettings
+from singleflight import SingleFlight, translation_key
+from translator import EmojiTranslator
+
+
+def test_identical_calls_share_one_execution():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"key": key}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do(key, lambda key=key: work(key)) for key in "aaab"))
+
+    results = asyncio.run(scenario())
+    assert sorted(calls) == ["a", "b"]
+    assert results[0] is results[1] is results[2]
+    assert flight.stats() == {"executed": 2, "coalesced": 2, "retried": 0, "inflight": 0}
+
+
+def test_errors_reach_followers():
+    flight = SingleFlight(enabled=True)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad input")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [type(e) for e in asyncio.run(scenario())] == [ValueError, ValueError]
+    assert flight.executed == 1
+
+
+def test_followers_retry_when_the_leader_is_cancelled():
+    flight = SingleFlight(enabled=True)
+    attempts = []
+
+    async def work():
+        attempts.append(len(attempts))
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise TranslationCancelled("disconnected")
+        return "done"
+
+    async def scenario():
+        return await asyncio.gather(flight.do("k", work), flight.do("k", work), flight.do("k", work),
+                                    return_exceptions=True)
+
+    leader, *followers = asyncio.run(scenario())
+    assert isinstance(leader, TranslationCancelled)
+    assert followers == ["done", "done"]
+    assert flight.stats()["retried"] == 2 and flight.executed == 2
+
+
+def test_key_normalizes_settings_and_seed():
+    request = TranslationSettings("I love coffee", "medium", "append", "fun", False, 7)
+    assert translation_key(request) == ("I love coffee", "medium", "append", "fun", False, 7)
+    assert translation_key(request, style="business")[3] == "business"
+    assert translation_key(request) != translation_key(
+        TranslationSettings("I love coffee", "medium", "append", "fun", False))
+
+
+def test_seed_makes_translation_reproducible():
+    translator = EmojiTranslator()
+    text = "Good morning! I love coffee, pizza and programming. This project is on fire!"
+    outputs = {translator.translate(text, style="meme", add_sentiment=True, seed=42) for _ in range(5)}
+    assert len(outputs) == 1
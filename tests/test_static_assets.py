@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gzip
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from static_assets import PrecompressedStatic, add_response_compression
+
+
+def make_app(tmp_path, minimum_size=1024):
+    (tmp_path / "index.html").write_text("<html>" + "emoji " * 500 + "</html>", encoding="utf-8")
+    (tmp_path / "tiny.txt").write_text("hi", encoding="utf-8")
+    static_files = PrecompressedStatic(str(tmp_path))
+
+    app = FastAPI()
+    app.mount("/static", static_files, name="static")
+    add_response_compression(app, minimum_size=minimum_size)
+
+    @app.get("/")
+    async def root(request: Request):
+        return static_files.page(request)
+
+    @app.get("/dynamic/{size}")
+    async def dynamic(size: int):
+        return PlainTextResponse("x" * size)
+
+    return TestClient(app), static_files
+
+
+def test_precompressed_variant_served(tmp_path):
+    client, static_files = make_app(tmp_path)
+    asset = static_files.get("index.html")
+    assert gzip.decompress(asset.variants["gzip"]) == asset.variants["identity"]
+
+    response = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == asset.etags["gzip"]
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.content == asset.variants["identity"]
+
+
+def test_each_encoding_has_its_own_etag(tmp_path):
+    client, static_files = make_app(tmp_path)
+    etags = static_files.get("index.html").etags
+    assert len(set(etags.values())) == len(etags) > 1
+
+    gzipped = client.get("/static/index.html", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/static/index.html", headers={"Accept-Encoding": "identity"})
+    assert gzipped.headers["etag"] != plain.headers["etag"] == etags["identity"]
+
+    # A cached gzip body does not validate a request for the identity body
+    response = client.get("/static/index.html", headers={"Accept-Encoding": "identity",
+                                                         "If-None-Match": gzipped.headers["etag"]})
+    assert response.status_code == 200
+    response = client.get("/static/index.html", headers={"Accept-Encoding": "gzip",
+                                                         "If-None-Match": "W/" + gzipped.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_tiny_files_are_not_compressed(tmp_path):
+    client, static_files = make_app(tmp_path)
+    assert set(static_files.get("tiny.txt").variants) == {"identity"}
+    response = client.get("/static/tiny.txt", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_etag_revalidation(tmp_path):
+    client, _ = make_app(tmp_path)
+    first = client.get("/")
+    assert first.headers["cache-control"] == "no-cache"
+    second = client.get("/", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.content == b""
+
+
+def test_missing_asset_is_404(tmp_path):
+    client, _ = make_app(tmp_path)
+    assert client.get("/static/nope.css").status_code == 404
+
+
+def test_dynamic_compression_threshold(tmp_path):
+    client, _ = make_app(tmp_path, minimum_size=1024)
+    small = client.get("/dynamic/200", headers={"Accept-Encoding": "gzip"})
+    large = client.get("/dynamic/5000", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert large.headers["content-encoding"] == "gzip"
+
+
+def test_dynamic_compression_can_be_disabled(tmp_path):
+    client, _ = make_app(tmp_path, minimum_size=0)
+    response = client.get("/dynamic/5000", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,128 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_cache import DiskCache, LRUCache, TranslationCache, cache_digest
+
+KEY = ("I love coffee", "medium", "append", "fun", False, 7)
+
+
+def test_lru_evicts_least_recently_used_by_bytes():
+    entry = "x" * 1000
+    lru = LRUCache(max_bytes=3 * sys.getsizeof(entry))
+    for key in "abc":
+        lru.put(key, entry)
+    assert lru.get("a") == entry
+    lru.put("d", entry)
+    assert lru.get("b") is None
+    assert [key for key in "acd" if lru.get(key)] == ["a", "c", "d"]
+    assert lru.stats()["evictions"] == 1 and lru.bytes <= lru.max_bytes
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = TranslationCache(lambda: "v1", disk=DiskCache(path, background=False))
+    first.put(KEY, "I love coffee ☕")
+    first.disk.close()
+
+    restarted = TranslationCache(lambda: "v1", disk=DiskCache(path, background=False))
+    assert restarted.get(KEY) == "I love coffee ☕"
+    assert restarted.disk.hits == 1
+    # Promoted into memory: the next lookup does not touch the disk
+    assert restarted.get(KEY) == "I love coffee ☕" and restarted.disk.hits == 1
+
+    # A new lexicon never sees the old entries
+    assert TranslationCache(lambda: "v2", disk=DiskCache(path, background=False)).get(KEY) is None
+
+
+def test_flush_against_locked_database_keeps_entries(tmp_path):
+    import sqlite3
+
+    import pytest
+
+    path = str(tmp_path / "cache.db")
+    disk = DiskCache(path, background=False)
+    disk._connection().execute("PRAGMA busy_timeout = 10")
+    disk.put(b"k", "I love coffee ☕")
+
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        disk.flush()
+    locker.execute("ROLLBACK")
+    locker.close()
+
+    assert disk.flush() == 1
+    assert DiskCache(path, background=False).get(b"k") == "I love coffee ☕"
+
+
+def test_compaction_keeps_recently_used_entries(tmp_path):
+    now = [1000]
+    disk = DiskCache(str(tmp_path / "cache.db"), max_bytes=10_000, background=False, clock=lambda: now[0])
+    keys = [cache_digest(("text", index), "v1") for index in range(20)]
+    for key in keys:
+        disk.put(key, "y" * 1000)
+        disk.flush()
+        now[0] += 1
+    disk.get(keys[0])
+    disk.flush()
+
+    evicted = disk.compact()
+    assert evicted > 0 and disk.size() <= 9_000
+    assert disk.get(keys[0]) is not None
+    assert disk.get(keys[1]) is None
+    assert disk.get(keys[-1]) is not None
+
+
+def test_translate_computes_each_key_once():
+    cache = TranslationCache(lambda: "v1")
+    calls = []
+
+    def work(text):
+        calls.append(text)
+        return text.upper()
+
+    assert cache.translate(KEY, work, "abc") == "ABC"
+    assert cache.translate(KEY, work, "abc") == "ABC"
+    assert calls == ["abc"]
+    assert cache.stats()["memory"]["hits"] == 1
+
+
+def test_unseeded_translations_cached_only_on_request(tmp_path):
+    unseeded = KEY[:-1] + (None,)
+    cache = TranslationCache(lambda: "v1")
+    cache.put(unseeded, "draw 1")
+    assert cache.get(unseeded) is None
+
+    opted_in = TranslationCache(lambda: "v1", cache_unseeded=True)
+    opted_in.put(unseeded, "draw 1")
+    assert opted_in.get(unseeded) == "draw 1"
+
+
+def test_memory_lookup_never_reads_disk(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = TranslationCache(lambda: "v1", disk=DiskCache(path, background=False))
+    first.put(KEY, "I love coffee ☕")
+    first.disk.close()
+
+    restarted = TranslationCache(lambda: "v1", disk=DiskCache(path, background=False))
+    assert restarted.get_memory(KEY) is None
+    assert restarted.disk.hits == restarted.disk.misses == 0
+    assert restarted.get(KEY) == "I love coffee ☕"
+    assert restarted.get_memory(KEY) == "I love coffee ☕"
+
+
+def test_free_and_premium_tiers_cache_seeded_translations():
+    from fastapi.testclient import TestClient
+
+    import api_free
+    import api_premium
+
+    cache = api_free.translation_cache
+    for app in (api_free.app, api_premium.app):
+        client = TestClient(app)
+        body = {"text": f"Seeded coffee for {app.title}", "seed": 3}
+        first = client.post("/translate", json=body).json()["translated_text"]
+        hits = cache.memory.hits
+        assert client.post("/translate", json=body).json()["translated_text"] == first
+        assert cache.memory.hits == hits + 1
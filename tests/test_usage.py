@@ -0,0 +1,220 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from usage import UsageTracker
+
+
+class FakeClock:
+    def __init__(self, start: datetime):
+        self.now = start.timestamp()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, **kwargs) -> None:
+        self.now += timedelta(**kwargs).total_seconds()
+
+
+def test_check_and_increment_enforces_limit():
+    tracker = UsageTracker()
+    results = [tracker.check_and_increment("alice", limit=3) for _ in range(5)]
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert results[2].remaining == 0 and results[2].exceeded
+    assert tracker.check("alice", 3).usage == 3
+    assert tracker.total == 3
+
+
+def test_refund_returns_one_request():
+    tracker = UsageTracker()
+    tracker.check_and_increment("bob", limit=1)
+    tracker.refund("bob")
+    assert tracker.check_and_increment("bob", limit=1).allowed
+
+
+def test_day_and_month_rollover():
+    clock = FakeClock(datetime(2026, 1, 31, 23, 59))
+    tracker = UsageTracker(clock=clock)
+    tracker.check_and_increment("carol")
+    tracker.check_and_increment("dave")
+    clock.advance(minutes=2)
+    snapshot = tracker.check_and_increment("carol")
+    # New day and new month: both buckets restart, and idle users are dropped
+    assert (snapshot.usage, snapshot.monthly) == (1, 1)
+    assert len(tracker) == 1
+    clock.advance(days=1)
+    snapshot = tracker.check_and_increment("carol")
+    assert (snapshot.usage, snapshot.monthly) == (1, 2)
+    assert tracker.active_users() == 1
+    # Everyone ever counted outlives the month the counters cover
+    assert tracker.active_user_estimates()["all_time"] == 2
+
+
+def test_premium_translate_reports_usage():
+    import api_premium
+    client = TestClient(api_premium.app)
+    first = client.post("/translate", json={"text": "hello"}).json()["usage_info"]
+    second = client.post("/translate", json={"text": "hello"}).json()["usage_info"]
+    assert second["daily_usage"] == first["daily_usage"] + 1
+    assert client.get("/usage").json()["daily_usage"] == second["daily_usage"]
+    analytics = client.get("/analytics").json()
+    assert analytics["active_users"] >= analytics["active_users_this_month"] >= 1
+
+
+def test_store_persists_and_reconciles_across_workers(tmp_path):
+    from usage_store import StoredMapping, UsageStore
+
+    path = str(tmp_path / "usage.db")
+    first_store = UsageStore(path, background=False)
+    second_store = UsageStore(path, background=False)
+    first, second = UsageTracker(store=first_store), UsageTracker(store=second_store)
+
+    for _ in range(3):
+        first.check_and_increment("erin", limit=5)
+    second.check_and_increment("erin", limit=5)
+    first_store.flush()
+    second_store.flush()
+    # An unflushed local increment survives reconciliation
+    second.check_and_increment("erin", limit=5)
+    second.reconcile()
+    assert second.check("erin", 5).usage == 5
+    assert second.total == 5
+    assert not second.check_and_increment("erin", limit=5).allowed
+
+    keys = StoredMapping(first_store, "api_keys")
+    keys["k1"] = {"plan": "pro"}
+    first_store.flush()
+    assert StoredMapping(second_store, "api_keys")["k1"] == {"plan": "pro"}
+
+
+def test_missing_records_are_not_looked_up_on_every_get(tmp_path):
+    from usage_store import StoredMapping, UsageStore
+
+    path = str(tmp_path / "usage.db")
+    first_store = UsageStore(path, background=False)
+    second_store = UsageStore(path, background=False)
+    now = [0.0]
+    keys = StoredMapping(second_store, "api_keys", miss_ttl=30, clock=lambda: now[0])
+    lookups = []
+    load_record = second_store.load_record
+    second_store.load_record = lambda kind, key: lookups.append(key) or load_record(kind, key)
+
+    assert keys.get("unknown") is None
+    assert keys.get("unknown") is None
+    assert lookups == ["unknown"]
+
+    # Written by another worker: visible once the miss expires
+    StoredMapping(first_store, "api_keys")["unknown"] = {"plan": "pro"}
+    first_store.flush()
+    assert keys.get("unknown") is None
+    now[0] = 31.0
+    assert keys.get("unknown") == {"plan": "pro"}
+    # Written locally: visible at once
+    assert keys.get("local") is None
+    keys["local"] = {"plan": "free"}
+    assert keys.get("local") == {"plan": "free"}
+
+
+def test_crash_loses_only_unflushed_increments(tmp_path):
+    from usage_store import UsageStore
+
+    path = str(tmp_path / "usage.db")
+    store = UsageStore(path, background=False)
+    tracker = UsageTracker(store=store)
+    for _ in range(10):
+        tracker.check_and_increment("frank")
+    store.flush()
+    for _ in range(4):
+        tracker.check_and_increment("frank")
+    store.close(flush=False)
+
+    restarted = UsageTracker(store=UsageStore(path, background=False))
+    assert restarted.check("frank", 100).usage == 10
+
+
+def test_flush_against_locked_database_keeps_the_batch(tmp_path):
+    import sqlite3
+
+    import pytest
+    from usage_store import UsageStore
+
+    path = str(tmp_path / "usage.db")
+    store = UsageStore(path, background=False)
+    tracker = UsageTracker(store=store)
+    store._connection().execute("PRAGMA busy_timeout = 10")
+    for _ in range(3):
+        tracker.check_and_increment("grace")
+
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    # BEGIN fails: the lock error surfaces, not a failed ROLLBACK, and nothing is lost
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        store.flush()
+    assert not store._connection().in_transaction
+    locker.execute("ROLLBACK")
+    locker.close()
+
+    assert store.flush() == 1
+    assert UsageTracker(store=UsageStore(path, background=False)).check("grace", 100).usage == 3
+
+
+def test_aggregates_match_replayed_workload():
+    import random
+
+    rng = random.Random(7)
+    clock = FakeClock(datetime(2026, 3, 30, 8, 0))
+    tracker = UsageTracker(clock=clock)
+    log = []  # (date, user_id, delta)
+    for step in range(3000):
+        if step % 500 == 499:
+            clock.advance(hours=13)
+        user_id = f"u{rng.randrange(60)}"
+        today = datetime.fromtimestamp(clock.now).date()
+        if tracker.check_and_increment(user_id, limit=40).allowed:
+            log.append((today, user_id, 1))
+            if rng.random() < 0.05:
+                tracker.refund(user_id)
+                log.append((today, user_id, -1))
+
+    today = datetime.fromtimestamp(clock.now).date()
+    daily, monthly = {}, {}
+    for day, user_id, delta in log:
+        if day == today:
+            daily[user_id] = daily.get(user_id, 0) + delta
+        if (day.year, day.month) == (today.year, today.month):
+            monthly[user_id] = monthly.get(user_id, 0) + delta
+
+    assert tracker.aggregates() == {
+        "total_translations": sum(delta for _, _, delta in log),
+        "translations_today": sum(daily.values()),
+        "translations_this_month": sum(monthly.values()),
+        "active_users_today": sum(1 for count in daily.values() if count),
+        "active_users_this_month": sum(1 for count in monthly.values() if count),
+    }
+
+
+def test_record_revoked_by_another_worker_expires_from_the_cache(tmp_path):
+    from usage_store import StoredMapping, UsageStore
+
+    path = str(tmp_path / "usage.db")
+    first_store = UsageStore(path, background=False)
+    second_store = UsageStore(path, background=False)
+    now = [0.0]
+    StoredMapping(first_store, "api_keys")["legacy"] = {"plan": "pro"}
+    first_store.flush()
+    first = StoredMapping(first_store, "api_keys", record_ttl=5, clock=lambda: now[0])
+    second = StoredMapping(second_store, "api_keys", record_ttl=5, clock=lambda: now[0])
+    assert first["legacy"] == second["legacy"] == {"plan": "pro"}
+
+    del first["legacy"]
+    first_store.flush()
+    assert "legacy" not in first
+    # Trusted from memory until the record TTL runs out, then re-read
+    assert "legacy" in second
+    now[0] = 6.0
+    assert "legacy" not in second
+    assert list(second) == []
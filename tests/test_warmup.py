@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from health import create_health_router, register_readiness
+from translation_cache import TranslationCache
+from translator import EmojiTranslator
+from warmup import CacheWarmer, RequestLog, frequent_keys
+
+
+def key(text, seed=None):
+    return (text, "medium", "append", "fun", False, seed)
+
+
+def test_log_ranks_recent_keys_by_frequency(tmp_path):
+    path = str(tmp_path / "requests.log")
+    log = RequestLog(path, background=False)
+    for text, count in (("I love pizza", 5), ("Good morning", 3), ("hello", 1)):
+        for _ in range(count):
+            log.record(key(text, seed=1))
+    log.record(key("x" * 10_000))
+    log.flush()
+
+    assert frequent_keys(path, limit=2) == [key("I love pizza", 1), key("Good morning", 1)]
+    # Only the most recent bytes are read
+    assert frequent_keys(path, limit=5, scan_bytes=100) == [key("hello", 1)]
+
+
+def test_log_rotates_and_still_feeds_warmup(tmp_path):
+    path = str(tmp_path / "requests.log")
+    log = RequestLog(path, max_bytes=300, background=False)
+    for _ in range(10):
+        log.record(key("I love pizza"))
+    log.flush()
+    log.record(key("Good morning"))
+    log.flush()
+
+    assert log.rotations == 1 and os.path.exists(path + ".1")
+    assert set(frequent_keys(path)) == {key("I love pizza"), key("Good morning")}
+
+
+def test_warmer_fills_cache_and_gates_readiness():
+    translator = EmojiTranslator()
+    cache = TranslationCache(lambda: translator.lexicon_version)
+    keys = [key(f"I love pizza {index}", seed=index) for index in range(10)]
+    warmer = CacheWarmer(translator, cache, lambda: keys, ready_fraction=0.5)
+    register_readiness("cache_warmup", warmer.ready)
+    app = FastAPI()
+    app.include_router(create_health_router(on_startup=[warmer.start]))
+
+    try:
+        # Started but not yet run: not ready
+        warmer._thread = object()
+        warmer.started_at = warmer.clock()
+        assert TestClient(app).get("/readyz").status_code == 503
+
+        warmer.run()
+        response = TestClient(app).get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["checks"] == {"cache_warmup": True}
+        assert warmer.stats()["computed"] == 10
+        expected = translator.translate("I love pizza 3", seed=3)
+        assert cache.get(keys[3]) == expected
+    finally:
+        register_readiness("cache_warmup", lambda: True)
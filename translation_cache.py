@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Translation Cache
+Two-level, content-addressed cache of translated text: an in-process LRU in
+front of a SQLite file shared by every worker and kept across restarts
+
+Entries are addressed by a hash of the translation key (text, settings, seed,
+see singleflight.translation_key) and the translator's lexicon_version, so an
+edited lexicon or algorithm never serves stale output and needs no explicit
+invalidation: old entries simply stop being read and age out.
+
+Lookups try the memory LRU, then the disk; a disk hit is promoted into memory.
+Request handlers consult only the memory level on the event loop (get_memory)
+and leave the disk lookup to the pool thread that would otherwise translate.
+Writes and recency updates only touch memory and are flushed to disk in one
+transaction by a background thread, which also compacts the file: once it
+grows past its byte budget, least recently used entries are deleted down to
+LOW_WATERMARK of the budget and the freed pages are returned to the OS.
+
+Only complete translations are cached, never a partial result cut short by a
+deadline. Unseeded translations are random draws, so they are only cached with
+EMOJI_CACHE_UNSEEDED=on, at the price of repeating the same draw for identical
+requests until the entry is evicted.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.environ.get("EMOJI_CACHE", "on").lower() not in ("0", "off", "false", "no")
+# Also cache translations without a seed, freezing their random emoji choices
+CACHE_UNSEEDED = os.environ.get("EMOJI_CACHE_UNSEEDED", "off").lower() in ("1", "on", "true", "yes")
+MEMORY_CACHE_BYTES = int(os.environ.get("EMOJI_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+# Path of the shared disk cache; empty keeps the cache in memory only
+DISK_CACHE_PATH = os.environ.get("EMOJI_DISK_CACHE", "emoji_cache.db")
+DISK_CACHE_BYTES = int(os.environ.get("EMOJI_DISK_CACHE_BYTES", 256 * 1024 * 1024))
+FLUSH_INTERVAL = float(os.environ.get("EMOJI_DISK_CACHE_FLUSH_INTERVAL", 1.0))
+COMPACT_INTERVAL = float(os.environ.get("EMOJI_DISK_CACHE_COMPACT_INTERVAL", 60.0))
+# Compaction trims the disk cache to this fraction of its budget
+LOW_WATERMARK = 0.9
+# Larger translations are not worth the memory or the disk I/O
+MAX_ENTRY_CHARS = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used);
+"""
+
+
+def cache_digest(key: Tuple, lexicon_version: str) -> bytes:
+    """Content address of a translation: a hash of its key and the lexicon version."""
+    data = json.dumps([lexicon_version, *key], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+class LRUCache:
+    """
+    Byte-bounded LRU mapping of strings, safe to share between threads. Besides
+    its own bound, it can be trimmed by the memory governor through shrink().
+    """
+
+    def __init__(self, max_bytes: int = MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(value: str) -> int:
+        return sys.getsizeof(value)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= self._size(previous)
+            self._entries[key] = value
+            self.bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._entries:
+            _, value = self._entries.popitem(last=False)
+            self.bytes -= self._size(value)
+            self.evictions += 1
+
+    def shrink(self, nbytes: int) -> int:
+        """Evict least recently used entries until `nbytes` are freed; returns bytes freed."""
+        freed = 0
+        with self._lock:
+            while freed < nbytes and self._entries:
+                _, value = self._entries.popitem(last=False)
+                size = self._size(value)
+                self.bytes -= size
+                freed += size
+                self.evictions += 1
+        return freed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCache:
+    """SQLite (WAL) translation store with write-behind and size-bounded LRU compaction."""
+
+    def __init__(self, path: str, max_bytes: int = DISK_CACHE_BYTES, flush_interval: float = FLUSH_INTERVAL,
+                 compact_interval: float = COMPACT_INTERVAL, background: bool = True, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self.clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # key -> value not yet on disk
+        self._pending: Dict[bytes, str] = {}
+        # key -> time of last use, for entries already on disk
+        self._touched: Dict[bytes, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.compactions = 0
+
+        connection = self._connection()
+        # Must precede table creation to take effect on a new file
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.executescript(SCHEMA)
+        if background:
+            self._thread = threading.Thread(target=self._run, name="translation-cache-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # Request path: one indexed read on a miss in memory, writes buffered
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            value = self._pending.get(key)
+        if value is None:
+            row = self._connection().execute("SELECT value FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value = row[0]
+            with self._lock:
+                self._touched[key] = int(self.clock())
+        self.hits += 1
+        return value
+
+    def put(self, key: bytes, value: str) -> None:
+        with self._lock:
+            self._pending[key] = value
+
+    # Background thread: disk
+
+    def flush(self) -> int:
+        """Write buffered entries and recency updates in one transaction; returns rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                touched, self._touched = self._touched, {}
+            if not pending and not touched:
+                return 0
+            now = int(self.clock())
+            connection = self._connection()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT INTO translations (key, value, size, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET last_used = excluded.last_used",
+                    [(key, value, len(value.encode("utf-8")), now) for key, value in pending.items()]
+                )
+                connection.executemany("UPDATE translations SET last_used = ? WHERE key = ? AND last_used < ?",
+                                       [(used, key, used) for key, used in touched.items()])
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                # Recency is best effort; entries are retried with the next flush,
+                # even if BEGIN itself failed (e.g. the database is locked)
+                with self._lock:
+                    for key, value in pending.items():
+                        self._pending.setdefault(key, value)
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            self.writes += len(pending)
+            return len(pending) + len(touched)
+
+    def size(self) -> int:
+        """Bytes of cached text on disk, all workers' entries included."""
+        row = self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()
+        return row[0]
+
+    def compact(self) -> int:
+        """Evict least recently used entries down to the low watermark; returns how many."""
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        excess = total - int(self.max_bytes * LOW_WATERMARK)
+        connection = self._connection()
+        evicted = 0
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            freed = 0
+            doomed = []
+            for key, size in connection.execute("SELECT key, size FROM translations ORDER BY last_used"):
+                doomed.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            connection.executemany("DELETE FROM translations WHERE key = ?", doomed)
+            connection.execute("COMMIT")
+            evicted = len(doomed)
+        except sqlite3.Error:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        # Hand the freed pages back so the file shrinks as well
+        connection.execute("PRAGMA incremental_vacuum")
+        self.evictions += evicted
+        self.compactions += 1
+        return evicted
+
+    def _run(self) -> None:
+        next_compact = time.monotonic() + self.compact_interval
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                now = time.monotonic()
+                if now >= next_compact:
+                    self.compact()
+                    next_compact = now + self.compact_interval
+            except sqlite3.Error:
+                logger.exception("Translation cache flush failed; will retry")
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is buffered."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "pending": pending,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "compactions": self.compactions,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class TranslationCache:
+    """Memory, then disk, in front of the translator, keyed by translation_key()."""
+
+    def __init__(self, lexicon_version: Callable[[], str], memory: Optional[LRUCache] = None,
+                 disk: Optional[DiskCache] = None, enabled: bool = CACHE_ENABLED,
+                 cache_unseeded: bool = CACHE_UNSEEDED):
+        self.lexicon_version = lexicon_version
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self.enabled = enabled
+        self.cache_unseeded = cache_unseeded
+
+    def cacheable(self, key: Tuple) -> bool:
+        """Whether `key` is cached at all; its last element is the seed."""
+        return self.enabled and (key[-1] is not None or self.cache_unseeded)
+
+    def get_memory(self, key: Tuple) -> Optional[str]:
+        """Cached translation for `key` from memory only, or None; never blocks on disk."""
+        if not self.cacheable(key):
+            return None
+        return self.memory.get(cache_digest(key, self.lexicon_version()))
+
+    def get(self, key: Tuple) -> Optional[str]:
+        """Cached translation for `key`, or None."""
+        if not self.cacheable(key):
+            return None
+        digest = cache_digest(key, self.lexicon_version())
+        value = self.memory.get(digest)
+        if value is None and self.disk is not None:
+            value = self.disk.get(digest)
+            if value is not None:
+                self.memory.put(digest, value)
+        return value
+
+    def put(self, key: Tuple, value: str) -> None:
+        """Cache a complete translation."""
+        if not self.cacheable(key) or len(value) > MAX_ENTRY_CHARS:
+            return
+        digest = cache_digest(key, self.lexicon_version())
+        self.memory.put(digest, value)
+        if self.disk is not None:
+            self.disk.put(digest, value)
+
+    def translate(self, key: Tuple, fn: Callable[..., str], *args: Any, **kwargs: Any) -> str:
+        """`fn(*args, **kwargs)`, answered from the cache when `key` is in it."""
+        value = self.get(key)
+        if value is None:
+            value = fn(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "cache_unseeded": self.cache_unseeded,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+def open_translation_cache(lexicon_version: Callable[[], str], path: str = DISK_CACHE_PATH) -> TranslationCache:
+    """Build the cache, with a disk level at `path` unless it is empty."""
+    return TranslationCache(lexicon_version, disk=DiskCache(path) if path and CACHE_ENABLED else None)
@@ -6,11 +6,23 @@ Advanced emoji translation with multiple modes, styles, and context awareness
 
 import re
 import json
+import hashlib
 import argparse
 import random
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 
+from deadline import CHECK_EVERY, Deadline, TranslationCancelled
+
+# Keywords used by the simple sentiment detector
+POSITIVE_WORDS = ['good', 'great', 'awesome', 'amazing', 'wonderful', 'fantastic', 
+                  'excellent', 'perfect', 'love', 'happy', 'excited', 'best']
+NEGATIVE_WORDS = ['bad', 'terrible', 'awful', 'horrible', 'hate', 'sad', 'angry',
+                  'frustrated', 'disappointed', 'worst', 'fail', 'problem']
+
+# Bump whenever a change to the translation code alters output for the same lexicon
+TRANSLATION_ALGORITHM_VERSION = 1
+
 class EmojiTranslator:
     def __init__(self, custom_emoji_file: Optional[str] = None):
         """Initialize the emoji translator with built-in and custom emoji mappings."""
@@ -22,10 +34,26 @@ class EmojiTranslator:
             'neutral': ['😐', '🙂', '😌']
         }
         
+        self._lexicon_version: Optional[str] = None
+        # Set by the engine to profile words missing from the lexicon (see oov_profiler.py)
+        self.oov_profiler = None
+        
         # Load custom emojis if provided
         if custom_emoji_file:
             self.load_custom_emojis(custom_emoji_file)
     
+    @property
+    def lexicon_version(self) -> str:
+        """
+        Fingerprint of the emoji tables and translation algorithm; translations
+        cached under one version are never served under another.
+        """
+        if self._lexicon_version is None:
+            tables = json.dumps([TRANSLATION_ALGORITHM_VERSION, self.phrase_patterns, self.emoji_map,
+                                 self.sentiment_emojis], sort_keys=True, ensure_ascii=False)
+            self._lexicon_version = hashlib.sha256(tables.encode("utf-8")).hexdigest()[:16]
+        return self._lexicon_version
+    
     def _get_phrase_patterns(self) -> Dict[str, str]:
         """Return dictionary of multi-word phrase patterns."""
         return {
@@ -268,21 +296,22 @@ class EmojiTranslator:
             # Add custom phrases
             if 'phrases' in custom_emojis:
                 self.phrase_patterns.update(custom_emojis['phrases'])
+            self._lexicon_version = None
                 
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Warning: Could not load custom emojis from {file_path}: {e}")
     
     def _detect_sentiment(self, text: str) -> str:
         """Simple sentiment detection based on keywords."""
-        positive_words = ['good', 'great', 'awesome', 'amazing', 'wonderful', 'fantastic', 
-                         'excellent', 'perfect', 'love', 'happy', 'excited', 'best']
-        negative_words = ['bad', 'terrible', 'awful', 'horrible', 'hate', 'sad', 'angry',
-                         'frustrated', 'disappointed', 'worst', 'fail', 'problem']
-        
         text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        positive_count = sum(1 for word in POSITIVE_WORDS if word in text_lower)
+        negative_count = sum(1 for word in NEGATIVE_WORDS if word in text_lower)
         
+        return self._sentiment_from_counts(positive_count, negative_count)
+    
+    @staticmethod
+    def _sentiment_from_counts(positive_count: int, negative_count: int) -> str:
+        """Map keyword hit counts to a sentiment label."""
         if positive_count > negative_count:
             return 'positive'
         elif negative_count > positive_count:
@@ -317,7 +346,8 @@ class EmojiTranslator:
         return available_emojis
     
     def translate(self, text: str, density: str = 'medium', mode: str = 'append', 
-                 style: str = 'fun', add_sentiment: bool = False) -> str:
+                 style: str = 'fun', add_sentiment: bool = False,
+                 deadline: Optional[Deadline] = None, seed: Optional[int] = None) -> str:
         """
         Translate text to emoji-enhanced version.
         
@@ -327,24 +357,35 @@ class EmojiTranslator:
             mode: 'append' (word + emoji) or 'replace' (emoji only)
             style: 'fun', 'professional', or 'meme' - controls emoji selection
             add_sentiment: Whether to add sentiment emojis at the end
+            deadline: Checked while translating; once it is cancelled or expired,
+                TranslationCancelled is raised with the partly translated text
+            seed: Makes the emoji choices reproducible: the same text, settings
+                and seed always give the same translation
         """
+        rng = random if seed is None else random.Random(seed)
         result = text
         
         # Step 1: Replace multi-word phrases first
-        result = self._replace_phrases(result, density, mode, style)
+        result = self._replace_phrases(result, density, mode, style, deadline, rng)
         
         # Step 2: Replace individual words
-        result = self._replace_words(result, density, mode, style)
+        result = self._replace_words(result, density, mode, style, deadline, rng)
         
         # Step 3: Add sentiment emoji if requested
         if add_sentiment:
             sentiment = self._detect_sentiment(text)
-            sentiment_emoji = random.choice(self.sentiment_emojis[sentiment])
+            sentiment_emoji = rng.choice(self.sentiment_emojis[sentiment])
             result = f"{result} {sentiment_emoji}"
         
+        # Step 4: Report words the lexicon lacks, for a sample of texts
+        profiler = self.oov_profiler
+        if profiler is not None and profiler.sample():
+            profiler.observe(text, self)
+        
         return result
     
-    def _replace_phrases(self, text: str, density: str, mode: str, style: str) -> str:
+    def _replace_phrases(self, text: str, density: str, mode: str, style: str,
+                         deadline: Optional[Deadline] = None, rng=random) -> str:
         """Replace multi-word phrases with emojis."""
         result = text
         
@@ -352,6 +393,9 @@ class EmojiTranslator:
         sorted_phrases = sorted(self.phrase_patterns.keys(), key=len, reverse=True)
         
         for phrase in sorted_phrases:
+            if deadline is not None and deadline.cancelled:
+                raise TranslationCancelled(deadline.reason, partial=result)
+            
             # Find phrase in text (case-insensitive)
             pattern = re.compile(re.escape(phrase), re.IGNORECASE)
             matches = list(pattern.finditer(result))
@@ -361,14 +405,14 @@ class EmojiTranslator:
                 
                 # Apply style modifications
                 if style == 'meme':
-                    emoji = emoji * random.randint(2, 4)
+                    emoji = emoji * rng.randint(2, 4)
                 elif style == 'professional':
                     # Be more selective in professional mode
                     if phrase not in ['good morning', 'good night', 'touch base', 'circle back']:
                         continue
                 
                 # Apply density (phrases are less affected by density)
-                if density == 'light' and random.random() < 0.7:  # 70% chance for phrases in light mode
+                if density == 'light' and rng.random() < 0.7:  # 70% chance for phrases in light mode
                     continue
                 
                 # Replace phrase while preserving case
@@ -385,7 +429,8 @@ class EmojiTranslator:
         
         return result
     
-    def _replace_words(self, text: str, density: str, mode: str, style: str) -> str:
+    def _replace_words(self, text: str, density: str, mode: str, style: str,
+                       deadline: Optional[Deadline] = None, rng=random) -> str:
         """Replace individual words with emojis."""
         # Find all words in the text
         word_pattern = re.compile(r'\b\w+\b')
@@ -401,7 +446,10 @@ class EmojiTranslator:
             'heavy': 1.0    # Always apply if word is in map
         }
         
-        for match in matches:
+        for index, match in enumerate(matches):
+            if deadline is not None and index % CHECK_EVERY == 0 and deadline.cancelled:
+                raise TranslationCancelled(deadline.reason, partial=result)
+            
             start, end = match.span()
             word = match.group()
             word_lower = word.lower()
@@ -422,15 +470,15 @@ class EmojiTranslator:
             
             # Apply density filtering - but ensure some words get through
             chance = density_chance.get(density, 0.75)
-            if random.random() > chance:
+            if rng.random() > chance:
                 continue
             
             # Select emoji
-            emoji = random.choice(available_emojis)
+            emoji = rng.choice(available_emojis)
             
             # Apply style modifications
             if style == 'meme':
-                emoji = emoji * random.randint(2, 3)
+                emoji = emoji * rng.randint(2, 3)
             
             # Calculate actual position with offset
             actual_start = start + offset
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Usage Counters
+Fixed-size per-user day/month counters with O(1) check-and-increment and automatic expiry
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from hyperloglog import DEFAULT_PRECISION, ActiveUsers, HyperLogLog
+
+# Name of the all-time active-user sketch in the usage store
+EVER_ACTIVE_SKETCH = "active_users_ever"
+
+
+def _merge_sketch_bytes(stored: Optional[bytes], data: bytes) -> bytes:
+    """Union of two serialized sketches; a stored sketch of another precision is replaced."""
+    sketch = HyperLogLog.from_bytes(data)
+    if stored is not None:
+        previous = HyperLogLog.from_bytes(stored)
+        if previous.precision == sketch.precision:
+            sketch.merge(previous)
+    return sketch.to_bytes()
+
+
+class UsageCounter:
+    """Usage of one user: the current day's and month's counts, nothing else."""
+
+    __slots__ = ("day", "daily", "month", "monthly")
+
+    def __init__(self, day: int, month: int):
+        self.day = day
+        self.daily = 0
+        self.month = month
+        self.monthly = 0
+
+    def roll(self, day: int, month: int) -> None:
+        """Reset buckets that belong to an earlier day or month."""
+        if self.day != day:
+            self.day = day
+            self.daily = 0
+        if self.month != month:
+            self.month = month
+            self.monthly = 0
+
+
+class UsageSnapshot:
+    """Result of a usage check, valid for the moment it was taken."""
+
+    __slots__ = ("usage", "limit", "monthly", "allowed")
+
+    def __init__(self, usage: int, limit: int, monthly: int, allowed: bool):
+        self.usage = usage
+        self.limit = limit
+        self.monthly = monthly
+        self.allowed = allowed
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.usage)
+
+    @property
+    def exceeded(self) -> bool:
+        return self.usage >= self.limit
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "usage": self.usage,
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "exceeded": self.exceeded,
+        }
+
+
+class UsageTracker:
+    """
+    Per-user daily and monthly usage counters.
+
+    Days are numbered as local epoch days and months as `year * 12 + month`. The
+    next local midnight is precomputed, so the common case costs one time.time()
+    call and an integer comparison; the calendar is only consulted on rollover.
+    Counters that belong to an earlier month are dropped at rollover, which keeps
+    memory proportional to this month's active users.
+
+    Aggregates for the current day and month (active users, translations) are
+    maintained as counts change, so reading them never walks the counters.
+    Daily, weekly, monthly and all-time active users are also estimated from
+    HyperLogLog sketches, which merge across workers through the store. The
+    sketches come on top of the per-user counters, which daily limits need
+    anyway; they add a few KB, not a saving.
+
+    With a `store` (see usage_store.UsageStore), every change is also buffered
+    for persistence, and the store's flush thread periodically replaces these
+    counters with the totals of all workers.
+    """
+
+    def __init__(self, clock=time.time, store=None, precision: int = DEFAULT_PRECISION):
+        self._clock = clock
+        self.active = ActiveUsers(precision)
+        # Every user ever counted, kept past the month the counters cover
+        self.ever = HyperLogLog(precision)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, UsageCounter] = {}
+        self.total = 0
+        self.daily_active = 0
+        self.daily_total = 0
+        self.monthly_active = 0
+        self.monthly_total = 0
+        self._next_boundary = 0.0
+        self._day = 0
+        self._month = 0
+        self._month_start = 0
+        self._advance(clock())
+        self.store = store
+        if store is not None:
+            store.add_reconciler(self.reconcile)
+            self.reconcile()
+
+    def _advance(self, now: float) -> None:
+        """Recompute the current day/month numbers and the next boundary."""
+        local = datetime.fromtimestamp(now)
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        month = local.year * 12 + local.month - 1
+        if month != self._month:
+            self.monthly_active = self.monthly_total = 0
+        self.daily_active = self.daily_total = 0
+        self._day = midnight.toordinal()
+        self._month = month
+        self._month_start = midnight.replace(day=1).toordinal()
+        self._next_boundary = (midnight + timedelta(days=1)).timestamp()
+        self._prune()
+
+    def _prune(self) -> None:
+        stale = [user_id for user_id, counter in self._counters.items() if counter.month != self._month]
+        for user_id in stale:
+            del self._counters[user_id]
+
+    def _tick(self) -> None:
+        """Start a new day (and maybe month) once the precomputed boundary passes."""
+        now = self._clock()
+        if now >= self._next_boundary:
+            self._advance(now)
+
+    def _counter(self, user_id: str) -> UsageCounter:
+        self._tick()
+        counter = self._counters.get(user_id)
+        if counter is None:
+            counter = self._counters[user_id] = UsageCounter(self._day, self._month)
+        else:
+            counter.roll(self._day, self._month)
+        return counter
+
+    def check(self, user_id: str, limit: int) -> UsageSnapshot:
+        """Current usage without consuming any."""
+        with self._lock:
+            counter = self._counters.get(user_id)
+            if counter is None:
+                return UsageSnapshot(0, limit, 0, limit > 0)
+            counter = self._counter(user_id)
+            return UsageSnapshot(counter.daily, limit, counter.monthly, counter.daily < limit)
+
+    def check_and_increment(self, user_id: str, limit: Optional[int] = None) -> UsageSnapshot:
+        """
+        Atomically count one request if it is within `limit` for today.
+
+        With `limit=None` the request is always counted. The returned snapshot
+        already includes this request when `allowed` is true.
+        """
+        with self._lock:
+            counter = self._counter(user_id)
+            if limit is not None and counter.daily >= limit:
+                return UsageSnapshot(counter.daily, limit, counter.monthly, False)
+            if not counter.daily:
+                self.daily_active += 1
+                # One sketch update per user per day
+                self.active.add(user_id, self._day)
+                self.ever.add(user_id)
+            if not counter.monthly:
+                self.monthly_active += 1
+            counter.daily += 1
+            counter.monthly += 1
+            self.daily_total += 1
+            self.monthly_total += 1
+            self.total += 1
+            if self.store is not None:
+                self.store.add(user_id, counter.day)
+            return UsageSnapshot(counter.daily, limit if limit is not None else counter.daily,
+                                 counter.monthly, True)
+
+    def refund(self, user_id: str) -> None:
+        """Give back one request counted by check_and_increment, e.g. after a failure."""
+        with self._lock:
+            counter = self._counters.get(user_id)
+            if counter is not None and counter.day == self._day and counter.daily > 0:
+                counter.daily -= 1
+                counter.monthly -= 1
+                if not counter.daily:
+                    self.daily_active -= 1
+                if not counter.monthly:
+                    self.monthly_active -= 1
+                self.daily_total -= 1
+                self.monthly_total -= 1
+                self.total -= 1
+                if self.store is not None:
+                    self.store.add(user_id, counter.day, -1)
+
+    def reconcile(self) -> None:
+        """
+        Replace local counts with persisted counts of all workers plus this
+        worker's unflushed changes. Runs on the store's flush thread.
+        """
+        with self._lock:
+            day, month_start = self._day, self._month_start
+            first_day = min(month_start, day - 6)
+            local = {d: sketch.copy() for d, sketch in self.active.days.items() if d >= first_day}
+            ever = self.ever.to_bytes()
+        merged_sketches = self.store.merge_sketches(local, first_day)
+        merged_ever = HyperLogLog.from_bytes(self.store.merge_blob(EVER_ACTIVE_SKETCH, ever, _merge_sketch_bytes))
+        persisted, total = self.store.load_usage(day, month_start)
+
+        with self._lock:
+            for sketch_day, sketch in merged_sketches.items():
+                self.active.merge_day(sketch_day, sketch)
+            self.ever.merge(merged_ever)
+            if self._day != day:
+                # Rolled over while reading; the next reconcile will catch up
+                return
+            pending = self.store.pending_usage(month_start)
+            merged: Dict[str, list] = {user_id: list(counts) for user_id, counts in persisted.items()}
+            for (user_id, pending_day), delta in pending.items():
+                counts = merged.setdefault(user_id, [0, 0])
+                counts[1] += delta
+                if pending_day == day:
+                    counts[0] += delta
+            for user_id, counter in self._counters.items():
+                counter.roll(self._day, self._month)
+                if user_id not in merged:
+                    counter.daily = counter.monthly = 0
+            for user_id, (daily, monthly) in merged.items():
+                counter = self._counters.get(user_id)
+                if counter is None:
+                    counter = self._counters[user_id] = UsageCounter(self._day, self._month)
+                counter.daily = daily
+                counter.monthly = monthly
+            self.total = total + self.store.pending_total()
+            # Off the request path, so recounting the aggregates here is fine
+            self.daily_active = sum(1 for daily, _ in merged.values() if daily)
+            self.daily_total = sum(daily for daily, _ in merged.values())
+            self.monthly_active = sum(1 for _, monthly in merged.values() if monthly)
+            self.monthly_total = sum(monthly for _, monthly in merged.values())
+
+    def active_users(self) -> int:
+        """Users with any usage this month."""
+        with self._lock:
+            self._tick()
+            return self.monthly_active
+
+    def active_user_estimates(self) -> Dict[str, int]:
+        """Approximate daily, rolling 7-day, calendar-month and all-time active users."""
+        with self._lock:
+            self._tick()
+            day, month_start = self._day, self._month_start
+            snapshot = ActiveUsers(self.active.precision)
+            for sketch_day, sketch in self.active.days.items():
+                if sketch_day >= min(month_start, day - 6):
+                    snapshot.days[sketch_day] = sketch.copy()
+            ever = self.ever.copy()
+        # Merging sketches is the slow part; do it without holding the lock
+        estimates = snapshot.estimates(day, month_start)
+        estimates["all_time"] = ever.count()
+        return estimates
+
+    def aggregates(self) -> Dict[str, int]:
+        """Rolling totals for today and this month, read in O(1)."""
+        with self._lock:
+            self._tick()
+            return {
+                "total_translations": self.total,
+                "translations_today": self.daily_total,
+                "translations_this_month": self.monthly_total,
+                "active_users_today": self.daily_active,
+                "active_users_this_month": self.monthly_active,
+            }
+
+    def __len__(self) -> int:
+        return len(self._counters)
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Persistent Usage Store
+SQLite (WAL) write-behind store for usage counts, active-user sketches, API keys and premium users
+
+Request handlers only touch memory: increments land in a buffer that a
+background thread flushes in one transaction every `flush_interval` seconds.
+The same thread periodically reads the merged counts of all workers back into
+each process's UsageTracker, so limits converge across workers.
+
+A crash loses at most the increments buffered since the last flush, i.e.
+roughly `flush_interval` seconds of this worker's traffic; bench_usage_store.py
+measures both throughput and that drift.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+# Path of the SQLite database; empty keeps usage in memory only
+USAGE_DB_PATH = os.environ.get("EMOJI_USAGE_DB", "emoji_usage.db")
+FLUSH_INTERVAL = float(os.environ.get("EMOJI_USAGE_FLUSH_INTERVAL", 1.0))
+RECONCILE_INTERVAL = float(os.environ.get("EMOJI_USAGE_RECONCILE_INTERVAL", 5.0))
+# Daily rows older than this are deleted; months only ever need the last ~31 days
+RETENTION_DAYS = 62
+# Seconds a record lookup that missed is answered from memory, so unknown API
+# keys do not hit SQLite on every request; bounded to MAX_MISSES keys
+MISS_TTL = float(os.environ.get("EMOJI_USAGE_MISS_TTL", 30.0))
+MAX_MISSES = 10000
+# Seconds a cached record is trusted before it is re-read, so a record changed or
+# revoked by another worker takes effect here within this delay
+RECORD_TTL = float(os.environ.get("EMOJI_USAGE_RECORD_TTL", 5.0))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_usage (
+    user_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_usage_day ON daily_usage (day);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS active_user_sketches (
+    day INTEGER PRIMARY KEY,
+    sketch BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sketches (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+TOTAL_COUNTER = "translations"
+
+
+class UsageStore:
+    """Buffered, batch-flushed persistence for usage and account records."""
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL,
+                 reconcile_interval: float = RECONCILE_INTERVAL, background: bool = True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (user_id, day) -> unflushed increment
+        self._pending: Dict[Tuple[str, int], int] = defaultdict(int)
+        # (kind, key) -> JSON value, or None for a deletion
+        self._pending_records: Dict[Tuple[str, str], Optional[str]] = {}
+        self._reconcilers: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+
+        self._connection().executescript(SCHEMA)
+        if background:
+            self._thread = threading.Thread(target=self._run, name="usage-store-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # Request path: memory only
+
+    def add(self, user_id: str, day: int, delta: int = 1) -> None:
+        """Buffer a usage change; persisted by the next flush."""
+        with self._lock:
+            self._pending[(user_id, day)] += delta
+
+    def put_record(self, kind: str, key: str, value: Any) -> None:
+        with self._lock:
+            self._pending_records[(kind, key)] = json.dumps(value)
+
+    def delete_record(self, kind: str, key: str) -> None:
+        with self._lock:
+            self._pending_records[(kind, key)] = None
+
+    def pending_usage(self, since_day: int) -> Dict[Tuple[str, int], int]:
+        """Unflushed increments for `since_day` onwards, keyed by (user_id, day)."""
+        with self._lock:
+            return {key: delta for key, delta in self._pending.items() if key[1] >= since_day}
+
+    def pending_total(self) -> int:
+        with self._lock:
+            return sum(self._pending.values())
+
+    # Background thread: disk
+
+    def flush(self) -> int:
+        """Write buffered changes in one transaction; returns the number of rows touched."""
+        with self._flush_lock:
+            with self._lock:
+                usage, self._pending = self._pending, defaultdict(int)
+                records, self._pending_records = self._pending_records, {}
+            usage = {key: delta for key, delta in usage.items() if delta}
+            if not usage and not records:
+                return 0
+
+            connection = self._connection()
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT INTO daily_usage (user_id, day, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, day) DO UPDATE SET count = count + excluded.count",
+                    [(user_id, day, delta) for (user_id, day), delta in usage.items()]
+                )
+                connection.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (TOTAL_COUNTER, sum(usage.values()))
+                )
+                for (kind, key), value in records.items():
+                    if value is None:
+                        connection.execute("DELETE FROM records WHERE kind = ? AND key = ?", (kind, key))
+                    else:
+                        connection.execute("INSERT OR REPLACE INTO records (kind, key, value) VALUES (?, ?, ?)",
+                                           (kind, key, value))
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                # Put the batch back so it is retried with the next flush, even
+                # if BEGIN itself failed (e.g. the database is locked)
+                with self._lock:
+                    for key, delta in usage.items():
+                        self._pending[key] += delta
+                    for key, value in records.items():
+                        self._pending_records.setdefault(key, value)
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            self.flushes += 1
+            return len(usage) + len(records)
+
+    def load_usage(self, day: int, month_start: int) -> Tuple[Dict[str, Tuple[int, int]], int]:
+        """Persisted (daily, monthly) counts of this month's users, and the all-time total."""
+        connection = self._connection()
+        rows = connection.execute(
+            "SELECT user_id, SUM(CASE WHEN day = ? THEN count ELSE 0 END), SUM(count) "
+            "FROM daily_usage WHERE day >= ? GROUP BY user_id",
+            (day, month_start)
+        ).fetchall()
+        total = connection.execute("SELECT value FROM counters WHERE name = ?", (TOTAL_COUNTER,)).fetchone()
+        return {user_id: (daily, monthly) for user_id, daily, monthly in rows}, total[0] if total else 0
+
+    def merge_sketches(self, sketches: Dict[int, HyperLogLog], first_day: int) -> Dict[int, HyperLogLog]:
+        """
+        Merge per-day active-user sketches into the stored ones and return the
+        union of all workers' sketches for every day from `first_day` on.
+        Merging is idempotent, so sending the same sketch again is harmless.
+        """
+        merged: Dict[int, HyperLogLog] = {}
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for day, sketch in sketches.items():
+                row = connection.execute("SELECT sketch FROM active_user_sketches WHERE day = ?", (day,)).fetchone()
+                result = sketch.copy()
+                if row:
+                    stored = HyperLogLog.from_bytes(row[0])
+                    if stored.precision == sketch.precision:
+                        result.merge(stored)
+                connection.execute("INSERT OR REPLACE INTO active_user_sketches (day, sketch) VALUES (?, ?)",
+                                   (day, result.to_bytes()))
+                merged[day] = result
+            for day, data in connection.execute(
+                "SELECT day, sketch FROM active_user_sketches WHERE day >= ?", (first_day,)
+            ).fetchall():
+                if day not in merged:
+                    merged[day] = HyperLogLog.from_bytes(data)
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return merged
+
+    def merge_blob(self, name: str, data: bytes, merge: Callable[[Optional[bytes], bytes], bytes]) -> bytes:
+        """
+        Replace the blob stored under `name` with `merge(stored, data)`, where
+        `stored` is None the first time, in one transaction; returns the result.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT data FROM sketches WHERE name = ?", (name,)).fetchone()
+            result = merge(row[0] if row else None, data)
+            connection.execute("INSERT OR REPLACE INTO sketches (name, data) VALUES (?, ?)", (name, result))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def load_record(self, kind: str, key: str) -> Optional[Any]:
+        with self._lock:
+            if (kind, key) in self._pending_records:
+                value = self._pending_records[(kind, key)]
+                return None if value is None else json.loads(value)
+        row = self._connection().execute(
+            "SELECT value FROM records WHERE kind = ? AND key = ?", (kind, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def setdefault_record(self, kind: str, key: str, value: Any) -> Any:
+        """Store `value` unless a record exists, written through; returns the stored value."""
+        connection = self._connection()
+        connection.execute("INSERT OR IGNORE INTO records (kind, key, value) VALUES (?, ?, ?)",
+                           (kind, key, json.dumps(value)))
+        row = connection.execute("SELECT value FROM records WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return json.loads(row[0])
+
+    def load_records(self, kind: str) -> Dict[str, Any]:
+        rows = self._connection().execute("SELECT key, value FROM records WHERE kind = ?", (kind,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def prune(self, before_day: int) -> None:
+        connection = self._connection()
+        connection.execute("DELETE FROM daily_usage WHERE day < ?", (before_day,))
+        connection.execute("DELETE FROM active_user_sketches WHERE day < ?", (before_day,))
+
+    def add_reconciler(self, reconcile: Callable[[], None]) -> None:
+        """Register a callback run after flushes to pull in other workers' counts."""
+        self._reconcilers.append(reconcile)
+
+    def reconcile(self) -> None:
+        for reconcile in self._reconcilers:
+            reconcile()
+
+    def _run(self) -> None:
+        next_reconcile = time.monotonic() + self.reconcile_interval
+        next_prune = 0.0
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                now = time.monotonic()
+                if now >= next_reconcile:
+                    self.reconcile()
+                    next_reconcile = now + self.reconcile_interval
+                if now >= next_prune:
+                    self.prune(date.today().toordinal() - RETENTION_DAYS)
+                    next_prune = now + 3600
+            except sqlite3.Error:
+                logger.exception("Usage store flush failed; will retry")
+
+    def close(self, flush: bool = True) -> None:
+        """Stop the flush thread; `flush=False` drops buffered changes, as a crash would."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        if flush:
+            self.flush()
+        else:
+            with self._lock:
+                self._pending.clear()
+                self._pending_records.clear()
+
+
+class StoredMapping:
+    """Dict-like view of one record kind: cached reads, write-behind writes."""
+
+    def __init__(self, store: UsageStore, kind: str, miss_ttl: float = MISS_TTL,
+                 max_misses: int = MAX_MISSES, record_ttl: float = RECORD_TTL,
+                 clock=time.monotonic):
+        self.store = store
+        self.kind = kind
+        self.miss_ttl = miss_ttl
+        self.max_misses = max_misses
+        self.record_ttl = record_ttl
+        self._clock = clock
+        self._cache: Dict[str, Any] = store.load_records(kind)
+        # key -> time until which the cached value is trusted without a re-read
+        fresh_until = clock() + record_ttl
+        self._fresh: Dict[str, float] = dict.fromkeys(self._cache, fresh_until)
+        # key -> time until which it is known to be missing, oldest first
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = self._clock()
+        with self._lock:
+            if key in self._cache and self._fresh.get(key, 0.0) > now:
+                return self._cache[key]
+            if self._misses.get(key, 0.0) > now:
+                return default
+        # Unknown or stale here; possibly written or revoked by another worker
+        value = self.store.load_record(self.kind, key)
+        with self._lock:
+            if value is None:
+                self._cache.pop(key, None)
+                self._fresh.pop(key, None)
+                if self.miss_ttl > 0:
+                    self._misses.pop(key, None)
+                    self._misses[key] = now + self.miss_ttl
+                    while len(self._misses) > self.max_misses:
+                        self._misses.popitem(last=False)
+                return default
+            self._cache[key] = value
+            self._fresh[key] = now + self.record_ttl
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._cache[key] = value
+            self._fresh[key] = self._clock() + self.record_ttl
+            self._misses.pop(key, None)
+        self.store.put_record(self.kind, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+            self._fresh.pop(key, None)
+        self.store.delete_record(self.kind, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._cache))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class StoredSet:
+    """Set-like view of one record kind."""
+
+    def __init__(self, store: UsageStore, kind: str):
+        self._mapping = StoredMapping(store, kind)
+
+    def add(self, key: str) -> None:
+        self._mapping[key] = True
+
+    def discard(self, key: str) -> None:
+        del self._mapping[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._mapping
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._mapping)
+
+    def __len__(self) -> int:
+        return len(self._mapping)
+
+
+def open_usage_store(path: str = USAGE_DB_PATH) -> Optional[UsageStore]:
+    """Open the store at `path`, or return None when persistence is disabled."""
+    if not path:
+        return None
+    return UsageStore(path)
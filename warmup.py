@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Emoji Translator AI - Cache Warm-Up
+Request log of translation keys, and a background warmer that precomputes the
+most frequent recent ones into the translation cache after a deploy
+
+The request log (EMOJI_REQUEST_LOG, off by default) is a JSON-lines file of
+translation keys: one `{"ts": ..., "key": [text, density, mode, style,
+add_sentiment, seed]}` per translation. Handlers only append to a memory
+buffer; a background thread appends it to the file once a second. Every worker
+writes to the same file, and it is rotated to `<path>.1` once it passes
+EMOJI_REQUEST_LOG_BYTES. Texts longer than LOG_MAX_CHARS are not logged.
+
+On startup, the warmer translates the WARMUP_SIZE most frequent keys in a
+background thread, skipping those the shared disk cache already holds. The
+engine takes them from the heavy-hitter sketch shared by all workers (see
+heavy_hitters.py) when there is one, and otherwise ranks the keys in the last
+WARMUP_SCAN_BYTES of the log. Readiness (see
+health.py) is withheld until WARMUP_READY_FRACTION of them are done, or until
+WARMUP_TIMEOUT has passed, so a bad log can never keep a worker out of
+rotation. Liveness never waits for it.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from translation_cache import TranslationCache
+from translator import EmojiTranslator
+
+logger = logging.getLogger(__name__)
+
+# Path of the request log; empty disables logging and warm-up
+REQUEST_LOG_PATH = os.environ.get("EMOJI_REQUEST_LOG", "")
+REQUEST_LOG_BYTES = int(os.environ.get("EMOJI_REQUEST_LOG_BYTES", 64 * 1024 * 1024))
+LOG_FLUSH_INTERVAL = 1.0
+LOG_MAX_CHARS = 2000
+WARMUP_ENABLED = os.environ.get("EMOJI_WARMUP", "on").lower() not in ("0", "off", "false", "no")
+WARMUP_SIZE = int(os.environ.get("EMOJI_WARMUP_SIZE", 1000))
+WARMUP_SCAN_BYTES = int(os.environ.get("EMOJI_WARMUP_SCAN_BYTES", 16 * 1024 * 1024))
+WARMUP_READY_FRACTION = float(os.environ.get("EMOJI_WARMUP_READY_FRACTION", 0.8))
+WARMUP_TIMEOUT = float(os.environ.get("EMOJI_WARMUP_TIMEOUT_S", 120.0))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RequestLog:
+    """Buffered, append-only JSON-lines log of translation keys, shared by all workers."""
+
+    def __init__(self, path: str, max_bytes: int = REQUEST_LOG_BYTES, flush_interval: float = LOG_FLUSH_INTERVAL,
+                 background: bool = True, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.rotations = 0
+        if background:
+            self._thread = threading.Thread(target=self._run, name="request-log-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def record(self, key: Tuple) -> None:
+        """Buffer one translation key; written out by the next flush."""
+        if len(key[0]) > LOG_MAX_CHARS:
+            return
+        line = json.dumps({"ts": int(self.clock()), "key": list(key)}, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+
+    def flush(self) -> int:
+        """Append buffered lines in one write; returns how many were written."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return 0
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(self.path, "ab") as log:
+            log.write(data)
+            size = log.tell()
+        if size > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+            self.rotations += 1
+        return len(lines)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Request log flush failed; dropping buffered lines")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._buffer)
+        return {"recorded": self.recorded, "pending": pending, "rotations": self.rotations}
+
+
+def _tail_lines(path: str, max_bytes: int) -> List[str]:
+    """Complete lines among the last `max_bytes` of `path`, or none if it is missing."""
+    try:
+        with open(path, "rb") as log:
+            log.seek(0, os.SEEK_END)
+            size = log.tell()
+            log.seek(max(0, size - max_bytes))
+            data = log.read()
+    except OSError:
+        return []
+    lines = data.decode("utf-8", errors="replace").split("\n")
+    if size > max_bytes:
+        # The first line was cut by the seek
+        lines = lines[1:]
+    return [line for line in lines if line]
+
+
+def frequent_keys(path: str, limit: int = WARMUP_SIZE, scan_bytes: int = WARMUP_SCAN_BYTES) -> List[Tuple]:
+    """
+    The `limit` most frequent translation keys among the most recent requests
+    in the log at `path`, reading its rotated predecessor too when the current
+    file holds less than `scan_bytes`.
+    """
+    lines = _tail_lines(path, scan_bytes)
+    scanned = sum(len(line) + 1 for line in lines)
+    if scanned < scan_bytes:
+        lines = _tail_lines(path + ".1", scan_bytes - scanned) + lines
+    counts: Counter = Counter()
+    for line in lines:
+        try:
+            key = json.loads(line)["key"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        if isinstance(key, list) and len(key) == 6 and isinstance(key[0], str):
+            counts[tuple(key)] += 1
+    return [key for key, _ in counts.most_common(limit)]
+
+
+class CacheWarmer:
+    """Precompute frequent translations into the cache in a background thread."""
+
+    def __init__(self, translator: EmojiTranslator, cache: TranslationCache,
+                 keys: Callable[[], List[Tuple]], ready_fraction: float = WARMUP_READY_FRACTION,
+                 timeout: float = WARMUP_TIMEOUT, clock=time.monotonic):
+        self.translator = translator
+        self.cache = cache
+        self.keys = keys
+        self.ready_fraction = ready_fraction
+        self.timeout = timeout
+        self.clock = clock
+        self.state = PENDING
+        self.total = 0
+        self.done = 0
+        self.computed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start warming up in the background; calling it again is harmless."""
+        if self._thread is not None:
+            return
+        self.started_at = self.clock()
+        self._thread = threading.Thread(target=self.run, name="cache-warmup", daemon=True)
+        self._thread.start()
+
+    def run(self) -> None:
+        self.state = RUNNING
+        try:
+            # Keys the cache would not keep (unseeded, by default) are not worth computing
+            keys = [key for key in self.keys() if self.cache.cacheable(key)]
+            self.total = len(keys)
+            for key in keys:
+                if self.cache.get(key) is None:
+                    text, density, mode, style, add_sentiment, seed = key
+                    self.cache.put(key, self.translator.translate(
+                        text, density=density, mode=mode, style=style, add_sentiment=add_sentiment, seed=seed))
+                    self.computed += 1
+                    # Let request threads have the interpreter between items
+                    time.sleep(0)
+                self.done += 1
+            self.state = DONE
+        except Exception:
+            logger.exception("Cache warm-up failed")
+            self.state = FAILED
+        finally:
+            self.finished_at = self.clock()
+
+    @property
+    def progress(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+    def ready(self) -> bool:
+        """Warm enough to take traffic: the target fraction is done, or warm-up gave up or ran out of time."""
+        if self.state in (DONE, FAILED):
+            return True
+        if self.state == PENDING and self._thread is None:
+            # Never started, e.g. outside a served app: nothing to wait for
+            return True
+        if self.started_at is not None and self.clock() - self.started_at >= self.timeout:
+            return True
+        return self.total > 0 and self.progress >= self.ready_fraction
+
+    def stats(self) -> Dict[str, object]:
+        end = self.finished_at if self.finished_at is not None else self.clock()
+        return {
+            "state": self.state,
+            "total": self.total,
+            "done": self.done,
+            "computed": self.computed,
+            "progress": round(self.progress, 4),
+            "ready": self.ready(),
+            "seconds": round(end - self.started_at, 3) if self.started_at is not None else None,
+        }